@@ -2,26 +2,36 @@
 
 from __future__ import annotations
 
+import asyncio
+import itertools
 import json
 import logging
 import os
+import queue
 import textwrap
+import threading
 import time
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Iterable, Optional, Sequence
+from typing import Any, Callable, Iterable, Optional, Sequence
 
 import pandas as pd
 from openai import OpenAI
 from supabase import Client, create_client
 
+from .budget import DEEP, DOWNGRADE, SCREENING, STOP, RunBudget, estimate_tokens
+from .checkpoint import AnalysisCheckpointStore
+from .retry import AdaptiveConcurrencyLimiter, RetryPolicy, call_with_retry, is_context_length_error, is_retryable
 from .screening_prompt import SCREENING_SYSTEM_PROMPT, get_screening_prompt, get_batch_screening_prompt
+from .streaming import IncrementalJSONArrayParser, collect_stream_text
 from .web_enrichment import enrich_companies_for_analysis, EnrichmentDataFormatter
 
 logger = logging.getLogger(__name__)
 
+SCREENING_MODEL = "gpt-4o-mini"
+
 
 def _default_context_fields() -> list[str]:
     return [
@@ -316,6 +326,8 @@ class ScreeningBatch:
     run: AIAnalysisRun
     results: list[ScreeningResult]
     errors: list[str] = field(default_factory=list)
+    skipped_orgnrs: list[str] = field(default_factory=list)
+    budget: dict[str, Any] = field(default_factory=dict)
 
     def results_dataframe(self) -> pd.DataFrame:
         rows = [
@@ -338,6 +350,8 @@ class AIAnalysisBatch:
     run: AIAnalysisRun
     companies: list[CompanyAnalysisRecord]
     errors: list[str] = field(default_factory=list)
+    skipped_orgnrs: list[str] = field(default_factory=list)
+    budget: dict[str, Any] = field(default_factory=dict)
 
     def company_dataframe(self) -> pd.DataFrame:
         rows = [
@@ -414,6 +428,14 @@ class AIAnalysisBatch:
         return pd.DataFrame(rows)
 
 
+@dataclass(slots=True)
+class FunnelResult:
+    """Outcome of a combined screening and deep-analysis funnel."""
+
+    screening: ScreeningBatch
+    deep: AIAnalysisBatch
+
+
 @dataclass(slots=True)
 class AIAnalysisConfig:
     """Configuration for LLM-powered analysis."""
@@ -438,6 +460,13 @@ class AIAnalysisConfig:
     prompt_cost_per_1k: float = 0.15
     completion_cost_per_1k: float = 0.6
     batch_size: int = 5  # For screening batch processing
+    stream_responses: bool = False  # Consume responses as SSE and persist screening rows as they complete
+    checkpoint_path: Optional[Path] = None  # Local resume journal (e.g. DEFAULT_CHECKPOINT_PATH); None disables it
+    retry_policy: RetryPolicy = field(default_factory=RetryPolicy)
+    max_concurrency: int = 4  # Upper bound for in-flight LLM calls; halved automatically when throttled
+    max_budget_usd: Optional[float] = None
+    max_budget_tokens: Optional[int] = None
+    budget_action: str = "stop"  # "stop" or "downgrade" (switch deep analysis to the screening model)
 
     def ensure_output_dir(self) -> None:
         if self.write_to_disk:
@@ -474,6 +503,16 @@ class SupabaseAnalysisWriter:
     def record_run_start(self, run: AIAnalysisRun) -> None:
         self._table(self.config.runs_table).insert(run.to_record()).execute()
 
+    def record_run_resume(self, run: AIAnalysisRun) -> None:
+        payload = {"status": "running", "completed_at": None, "error_message": None}
+        self._table(self.config.runs_table).update(payload).eq("id", run.id).execute()
+
+    def fetch_completed_orgnrs(self, run_id: str, analysis_mode: str) -> set[str]:
+        """Return orgnrs that already have result rows for ``run_id``."""
+        table = self.config.screening_table if analysis_mode == "screening" else self.config.company_table
+        response = self._table(table).select("orgnr").eq("run_id", run_id).execute()
+        return {row["orgnr"] for row in (response.data or []) if row.get("orgnr")}
+
     def record_run_completion(self, run: AIAnalysisRun) -> None:
         payload = {
             "status": run.status,
@@ -559,6 +598,13 @@ class SupabaseAnalysisWriter:
 
     def upsert_screening_results(self, results: Sequence[ScreeningResult]) -> None:
         """Persist screening results to Supabase."""
+        if not results:
+            return
+        self.upsert_screening_rows(results)
+        self.upsert_screening_audit(results)
+
+    def upsert_screening_rows(self, results: Sequence[ScreeningResult]) -> None:
+        """Persist screening rows only; used to store streamed results before usage is known."""
         if not results:
             return
         screening_rows = [
@@ -575,7 +621,8 @@ class SupabaseAnalysisWriter:
         ]
         self._table(self.config.screening_table).upsert(screening_rows, on_conflict="run_id,orgnr").execute()
 
-        # Also store audit records for screening
+    def upsert_screening_audit(self, results: Sequence[ScreeningResult]) -> None:
+        """Persist audit records for screening results."""
         audit_rows = [
             {
                 "run_id": result.run_id,
@@ -610,8 +657,12 @@ class AgenticLLMAnalyzer:
         if not api_key and openai_client is None:
             raise ValueError("OPENAI_API_KEY environment variable is required to run AI analysis.")
         self.config = config
-        self.client = openai_client or OpenAI(api_key=api_key)
+        # Retries are owned by call_with_retry so throttling feeds the shared limiter.
+        self.client = openai_client or OpenAI(api_key=api_key, max_retries=0)
+        self.rate_limiter = AdaptiveConcurrencyLimiter(max_concurrency=config.max_concurrency)
+        self.budget = self._new_budget()
         self.supabase_writer = supabase_writer
+        self.checkpoints = AnalysisCheckpointStore(config.checkpoint_path) if config.checkpoint_path else None
 
     def run(
         self,
@@ -621,9 +672,13 @@ class AgenticLLMAnalyzer:
         run_id: Optional[str] = None,
         initiated_by: Optional[str] = None,
         filters: Optional[dict[str, Any]] = None,
+        resume: bool = False,
     ) -> AIAnalysisBatch:
+        """Run deep analysis; with ``resume`` companies already completed under ``run_id`` are skipped."""
         if shortlist.empty:
             raise ValueError("Shortlist is empty; cannot run AI analysis.")
+        if resume and not run_id:
+            raise ValueError("A run_id is required to resume an AI analysis run.")
 
         df = shortlist.copy()
         if limit is not None:
@@ -637,8 +692,9 @@ class AgenticLLMAnalyzer:
             filters=filters,
         )
 
-        if self.supabase_writer is not None:
-            self.supabase_writer.record_run_start(run)
+        df, skipped = self._pending_rows(df, run, resume)
+        self._record_run_start(run, resume)
+        self.budget = self._new_budget()
 
         analyses: list[CompanyAnalysisRecord] = []
         errors: list[str] = []
@@ -646,32 +702,13 @@ class AgenticLLMAnalyzer:
         # For deep analysis, enrich companies with external data
         enrichment_data_map = {}
         if run.analysis_mode == 'deep':
-            try:
-                companies_for_enrichment = []
-                for _, row in df.iterrows():
-                    orgnr = self._coalesce(row, ["orgnr", "OrgNr", "organization_number"])
-                    company_name = self._coalesce(row, ["company_name", "CompanyName", "legal_name", "name"])
-                    homepage = row.get('homepage') or row.get('website')
-                    
-                    companies_for_enrichment.append({
-                        'orgnr': orgnr,
-                        'name': company_name,
-                        'homepage': homepage
-                    })
-                
-                # Enrich companies (this is async, so we need to handle it properly)
-                import asyncio
-                enrichment_results = asyncio.run(enrich_companies_for_analysis(companies_for_enrichment))
-                
-                # Format enrichment data for each company
-                for orgnr, enrichment_data in enrichment_results.items():
-                    formatted_enrichment = EnrichmentDataFormatter.format_for_ai_analysis(enrichment_data)
-                    enrichment_data_map[orgnr] = formatted_enrichment
-                    
-            except Exception as e:
-                logger.warning(f"Failed to enrich companies for deep analysis: {e}")
-
-        for _, row in df.iterrows():
+            enrichment_data_map = self._enrich_rows(row for _, row in df.iterrows())
+
+        for position, (_, row) in enumerate(df.iterrows()):
+            remaining = len(df) - position
+            if not self._budget_allows(remaining, deep=True):
+                errors.append(f"Budget exhausted ({self._budget_summary()}); {remaining} companies not analysed")
+                break
             try:
                 orgnr = self._coalesce(row, ["orgnr", "OrgNr", "organization_number"])
                 enrichment_data = enrichment_data_map.get(orgnr)
@@ -679,22 +716,22 @@ class AgenticLLMAnalyzer:
                 analyses.append(record)
                 if self.supabase_writer is not None:
                     self.supabase_writer.upsert_company_results([record])
+                if self.checkpoints is not None:
+                    self.checkpoints.mark_completed(run.id, run.analysis_mode, [record.orgnr])
             except Exception as exc:  # pragma: no cover - defensive fallback
                 errors.append(f"{row.get('orgnr', 'unknown')}: {exc}")
             if self.config.sleep_between_requests:
                 time.sleep(self.config.sleep_between_requests)
 
-        run.completed_at = datetime.utcnow()
-        if errors:
-            run.status = "completed_with_errors"
-            run.error_message = "; ".join(errors)
-        else:
-            run.status = "completed"
-
-        if self.supabase_writer is not None:
-            self.supabase_writer.record_run_completion(run)
+        self._finish_run(run, errors)
 
-        batch = AIAnalysisBatch(run=run, companies=analyses, errors=errors)
+        batch = AIAnalysisBatch(
+            run=run,
+            companies=analyses,
+            errors=errors,
+            skipped_orgnrs=sorted(skipped),
+            budget=self.budget.snapshot(),
+        )
         if self.config.write_to_disk and analyses:
             self._persist_to_disk(batch)
         return batch
@@ -707,10 +744,13 @@ class AgenticLLMAnalyzer:
         run_id: Optional[str] = None,
         initiated_by: Optional[str] = None,
         filters: Optional[dict[str, Any]] = None,
+        resume: bool = False,
     ) -> ScreeningBatch:
         """Run rapid screening analysis on a list of companies."""
         if shortlist.empty:
             raise ValueError("Shortlist is empty; cannot run screening analysis.")
+        if resume and not run_id:
+            raise ValueError("A run_id is required to resume a screening run.")
 
         df = shortlist.copy()
         if limit is not None:
@@ -719,32 +759,285 @@ class AgenticLLMAnalyzer:
         run = AIAnalysisRun(
             id=run_id or str(uuid.uuid4()),
             initiated_by=initiated_by,
-            model_version="gpt-4o-mini",  # Use mini model for cost efficiency
+            model_version=SCREENING_MODEL,  # Use mini model for cost efficiency
             analysis_mode="screening",
             started_at=datetime.utcnow(),
             filters=filters,
         )
 
-        if self.supabase_writer is not None:
-            self.supabase_writer.record_run_start(run)
+        df, skipped = self._pending_rows(df, run, resume)
+        self._record_run_start(run, resume)
+        self.budget = self._new_budget()
 
         results: list[ScreeningResult] = []
         errors: list[str] = []
 
         # Process in batches for efficiency
         for i in range(0, len(df), self.config.batch_size):
+            if not self._budget_allows(-(-(len(df) - i) // self.config.batch_size), deep=False):
+                errors.append(f"Budget exhausted ({self._budget_summary()}); {len(df) - i} companies not screened")
+                break
             batch_df = df.iloc[i:i + self.config.batch_size]
-            try:
-                batch_results = self._analyze_screening_batch(batch_df, run)
-                results.extend(batch_results)
-                if self.supabase_writer is not None:
-                    self.supabase_writer.upsert_screening_results(batch_results)
-            except Exception as exc:
-                errors.append(f"Batch {i//self.config.batch_size + 1}: {exc}")
-            
+            batch_results, batch_errors = self._screen_batch_with_split(
+                batch_df, run, label=f"Batch {i//self.config.batch_size + 1}"
+            )
+            results.extend(batch_results)
+            errors.extend(batch_errors)
+
             if self.config.sleep_between_requests:
                 time.sleep(self.config.sleep_between_requests)
 
+        self._finish_run(run, errors)
+
+        batch = ScreeningBatch(
+            run=run,
+            results=results,
+            errors=errors,
+            skipped_orgnrs=sorted(skipped),
+            budget=self.budget.snapshot(),
+        )
+        if self.config.write_to_disk and results:
+            self._persist_screening_to_disk(batch)
+        return batch
+
+    def run_funnel(
+        self,
+        shortlist: pd.DataFrame,
+        *,
+        score_threshold: float = 70.0,
+        deep_limit: Optional[int] = None,
+        deep_workers: int = 2,
+        limit: Optional[int] = None,
+        run_id: Optional[str] = None,
+        initiated_by: Optional[str] = None,
+        filters: Optional[dict[str, Any]] = None,
+        resume: bool = False,
+    ) -> FunnelResult:
+        """Screen a shortlist and deep-analyse promising companies while screening continues.
+
+        Every screening result scoring at least ``score_threshold`` is pushed onto a priority
+        queue as soon as it is available. ``deep_workers`` threads pop the highest-scoring
+        company, enrich it and run the deep analysis, so the expensive stage overlaps with
+        the remaining screening batches. ``deep_limit`` caps the number of deep analyses.
+
+        ``run_id`` names the screening run; the deep run's id is derived from it. Resuming
+        needs the checkpoint store: companies screened before are not screened again, and
+        those that passed the threshold go straight to the deep queue unless their deep
+        analysis completed too.
+        """
+        if shortlist.empty:
+            raise ValueError("Shortlist is empty; cannot run AI funnel.")
+        if resume and not run_id:
+            raise ValueError("A run_id is required to resume a funnel run.")
+        if resume and self.checkpoints is None:
+            raise ValueError("Resuming a funnel run needs the checkpoint store (checkpoint_path).")
+
+        df = shortlist.copy()
+        if limit is not None:
+            df = df.head(limit)
+
+        screening_run = AIAnalysisRun(
+            id=run_id or str(uuid.uuid4()),
+            initiated_by=initiated_by,
+            model_version=SCREENING_MODEL,
+            analysis_mode="screening",
+            started_at=datetime.utcnow(),
+            filters=filters,
+        )
+        deep_run = AIAnalysisRun(
+            id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"funnel:{screening_run.id}:deep")),
+            initiated_by=initiated_by,
+            model_version=self.config.model,
+            started_at=datetime.utcnow(),
+            filters={
+                **(filters or {}),
+                "screening_run_id": screening_run.id,
+                "score_threshold": score_threshold,
+            },
+        )
+        self._record_run_start(screening_run, resume)
+        self._record_run_start(deep_run, resume)
+        self.budget = self._new_budget()
+
+        rows_by_orgnr = {
+            self._coalesce(row, ["orgnr", "OrgNr", "organization_number"]): row for _, row in df.iterrows()
+        }
+        screened: dict[str, Optional[float]] = {}
+        deep_done: set[str] = set()
+        if resume:
+            screened = self.checkpoints.completed_scores(screening_run.id, screening_run.analysis_mode)
+            deep_done = self.checkpoints.completed(deep_run.id, deep_run.analysis_mode) & rows_by_orgnr.keys()
+            orgnrs = df.apply(lambda row: self._coalesce(row, ["orgnr", "OrgNr", "organization_number"]), axis=1)
+            df = df[~orgnrs.isin(screened.keys())]
+        candidates: queue.PriorityQueue = queue.PriorityQueue()
+        sequence = itertools.count()
+        lock = threading.Lock()
+        analyses: list[CompanyAnalysisRecord] = []
+        deep_errors: list[str] = []
+        dispatched = len(deep_done)  # Counts towards deep_limit
+        budget_stopped = False
+        aborted = threading.Event()  # Screening raised: skip queued companies instead of analysing them
+
+        def enqueue(orgnr: Optional[str], score: Any) -> None:
+            if (
+                orgnr in rows_by_orgnr
+                and orgnr not in deep_done
+                and isinstance(score, (int, float))
+                and score >= score_threshold
+            ):
+                with lock:
+                    candidates.put((-float(score), next(sequence), orgnr))
+
+        def on_screened(result: ScreeningResult) -> None:
+            enqueue(result.orgnr, result.screening_score)
+
+        # Companies that passed screening before the interruption but were not deep-analysed
+        for orgnr, score in screened.items():
+            enqueue(orgnr, score)
+
+        def deep_worker() -> None:
+            nonlocal dispatched, budget_stopped
+            while True:
+                _, _, orgnr = candidates.get()
+                if orgnr is None:
+                    return
+                if aborted.is_set():
+                    continue
+                with lock:
+                    if budget_stopped or (deep_limit is not None and dispatched >= deep_limit):
+                        continue
+                    if not self._budget_allows(candidates.qsize() + 1, deep=True):
+                        budget_stopped = True
+                        deep_errors.append(f"Budget exhausted ({self._budget_summary()}); deep analysis stopped")
+                        continue
+                    dispatched += 1
+                row = rows_by_orgnr[orgnr]
+                try:
+                    enrichment = self._enrich_rows([row]).get(orgnr)
+                    record = self._analyze_row(row, deep_run, enrichment)
+                    if self.supabase_writer is not None:
+                        self.supabase_writer.upsert_company_results([record])
+                    if self.checkpoints is not None:
+                        self.checkpoints.mark_completed(deep_run.id, deep_run.analysis_mode, [record.orgnr])
+                    with lock:
+                        analyses.append(record)
+                except Exception as exc:  # pragma: no cover - defensive fallback
+                    with lock:
+                        deep_errors.append(f"{orgnr}: {exc}")
+
+        workers = [threading.Thread(target=deep_worker, daemon=True) for _ in range(max(1, deep_workers))]
+        for worker in workers:
+            worker.start()
+
+        screening_results: list[ScreeningResult] = []
+        screening_errors: list[str] = []
+        try:
+            for i in range(0, len(df), self.config.batch_size):
+                if budget_stopped or not self._budget_allows(1, deep=False):
+                    screening_errors.append(
+                        f"Budget exhausted ({self._budget_summary()}); {len(df) - i} companies not screened"
+                    )
+                    break
+                batch_df = df.iloc[i:i + self.config.batch_size]
+                batch_results, batch_errors = self._screen_batch_with_split(
+                    batch_df,
+                    screening_run,
+                    label=f"Batch {i//self.config.batch_size + 1}",
+                    on_screened=on_screened,
+                )
+                screening_results.extend(batch_results)
+                screening_errors.extend(batch_errors)
+                if self.config.sleep_between_requests:
+                    time.sleep(self.config.sleep_between_requests)
+        except BaseException:
+            aborted.set()
+            raise
+        finally:
+            # Sentinels sort after every real candidate, so queued companies are drained first
+            # (and skipped when screening raised).
+            for _ in workers:
+                candidates.put((float("inf"), next(sequence), None))
+            for worker in workers:
+                worker.join()
+
+        self._finish_run(screening_run, screening_errors)
+        self._finish_run(deep_run, deep_errors)
+
+        budget = self.budget.snapshot()
+        screening = ScreeningBatch(
+            run=screening_run,
+            results=screening_results,
+            errors=screening_errors,
+            skipped_orgnrs=sorted(screened.keys() & rows_by_orgnr.keys()),
+            budget=budget,
+        )
+        deep = AIAnalysisBatch(
+            run=deep_run, companies=analyses, errors=deep_errors, skipped_orgnrs=sorted(deep_done), budget=budget
+        )
+        if self.config.write_to_disk:
+            if screening_results:
+                self._persist_screening_to_disk(screening)
+            if analyses:
+                self._persist_to_disk(deep)
+        return FunnelResult(screening=screening, deep=deep)
+
+    def _enrich_rows(self, rows: Iterable[pd.Series]) -> dict[str, str]:
+        """Fetch web enrichment for companies and format it for the deep-analysis prompt, by orgnr."""
+        companies = [
+            {
+                'orgnr': self._coalesce(row, ["orgnr", "OrgNr", "organization_number"]),
+                'name': self._coalesce(row, ["company_name", "CompanyName", "legal_name", "name"]),
+                'homepage': row.get('homepage') or row.get('website'),
+            }
+            for row in rows
+        ]
+        try:
+            # Enrichment is async; each call runs its own event loop
+            enrichment_results = asyncio.run(enrich_companies_for_analysis(companies))
+        except Exception as e:
+            logger.warning(f"Failed to enrich companies for deep analysis: {e}")
+            return {}
+        return {
+            orgnr: EnrichmentDataFormatter.format_for_ai_analysis(enrichment_data)
+            for orgnr, enrichment_data in enrichment_results.items()
+        }
+
+    @staticmethod
+    def _screening_scores(results: Iterable[ScreeningResult]) -> dict[str, Optional[float]]:
+        return {
+            result.orgnr: float(result.screening_score) if isinstance(result.screening_score, (int, float)) else None
+            for result in results
+            if result.orgnr
+        }
+
+    def _new_budget(self) -> RunBudget:
+        return RunBudget(
+            self.config.max_budget_usd,
+            self.config.max_budget_tokens,
+            on_exceed=self.config.budget_action,
+        )
+
+    def _budget_allows(self, remaining_calls: int, *, deep: bool) -> bool:
+        """Check the run budget before dispatching; may switch deep analysis to the screening model."""
+        decision = self.budget.decide(remaining_calls, DEEP if deep else SCREENING)
+        if decision == STOP:
+            return False
+        if decision == DOWNGRADE and deep:
+            logger.warning(
+                f"Projected spend exceeds budget ({self._budget_summary()}); "
+                f"switching deep analysis from {self.config.model} to {SCREENING_MODEL}"
+            )
+            self.budget.mark_downgraded()
+        return True
+
+    def _budget_summary(self) -> str:
+        snapshot = self.budget.snapshot()
+        return f"${snapshot['spent_usd']:.4f}, {snapshot['spent_tokens']} tokens spent"
+
+    def _deep_model(self) -> str:
+        return SCREENING_MODEL if self.budget.downgraded else self.config.model
+
+    def _finish_run(self, run: AIAnalysisRun, errors: Sequence[str]) -> None:
         run.completed_at = datetime.utcnow()
         if errors:
             run.status = "completed_with_errors"
@@ -755,10 +1048,99 @@ class AgenticLLMAnalyzer:
         if self.supabase_writer is not None:
             self.supabase_writer.record_run_completion(run)
 
-        batch = ScreeningBatch(run=run, results=results, errors=errors)
-        if self.config.write_to_disk and results:
-            self._persist_screening_to_disk(batch)
-        return batch
+    def _screen_batch_with_split(
+        self,
+        batch_df: pd.DataFrame,
+        run: AIAnalysisRun,
+        *,
+        label: str,
+        on_screened: Optional[Callable[[ScreeningResult], None]] = None,
+    ) -> tuple[list[ScreeningResult], list[str]]:
+        """Screen a batch, splitting it in halves and retrying when the call fails.
+
+        Only transient failures (those the retry loop gave up on) and context-length
+        rejections are split; anything else, such as a bad request or invalid credentials,
+        would fail every smaller batch too and is re-raised. Results streamed before a
+        failure are kept and only the remaining companies are retried; a single company
+        that still fails is reported as an error.
+        """
+        streamed: list[ScreeningResult] = []
+
+        def on_result(result: ScreeningResult) -> None:
+            streamed.append(result)
+            if self.config.stream_responses and self.checkpoints is not None:
+                self.checkpoints.mark_completed(
+                    run.id, run.analysis_mode, [result.orgnr], scores=self._screening_scores([result])
+                )
+            if on_screened is not None:
+                on_screened(result)
+
+        try:
+            batch_results = self._analyze_screening_batch(batch_df, run, on_result=on_result)
+            if self.supabase_writer is not None:
+                if self.config.stream_responses:
+                    # Rows were already persisted while streaming; only the audit needs final usage.
+                    self.supabase_writer.upsert_screening_audit(batch_results)
+                else:
+                    self.supabase_writer.upsert_screening_results(batch_results)
+            if self.checkpoints is not None:
+                self.checkpoints.mark_completed(
+                    run.id,
+                    run.analysis_mode,
+                    [r.orgnr for r in batch_results],
+                    scores=self._screening_scores(batch_results),
+                )
+            return batch_results, []
+        except Exception as exc:
+            if not (is_retryable(exc) or is_context_length_error(exc)):
+                raise
+            # Keep whatever completed before a mid-stream failure or timeout.
+            if streamed and self.config.stream_responses and self.supabase_writer is not None:
+                self.supabase_writer.upsert_screening_audit(streamed)
+            done = {r.orgnr for r in streamed}
+            orgnrs = batch_df.apply(lambda row: self._coalesce(row, ["orgnr", "OrgNr", "organization_number"]), axis=1)
+            remaining = batch_df[~orgnrs.isin(done)] if done else batch_df
+            if remaining.empty or len(batch_df) == 1:
+                return streamed, [f"{label}: {exc}"]
+            logger.warning(f"{label} failed ({exc}); retrying {len(remaining)} companies in smaller batches")
+            if len(remaining) < len(batch_df):
+                retried, errors = self._screen_batch_with_split(remaining, run, label=label, on_screened=on_screened)
+                return streamed + retried, errors
+            middle = len(remaining) // 2
+            first, first_errors = self._screen_batch_with_split(
+                remaining.iloc[:middle], run, label=f"{label}a", on_screened=on_screened
+            )
+            second, second_errors = self._screen_batch_with_split(
+                remaining.iloc[middle:], run, label=f"{label}b", on_screened=on_screened
+            )
+            return streamed + first + second, first_errors + second_errors
+
+    def _pending_rows(self, df: pd.DataFrame, run: AIAnalysisRun, resume: bool) -> tuple[pd.DataFrame, set[str]]:
+        """Drop rows already completed under ``run`` when resuming."""
+        if not resume:
+            return df, set()
+        completed: set[str] = set()
+        if self.checkpoints is not None:
+            completed |= self.checkpoints.completed(run.id, run.analysis_mode)
+        if self.supabase_writer is not None:
+            try:
+                completed |= self.supabase_writer.fetch_completed_orgnrs(run.id, run.analysis_mode)
+            except Exception as exc:  # pragma: no cover - network fallback
+                logger.warning(f"Could not read completed rows for run {run.id} from Supabase: {exc}")
+        if not completed or df.empty:
+            return df, set()
+        orgnrs = df.apply(lambda row: self._coalesce(row, ["orgnr", "OrgNr", "organization_number"]), axis=1)
+        done = orgnrs.isin(completed)
+        logger.info(f"Resuming run {run.id}: skipping {int(done.sum())} completed companies")
+        return df[~done], set(orgnrs[done])
+
+    def _record_run_start(self, run: AIAnalysisRun, resume: bool) -> None:
+        if self.supabase_writer is None:
+            return
+        if resume:
+            self.supabase_writer.record_run_resume(run)
+        else:
+            self.supabase_writer.record_run_start(run)
 
     def _persist_to_disk(self, batch: AIAnalysisBatch) -> None:
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
@@ -773,8 +1155,18 @@ class AgenticLLMAnalyzer:
         base_path = self.config.output_dir / f"{timestamp}_screening_{batch.run.id}"
         batch.results_dataframe().to_csv(base_path.with_suffix("_results.csv"), index=False)
 
-    def _analyze_screening_batch(self, batch_df: pd.DataFrame, run: AIAnalysisRun) -> list[ScreeningResult]:
-        """Analyze a batch of companies for screening."""
+    def _analyze_screening_batch(
+        self,
+        batch_df: pd.DataFrame,
+        run: AIAnalysisRun,
+        *,
+        on_result: Optional[Callable[[ScreeningResult], None]] = None,
+    ) -> list[ScreeningResult]:
+        """Analyze a batch of companies for screening.
+
+        When streaming is enabled each result is handed to ``on_result`` (and persisted) as
+        soon as its JSON element completes; its audit is finalised once usage is known.
+        """
         # Convert batch to list of company data
         companies_data = []
         for _, row in batch_df.iterrows():
@@ -788,39 +1180,69 @@ class AgenticLLMAnalyzer:
 
         # Use batch screening prompt
         prompt = get_batch_screening_prompt(companies_data)
-        response_json, raw_text, usage, latency_ms = self._invoke_screening_model(prompt)
 
-        # Parse results
-        results = []
-        for i, result_data in enumerate(response_json):
-            if i < len(companies_data):
-                company_data = companies_data[i]
-                audit = AnalysisAuditRecord(
-                    module="screening_analysis",
-                    prompt=prompt,
-                    response=raw_text,
-                    model="gpt-4o-mini",
-                    latency_ms=latency_ms,
-                    prompt_tokens=usage.get("input_tokens", 0) if usage else 0,
-                    completion_tokens=usage.get("output_tokens", 0) if usage else 0,
-                    cost_usd=self._estimate_screening_cost(usage),
-                )
+        results: list[ScreeningResult] = []
 
-                result = ScreeningResult(
-                    run_id=run.id,
-                    orgnr=company_data['orgnr'],
-                    company_name=company_data['name'],
-                    screening_score=result_data.get("screening_score"),
-                    risk_flag=result_data.get("risk_flag"),
-                    brief_summary=result_data.get("brief_summary"),
-                    analysis_generated_at=datetime.utcnow(),
-                    audit=audit,
-                    raw_json=result_data,
-                )
-                results.append(result)
+        def handle_item(index: int, result_data: dict[str, Any], audit: AnalysisAuditRecord) -> None:
+            # Indices below len(results) were already handled by an earlier (retried) attempt.
+            if index != len(results) or index >= len(companies_data) or not isinstance(result_data, dict):
+                return
+            company_data = companies_data[index]
+            result = ScreeningResult(
+                run_id=run.id,
+                orgnr=company_data['orgnr'],
+                company_name=company_data['name'],
+                screening_score=result_data.get("screening_score"),
+                risk_flag=result_data.get("risk_flag"),
+                brief_summary=result_data.get("brief_summary"),
+                analysis_generated_at=datetime.utcnow(),
+                audit=audit,
+                raw_json=result_data,
+            )
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+            if self.config.stream_responses and self.supabase_writer is not None:
+                self.supabase_writer.upsert_screening_rows([result])
+
+        if self.config.stream_responses:
+            start_time = time.perf_counter()
+
+            def on_item(index: int, item: Any) -> None:
+                latency_ms = int((time.perf_counter() - start_time) * 1000)
+                handle_item(index, item, self._screening_audit(prompt, "", {}, latency_ms))
+
+            response_json, raw_text, usage, latency_ms = self._invoke_screening_model(prompt, on_item=on_item)
+            audit = self._screening_audit(prompt, raw_text, usage, latency_ms)
+            self.budget.record(usage, audit.cost_usd, stage=SCREENING)
+            for result in results:
+                result.audit = audit
+            # Items that could not be parsed incrementally fall back to the full-text parse.
+            for index, result_data in enumerate(response_json):
+                handle_item(index, result_data, audit)
+            return results
 
+        response_json, raw_text, usage, latency_ms = self._invoke_screening_model(prompt)
+        audit = self._screening_audit(prompt, raw_text, usage, latency_ms)
+        self.budget.record(usage, audit.cost_usd, stage=SCREENING)
+        for index, result_data in enumerate(response_json):
+            handle_item(index, result_data, audit)
         return results
 
+    def _screening_audit(
+        self, prompt: str, raw_text: str, usage: Optional[dict[str, Any]], latency_ms: int
+    ) -> AnalysisAuditRecord:
+        return AnalysisAuditRecord(
+            module="screening_analysis",
+            prompt=prompt,
+            response=raw_text,
+            model=SCREENING_MODEL,
+            latency_ms=latency_ms,
+            prompt_tokens=usage.get("input_tokens", 0) if usage else 0,
+            completion_tokens=usage.get("output_tokens", 0) if usage else 0,
+            cost_usd=self._estimate_screening_cost(usage),
+        )
+
     def _extract_financials(self, row: pd.Series) -> dict:
         """Extract financial data from a row for screening."""
         financials = {}
@@ -833,11 +1255,20 @@ class AgenticLLMAnalyzer:
             financials['employees'] = row.get('employees')
         return financials
 
-    def _invoke_screening_model(self, prompt: str) -> tuple[dict[str, Any], str, dict[str, Any], int]:
-        """Invoke the screening model with optimized settings."""
-        start_time = time.perf_counter()
-        response = self.client.responses.create(
-            model="gpt-4o-mini",
+    def _invoke_screening_model(
+        self,
+        prompt: str,
+        *,
+        on_item: Optional[Callable[[int, Any], None]] = None,
+    ) -> tuple[dict[str, Any], str, dict[str, Any], int]:
+        """Invoke the screening model with optimized settings.
+
+        With ``stream_responses`` enabled the JSON array is parsed incrementally and each
+        completed element is passed to ``on_item`` with its array index before the response
+        finishes. A retried attempt restarts the indices from zero.
+        """
+        request = dict(
+            model=SCREENING_MODEL,
             temperature=0.1,  # Lower temperature for more consistent screening
             max_output_tokens=500,  # Smaller output for screening
             input=[
@@ -852,31 +1283,40 @@ class AgenticLLMAnalyzer:
             ],
             response_format={"type": "json_schema", "json_schema": _screening_analysis_schema()},
         )
-        latency_ms = int((time.perf_counter() - start_time) * 1000)
+        start_time = time.perf_counter()
+        if self.config.stream_responses:
 
-        raw_text = getattr(response, "output_text", None)
-        if not raw_text:
-            try:
-                raw_text = response.output[0].content[0].text  # type: ignore[index]
-            except (AttributeError, IndexError):  # pragma: no cover - defensive fallback
-                raw_text = "[]"
+            def attempt() -> tuple[str, dict[str, Any]]:
+                parser = IncrementalJSONArrayParser()
+
+                def on_delta(delta: str) -> None:
+                    items = parser.feed(delta)
+                    first_index = parser.items_emitted - len(items)
+                    if on_item is not None:
+                        for offset, item in enumerate(items):
+                            on_item(first_index + offset, item)
+
+                return self._stream_attempt(request, on_delta=on_delta)
+
+            raw_text, usage = self._call_model(attempt, "Screening call")
+            raw_text = raw_text or "[]"
+        else:
+            response = self._call_model(lambda: self.client.responses.create(**request), "Screening call")
+            usage = self._usage_dict(response)
+            raw_text = getattr(response, "output_text", None)
+            if not raw_text:
+                try:
+                    raw_text = response.output[0].content[0].text  # type: ignore[index]
+                except (AttributeError, IndexError):  # pragma: no cover - defensive fallback
+                    raw_text = "[]"
+        latency_ms = int((time.perf_counter() - start_time) * 1000)
 
         try:
             parsed = json.loads(raw_text)
         except json.JSONDecodeError:
             parsed = []
 
-        usage_dict: dict[str, Any] = {}
-        usage = getattr(response, "usage", None)
-        if usage:
-            for key in ("input_tokens", "output_tokens", "total_tokens"):
-                value = getattr(usage, key, None)
-                if value is None and isinstance(usage, dict):
-                    value = usage.get(key)
-                if value is not None:
-                    usage_dict[key] = value
-
-        return parsed, raw_text, usage_dict, latency_ms
+        return parsed, raw_text, usage, latency_ms
 
     def _estimate_screening_cost(self, usage: Optional[dict[str, Any]]) -> Optional[float]:
         """Estimate cost for screening analysis (using gpt-4o-mini rates)."""
@@ -892,7 +1332,10 @@ class AgenticLLMAnalyzer:
         orgnr = self._coalesce(row, ["orgnr", "OrgNr", "organization_number"])
         company_name = self._coalesce(row, ["company_name", "CompanyName", "legal_name", "name"])
         payload = self._render_context(row, enrichment_data)
-        response_json, raw_text, usage, latency_ms = self._invoke_model(payload)
+        model = self._deep_model()
+        response_json, raw_text, usage, latency_ms = self._invoke_model(payload, model=model)
+        cost_usd = self._model_cost(model, usage)
+        self.budget.record(usage, cost_usd, stage=DEEP)
 
         sections = [
             AnalysisSection(
@@ -923,11 +1366,11 @@ class AgenticLLMAnalyzer:
             module="comprehensive_analysis",
             prompt=payload,
             response=raw_text,
-            model=self.config.model,
+            model=model,
             latency_ms=latency_ms,
             prompt_tokens=usage.get("input_tokens", 0) if usage else 0,
             completion_tokens=usage.get("output_tokens", 0) if usage else 0,
-            cost_usd=self._estimate_cost(usage),
+            cost_usd=cost_usd,
         )
 
         record = CompanyAnalysisRecord(
@@ -978,10 +1421,11 @@ class AgenticLLMAnalyzer:
         
         return base_prompt
 
-    def _invoke_model(self, prompt: str) -> tuple[dict[str, Any], str, dict[str, Any], int]:
-        start_time = time.perf_counter()
-        response = self.client.responses.create(
-            model=self.config.model,
+    def _invoke_model(
+        self, prompt: str, *, model: Optional[str] = None
+    ) -> tuple[dict[str, Any], str, dict[str, Any], int]:
+        request = dict(
+            model=model or self.config.model,
             temperature=self.config.temperature,
             max_output_tokens=self.config.max_output_tokens,
             input=[
@@ -996,20 +1440,69 @@ class AgenticLLMAnalyzer:
             ],
             response_format={"type": "json_schema", "json_schema": self.config.response_schema},
         )
+        start_time = time.perf_counter()
+        if self.config.stream_responses:
+            raw_text, usage = self._call_model(lambda: self._stream_attempt(request), "Analysis call")
+            raw_text = raw_text or "{}"
+        else:
+            response = self._call_model(lambda: self.client.responses.create(**request), "Analysis call")
+            usage = self._usage_dict(response)
+            raw_text = getattr(response, "output_text", None)
+            if not raw_text:
+                try:
+                    raw_text = response.output[0].content[0].text  # type: ignore[index]
+                except (AttributeError, IndexError):  # pragma: no cover - defensive fallback
+                    raw_text = "{}"
         latency_ms = int((time.perf_counter() - start_time) * 1000)
 
-        raw_text = getattr(response, "output_text", None)
-        if not raw_text:
-            try:
-                raw_text = response.output[0].content[0].text  # type: ignore[index]
-            except (AttributeError, IndexError):  # pragma: no cover - defensive fallback
-                raw_text = "{}"
-
         try:
             parsed = json.loads(raw_text)
         except json.JSONDecodeError:
             parsed = {}
 
+        return parsed, raw_text, usage, latency_ms
+
+    def _call_model(self, fn: Callable[[], Any], description: str) -> Any:
+        return call_with_retry(
+            fn, policy=self.config.retry_policy, limiter=self.rate_limiter, description=description
+        )
+
+    def _stream_attempt(
+        self, request: dict[str, Any], *, on_delta: Optional[Callable[[str], None]] = None
+    ) -> tuple[str, dict[str, Any]]:
+        """Stream one attempt of ``request``, returning its text and usage.
+
+        A stream that ends without usage is estimated from its prompt and text. One that fails
+        part-way has been billed all the same, so its usage is charged to the run budget
+        before the error reaches the retry loop.
+        """
+        fragments: list[str] = []
+
+        def collect(delta: str) -> None:
+            fragments.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+
+        events = self.client.responses.create(**request, stream=True)
+        try:
+            raw_text, response = collect_stream_text(events, on_delta=collect)
+        except Exception as exc:
+            partial = "".join(fragments)
+            usage = self._usage_dict(getattr(exc, "failed_response", None)) or self._estimated_usage(request, partial)
+            self.budget.record_failed(usage, self._model_cost(request["model"], usage))
+            raise
+        return raw_text, self._usage_dict(response) or self._estimated_usage(request, raw_text)
+
+    @staticmethod
+    def _estimated_usage(request: dict[str, Any], output_text: str) -> dict[str, Any]:
+        prompt = "".join(part["text"] for message in request["input"] for part in message["content"])
+        return {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(output_text)}
+
+    def _model_cost(self, model: str, usage: Optional[dict[str, Any]]) -> Optional[float]:
+        return self._estimate_screening_cost(usage) if model == SCREENING_MODEL else self._estimate_cost(usage)
+
+    @staticmethod
+    def _usage_dict(response: Any) -> dict[str, Any]:
         usage_dict: dict[str, Any] = {}
         usage = getattr(response, "usage", None)
         if usage:
@@ -1019,8 +1512,7 @@ class AgenticLLMAnalyzer:
                     value = usage.get(key)
                 if value is not None:
                     usage_dict[key] = value
-
-        return parsed, raw_text, usage_dict, latency_ms
+        return usage_dict
 
     def _estimate_cost(self, usage: Optional[dict[str, Any]]) -> Optional[float]:
         if not usage:
@@ -1049,6 +1541,7 @@ __all__ = [
     "AgenticLLMAnalyzer",
     "AnalysisMetric",
     "AnalysisSection",
+    "FunnelResult",
     "ScreeningBatch",
     "ScreeningResult",
     "SupabaseAnalysisWriter",
@@ -0,0 +1,138 @@
+"""Live token and cost accounting for AI analysis runs."""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Optional
+
+PROCEED = "proceed"
+DOWNGRADE = "downgrade"
+STOP = "stop"
+
+SCREENING = "screening"
+DEEP = "deep"
+
+CHARS_PER_TOKEN = 4  # Rough average for English and Swedish text with OpenAI tokenizers
+
+
+def estimate_tokens(text: str) -> int:
+    """Token estimate for text whose usage the API did not report (failed or truncated streams)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class RunBudget:
+    """Tracks spend for a run and decides whether further LLM calls may be dispatched.
+
+    Totals are accumulated from each call's usage. The cost of upcoming calls of a stage
+    (``screening`` batches or ``deep`` analyses, which differ by orders of magnitude) is
+    projected from a moving average over that stage's last ``window`` calls:
+
+    * if the next call is projected to exceed ``max_usd`` or ``max_tokens`` the decision is
+      ``stop`` and no new work should be dispatched;
+    * if finishing all remaining calls is projected to exceed the budget and
+      ``on_exceed == "downgrade"``, the decision is ``downgrade`` so the caller can switch
+      to the cheaper screening model.
+
+    Attempts that failed or were retried still cost money: :meth:`record_failed` adds them
+    to the totals without making them samples of a call's cost.
+    """
+
+    def __init__(
+        self,
+        max_usd: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        *,
+        on_exceed: str = STOP,
+        window: int = 20,
+    ) -> None:
+        if on_exceed not in (STOP, DOWNGRADE):
+            raise ValueError(f"on_exceed must be '{STOP}' or '{DOWNGRADE}', got {on_exceed!r}")
+        self.max_usd = max_usd
+        self.max_tokens = max_tokens
+        self.on_exceed = on_exceed
+        self.spent_usd = 0.0
+        self.spent_tokens = 0
+        self.calls = 0
+        self.failed_calls = 0
+        self.downgraded = False
+        self._window = window
+        self._recent: dict[str, deque[tuple[float, int]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_usd is not None or self.max_tokens is not None
+
+    def record(self, usage: Optional[dict[str, Any]], cost_usd: Optional[float], *, stage: str) -> None:
+        cost, tokens = self._charge(usage, cost_usd)
+        with self._lock:
+            self.calls += 1
+            self._recent.setdefault(stage, deque(maxlen=self._window)).append((cost, tokens))
+
+    def record_failed(self, usage: Optional[dict[str, Any]], cost_usd: Optional[float]) -> None:
+        """Add the spend of a failed or abandoned attempt to the totals."""
+        self._charge(usage, cost_usd)
+        with self._lock:
+            self.failed_calls += 1
+
+    def mark_downgraded(self) -> None:
+        """Forget the deep stage's moving average so projections reflect the cheaper model."""
+        with self._lock:
+            self.downgraded = True
+            self._recent.pop(DEEP, None)
+
+    def projected(self, remaining_calls: int, stage: str) -> tuple[float, float]:
+        with self._lock:
+            recent = self._recent.get(stage)
+            if not recent:
+                return self.spent_usd, float(self.spent_tokens)
+            avg_usd = sum(cost for cost, _ in recent) / len(recent)
+            avg_tokens = sum(tokens for _, tokens in recent) / len(recent)
+            return (
+                self.spent_usd + avg_usd * remaining_calls,
+                self.spent_tokens + avg_tokens * remaining_calls,
+            )
+
+    def decide(self, remaining_calls: int, stage: str) -> str:
+        if not self.enabled:
+            return PROCEED
+        if self._exceeds(*self.projected(1, stage)):
+            return STOP
+        if (
+            stage == DEEP
+            and self.on_exceed == DOWNGRADE
+            and not self.downgraded
+            and self._exceeds(*self.projected(max(1, remaining_calls), stage))
+        ):
+            return DOWNGRADE
+        return PROCEED
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failed_calls": self.failed_calls,
+                "spent_usd": round(self.spent_usd, 4),
+                "spent_tokens": self.spent_tokens,
+                "max_usd": self.max_usd,
+                "max_tokens": self.max_tokens,
+                "downgraded": self.downgraded,
+            }
+
+    def _charge(self, usage: Optional[dict[str, Any]], cost_usd: Optional[float]) -> tuple[float, int]:
+        usage = usage or {}
+        tokens = int(usage.get("total_tokens") or (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0))
+        cost = float(cost_usd or 0.0)
+        with self._lock:
+            self.spent_usd += cost
+            self.spent_tokens += tokens
+        return cost, tokens
+
+    def _exceeds(self, usd: float, tokens: float) -> bool:
+        return (self.max_usd is not None and usd > self.max_usd) or (
+            self.max_tokens is not None and tokens > self.max_tokens
+        )
+
+
+__all__ = ["DEEP", "DOWNGRADE", "PROCEED", "RunBudget", "SCREENING", "STOP", "estimate_tokens"]
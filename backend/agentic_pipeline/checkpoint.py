@@ -0,0 +1,89 @@
+"""Local checkpoint journal for resumable AI analysis runs."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Mapping, Optional
+
+DEFAULT_CHECKPOINT_PATH = Path("outputs/agentic_ai/run_checkpoints.db")  # Used by the CLIs' --checkpoint/--resume
+
+
+class AnalysisCheckpointStore:
+    """SQLite journal recording which companies finished within an analysis run.
+
+    Every completed ``(run_id, orgnr)`` pair is committed immediately so a crashed run can
+    be resumed without paying for the same LLM calls twice. Screening runs also record each
+    company's score, so a resumed funnel knows which screened companies still await deep
+    analysis.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_checkpoints (
+                run_id TEXT NOT NULL,
+                analysis_mode TEXT NOT NULL,
+                orgnr TEXT NOT NULL,
+                completed_at TEXT NOT NULL,
+                score REAL,
+                PRIMARY KEY (run_id, analysis_mode, orgnr)
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(analysis_checkpoints)")}
+        if "score" not in columns:  # Journal written before scores were recorded
+            self._conn.execute("ALTER TABLE analysis_checkpoints ADD COLUMN score REAL")
+        self._conn.commit()
+
+    def completed(self, run_id: str, analysis_mode: str) -> set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT orgnr FROM analysis_checkpoints WHERE run_id = ? AND analysis_mode = ?",
+                (run_id, analysis_mode),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def completed_scores(self, run_id: str, analysis_mode: str) -> dict[str, Optional[float]]:
+        """Completed companies of a run with the score recorded for each (None if there was none)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT orgnr, score FROM analysis_checkpoints WHERE run_id = ? AND analysis_mode = ?",
+                (run_id, analysis_mode),
+            ).fetchall()
+        return {orgnr: score for orgnr, score in rows}
+
+    def mark_completed(
+        self,
+        run_id: str,
+        analysis_mode: str,
+        orgnrs: Iterable[Optional[str]],
+        *,
+        scores: Optional[Mapping[str, Optional[float]]] = None,
+    ) -> None:
+        timestamp = datetime.utcnow().isoformat()
+        scores = scores or {}
+        rows = [(run_id, analysis_mode, orgnr, timestamp, scores.get(orgnr)) for orgnr in orgnrs if orgnr]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO analysis_checkpoints (run_id, analysis_mode, orgnr, completed_at, score) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+__all__ = ["AnalysisCheckpointStore", "DEFAULT_CHECKPOINT_PATH"]
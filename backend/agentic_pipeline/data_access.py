@@ -15,6 +15,7 @@ REQUIRED_TABLES: Iterable[str] = (
     "company_accounts",
     "companies_enriched",
 )
+TRENDS_TABLE = "company_kpi_trends"  # Optional: multi-year features written by calc_kpis.py
 
 
 @dataclass(slots=True)
@@ -45,6 +46,18 @@ class TargetingDataLoader:
         idx = df.groupby(list(key_columns))["year"].idxmax()
         return df.loc[idx].reset_index(drop=True)
 
+    def merge_trends(self, merged: pd.DataFrame) -> pd.DataFrame:
+        """Add the latest company_kpi_trends row per company, when calc_kpis.py has written it."""
+        if TRENDS_TABLE not in inspect(self.engine).get_table_names():
+            return merged
+        trends = self.load_latest_by_year(TRENDS_TABLE, ["organisationNumber"])
+        if trends.empty:
+            return merged
+        trends = trends.drop(columns=["companyId", "year"]).drop_duplicates(subset=["organisationNumber"])
+        trends["_orgnr"] = trends.pop("organisationNumber").astype(str).str.replace("-", "", regex=False)
+        merged["_orgnr"] = merged["OrgNr"].astype(str).str.replace("-", "", regex=False)
+        return merged.merge(trends, on="_orgnr", how="left", suffixes=(None, "_trend")).drop(columns="_orgnr")
+
     def load(self) -> DataLoadResult:
         issues: list[str] = []
         missing = self.validate_tables()
@@ -63,6 +76,7 @@ class TargetingDataLoader:
         merged = kpis.merge(accounts, on=["OrgNr", "year"], suffixes=("_kpi", "_acc"))
         merged = merged.merge(enriched, on="OrgNr", how="left", suffixes=(None, None))
         merged = merged.drop_duplicates(subset=["OrgNr"]).reset_index(drop=True)
+        merged = self.merge_trends(merged)
 
         return DataLoadResult(merged, issues)
 
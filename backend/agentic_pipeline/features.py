@@ -9,6 +9,19 @@ import numpy as np
 import pandas as pd
 
 
+# Multi-year features from company_kpi_trends (kpi_engine.compute_trends), used when the loader merged them
+TREND_FEATURE_COLUMNS = (
+    "years_reported",
+    "revenue_cagr_3y",
+    "revenue_cagr_5y",
+    "revenue_growth_avg_3y",
+    "profit_growth_avg_3y",
+    "revenue_growth_volatility_5y",
+    "ebit_margin_slope_5y",
+    "revenue_drawdown_5y",
+)
+
+
 @dataclass(slots=True)
 class FeatureEngineeringResult:
     features: pd.DataFrame
@@ -64,6 +77,7 @@ class FeatureEngineer:
             "assets",
             "equity_ratio",
         ]
+        numeric_cols += [column for column in TREND_FEATURE_COLUMNS if column in frame.columns]
 
         engineered = frame[numeric_cols].apply(pd.to_numeric, errors="coerce").fillna(0)
 
@@ -84,4 +98,4 @@ class FeatureEngineer:
         return FeatureEngineeringResult(engineered, metadata)
 
 
-__all__ = ["FeatureEngineer", "FeatureEngineeringResult"]
+__all__ = ["FeatureEngineer", "FeatureEngineeringResult", "TREND_FEATURE_COLUMNS"]
@@ -0,0 +1,229 @@
+"""Retry, backoff and throttling controls for LLM API calls."""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+@dataclass(slots=True)
+class RetryPolicy:
+    """Jittered exponential backoff settings."""
+
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    jitter: float = 0.5  # Fraction of the computed delay that is randomised
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        spread = delay * self.jitter
+        return max(0.0, delay - spread + random.uniform(0, 2 * spread))
+
+
+def status_code_of(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = status_code_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    # Connection resets and timeouts carry no status code (openai.APIConnectionError/APITimeoutError).
+    name = type(exc).__name__
+    return isinstance(exc, (ConnectionError, TimeoutError)) or name in {"APIConnectionError", "APITimeoutError"}
+
+
+def is_context_length_error(exc: BaseException) -> bool:
+    """The request was rejected (HTTP 400) because the prompt exceeds the model's context window."""
+    if getattr(exc, "code", None) == "context_length_exceeded":
+        return True
+    message = str(exc).lower()
+    return "context_length_exceeded" in message or "maximum context length" in message
+
+
+def is_throttle(exc: BaseException) -> bool:
+    return status_code_of(exc) in THROTTLE_STATUS_CODES or type(exc).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Read ``retry-after-ms``/``retry-after`` from the error response, if present."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class AdaptiveConcurrencyLimiter:
+    """Global concurrency gate with a circuit breaker for throttled APIs.
+
+    The permitted number of in-flight calls halves on every throttle signal and grows back
+    by one after ``recovery_successes`` consecutive successes. After ``failure_threshold``
+    consecutive throttles the circuit opens and new calls wait for the cooldown (or the
+    server's Retry-After, whichever is longer) before a single probe call is let through.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        *,
+        min_concurrency: int = 1,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        recovery_successes: int = 5,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.recovery_successes = recovery_successes
+        self.limit = self.max_concurrency
+        self._in_flight = 0
+        self._consecutive_throttles = 0
+        self._consecutive_successes = 0
+        self._open_until = 0.0
+        self._circuit_open = False
+        self._half_open = False
+        self._cond = threading.Condition()
+
+    @property
+    def state(self) -> str:
+        with self._cond:
+            if self._circuit_open:
+                return "open"
+            return "half_open" if self._half_open else "closed"
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait = self._open_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+                self._open_until = 0.0
+                if self._circuit_open:
+                    # Cooldown elapsed: admit exactly one probe call.
+                    self._circuit_open = False
+                    self._half_open = True
+                    self.limit = 1
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    return
+                self._cond.wait()
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def record_success(self) -> None:
+        with self._cond:
+            self._consecutive_throttles = 0
+            self._half_open = False
+            self._consecutive_successes += 1
+            if self.limit < self.max_concurrency and self._consecutive_successes >= self.recovery_successes:
+                self.limit += 1
+                self._consecutive_successes = 0
+            self._cond.notify_all()
+
+    def record_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._cond:
+            self._consecutive_successes = 0
+            self._consecutive_throttles += 1
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            if self._half_open or self._consecutive_throttles >= self.failure_threshold:
+                self._half_open = False
+                self._circuit_open = True
+                self._open_until = time.monotonic() + max(self.cooldown, retry_after or 0.0)
+                logger.warning(
+                    f"LLM circuit opened for {max(self.cooldown, retry_after or 0.0):.0f}s after "
+                    f"{self._consecutive_throttles} throttled calls"
+                )
+            elif retry_after:
+                self._open_until = max(self._open_until, time.monotonic() + retry_after)
+
+
+def call_with_retry(
+    fn: Callable[[], T],
+    *,
+    policy: RetryPolicy,
+    limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    description: str = "LLM call",
+    sleep: Callable[[float], Any] = time.sleep,
+) -> T:
+    """Invoke ``fn`` with jittered exponential backoff, honouring Retry-After headers."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            if limiter is None:
+                result = fn()
+            else:
+                with limiter.slot():
+                    result = fn()
+        except Exception as exc:
+            throttled = is_throttle(exc)
+            retry_after = retry_after_seconds(exc)
+            if limiter is not None and throttled:
+                limiter.record_throttle(retry_after)
+            if attempt >= policy.max_attempts or not is_retryable(exc):
+                raise
+            delay = max(retry_after or 0.0, policy.backoff(attempt))
+            logger.warning(
+                f"{description} failed (attempt {attempt}/{policy.max_attempts}): {exc}; retrying in {delay:.1f}s"
+            )
+            sleep(delay)
+            continue
+        if limiter is not None:
+            limiter.record_success()
+        return result
+
+
+__all__ = [
+    "AdaptiveConcurrencyLimiter",
+    "RetryPolicy",
+    "call_with_retry",
+    "is_context_length_error",
+    "is_retryable",
+    "is_throttle",
+    "retry_after_seconds",
+]
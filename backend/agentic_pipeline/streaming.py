@@ -0,0 +1,121 @@
+"""Helpers for consuming streamed LLM responses incrementally."""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Iterable, Optional
+
+
+class StreamFailedError(RuntimeError):
+    """A streamed response reported failure; ``failed_response`` may still carry its ``usage``."""
+
+    def __init__(self, message: str, failed_response: Any = None) -> None:
+        super().__init__(message)
+        self.failed_response = failed_response
+
+
+class IncrementalJSONArrayParser:
+    """Parses a JSON array chunk by chunk, yielding each element once it is complete.
+
+    Text preceding the opening bracket (for example a markdown fence) is ignored. Elements
+    are decoded with ``json.JSONDecoder.raw_decode`` so the buffer is never re-parsed from
+    the start; decoding is only attempted once a closing bracket has arrived, because an
+    object or array element cannot be complete before that.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._closed = False
+        self.items_emitted = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def feed(self, chunk: str) -> list[Any]:
+        if self._closed or not chunk:
+            return []
+        self._buffer += chunk
+        if self._started and "}" not in chunk and "]" not in chunk:
+            return []
+
+        items: list[Any] = []
+        while not self._closed:
+            pos = self._skip_whitespace(self._pos)
+            if pos >= len(self._buffer):
+                break
+            if not self._started:
+                start = self._buffer.find("[", pos)
+                if start == -1:
+                    self._pos = len(self._buffer)
+                    break
+                self._pos = start + 1
+                self._started = True
+                continue
+
+            char = self._buffer[pos]
+            if char == ",":
+                self._pos = pos + 1
+                continue
+            if char == "]":
+                self._pos = pos + 1
+                self._closed = True
+                break
+
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                break
+            if not isinstance(value, (dict, list)) and end >= len(self._buffer):
+                # A scalar at the end of the buffer may still be growing (e.g. "12" -> "123").
+                break
+            items.append(value)
+            self._pos = end
+
+        # Drop consumed text so long responses do not keep the whole payload twice in memory.
+        if self._pos > 4096:
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
+        self.items_emitted += len(items)
+        return items
+
+    def _skip_whitespace(self, pos: int) -> int:
+        while pos < len(self._buffer) and self._buffer[pos] in " \t\r\n":
+            pos += 1
+        return pos
+
+
+def collect_stream_text(
+    events: Iterable[Any],
+    *,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> tuple[str, Any]:
+    """Consume Responses API server-sent events, returning the full text and final response.
+
+    ``on_delta`` is invoked with every text fragment as it arrives. The final response object
+    (carrying ``usage``) is only available once the ``response.completed`` event is received;
+    ``None`` is returned in its place if the stream ends early.
+    """
+
+    fragments: list[str] = []
+    final_response: Any = None
+    for event in events:
+        event_type = getattr(event, "type", None)
+        if event_type == "response.output_text.delta":
+            delta = getattr(event, "delta", "") or ""
+            fragments.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+        elif event_type == "response.completed":
+            final_response = getattr(event, "response", None)
+        elif event_type in ("response.failed", "error"):
+            response = getattr(event, "response", None)
+            error = getattr(event, "error", None) or getattr(response, "error", None)
+            raise StreamFailedError(f"Streaming response failed: {error or event_type}", response)
+    return "".join(fragments), final_response
+
+
+__all__ = ["IncrementalJSONArrayParser", "StreamFailedError", "collect_stream_text"]
@@ -0,0 +1,49 @@
+"""Asyncio crawler for allabolag.se segmentation pages, companyIds and financials, with a durable frontier."""
+
+from .accounts import ACCOUNT_ITEMS_TABLE, ACCOUNTS_FORMATS, KPI_ACCOUNTS_VIEW, KPI_CODES, store_accounts
+from .archive import ResponseArchive
+from .build_id import BuildIdResolver, get_build_id, refresh_build_id
+from .config import CrawlerConfig, SegmentationConfig
+from .crawler import AllabolagCrawler, CrawlStats
+from .frontier import CrawlFrontier
+from .jobs import (
+    JOB_TYPES,
+    CompanyIdResolutionJob,
+    CrawlJob,
+    CrawlTask,
+    FinancialsJob,
+    OrgnrFinancialsJob,
+    SegmentationPageJob,
+    segmentation_task_key,
+)
+from .rate_control import AIMDSettings, AsyncAdaptiveLimiter, ThreadAdaptiveLimiter
+from .writer import BatchWriter
+
+__all__ = [
+    "ACCOUNTS_FORMATS",
+    "ACCOUNT_ITEMS_TABLE",
+    "AIMDSettings",
+    "AllabolagCrawler",
+    "AsyncAdaptiveLimiter",
+    "BatchWriter",
+    "BuildIdResolver",
+    "CompanyIdResolutionJob",
+    "CrawlJob",
+    "CrawlFrontier",
+    "CrawlStats",
+    "CrawlTask",
+    "CrawlerConfig",
+    "FinancialsJob",
+    "JOB_TYPES",
+    "KPI_ACCOUNTS_VIEW",
+    "KPI_CODES",
+    "OrgnrFinancialsJob",
+    "ResponseArchive",
+    "SegmentationConfig",
+    "SegmentationPageJob",
+    "ThreadAdaptiveLimiter",
+    "get_build_id",
+    "refresh_build_id",
+    "segmentation_task_key",
+    "store_accounts",
+]
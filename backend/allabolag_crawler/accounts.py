@@ -0,0 +1,165 @@
+"""Long-format storage of allabolag account codes.
+
+The wide financials tables get one column per account code, and the code set differs between
+companies, so they keep widening and are mostly NULL. :data:`ACCOUNT_ITEMS_TABLE` instead holds
+one row per (company, period, code) with only the amounts that were reported. Pivot views turn
+the codes a consumer needs back into columns, reading them through a covering index on ``code``.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Any, Iterable, Mapping, Optional, Sequence
+
+from .storage import insert_records, quote_identifier
+
+ACCOUNT_ITEMS_TABLE = "company_account_items"
+KPI_ACCOUNTS_VIEW = "company_kpi_accounts"
+KPI_CODES = ("SDI", "RG", "DR", "resultat_e_finansnetto", "EKA", "avk_eget_kapital")  # Read by calc_kpis.py
+
+ACCOUNTS_FORMATS = ("wide", "long", "both")
+
+# Columns of the wide layouts (company_accounts_by_id and company_accounts) that are not account codes
+META_COLUMNS = frozenset({
+    "companyId",
+    "organisationNumber",
+    "name",
+    "year",
+    "period",
+    "periodStart",
+    "periodEnd",
+    "PeriodStart",
+    "PeriodEnd",
+    "length",
+    "currency",
+    "remark",
+    "referenceUrl",
+    "accIncompleteCode",
+    "accIncompleteDesc",
+})
+
+
+def ensure_account_items(conn: sqlite3.Connection) -> None:
+    """Create the long table, its covering index and the KPI pivot view if missing.
+
+    Runs inside the caller's transaction (``executescript`` would commit it first), so it is
+    safe in the writer's batches.
+    """
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {ACCOUNT_ITEMS_TABLE} (
+            organisationNumber TEXT NOT NULL,
+            companyId TEXT,
+            year INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            code TEXT NOT NULL,
+            amount REAL NOT NULL,
+            PRIMARY KEY (organisationNumber, year, period, code)
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE INDEX IF NOT EXISTS idx_{ACCOUNT_ITEMS_TABLE}_code
+            ON {ACCOUNT_ITEMS_TABLE} (code, organisationNumber, year, period, companyId, amount)
+        """
+    )
+    create_pivot_view(conn, KPI_ACCOUNTS_VIEW, KPI_CODES)
+
+
+def create_pivot_view(conn: sqlite3.Connection, view: str, codes: Sequence[str]) -> None:
+    """One row per company and period with a column for each of ``codes`` (NULL when not reported)."""
+    columns = ",\n".join(
+        f"    MAX(CASE WHEN code = '{code}' THEN amount END) AS {quote_identifier(code)}" for code in codes
+    )
+    in_list = ", ".join(f"'{code}'" for code in codes)
+    conn.execute(
+        f"""
+        CREATE VIEW IF NOT EXISTS {quote_identifier(view)} AS
+        SELECT organisationNumber, MAX(companyId) AS companyId, year, period,
+        {columns}
+        FROM {ACCOUNT_ITEMS_TABLE}
+        WHERE code IN ({in_list})
+        GROUP BY organisationNumber, year, period
+        """
+    )
+
+
+def _amount(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _period(record: Mapping[str, Any]) -> str:
+    """allabolag's ``period`` (e.g. 202312); derived from the period end when a layout lacks it."""
+    if record.get("period"):
+        return str(record["period"])
+    end = record.get("periodEnd") or record.get("PeriodEnd")
+    return str(end).replace("-", "")[:6] if end else ""
+
+
+def account_items(records: Iterable[Mapping[str, Any]]) -> list[tuple[Any, ...]]:
+    """Melt wide account rows into (organisationNumber, companyId, year, period, code, amount) rows.
+
+    Rows without an org number or year cannot be keyed and are skipped, as are missing amounts.
+    """
+    items = []
+    for record in records:
+        orgnr, year = record.get("organisationNumber"), record.get("year")
+        if not orgnr or year in (None, ""):
+            continue
+        company_id = record.get("companyId")
+        period = _period(record)
+        for code, value in record.items():
+            amount = _amount(value) if code not in META_COLUMNS else None
+            if amount is not None:
+                items.append((str(orgnr), company_id, int(year), period, code, amount))
+    return items
+
+
+def insert_account_items(conn: sqlite3.Connection, records: Iterable[Mapping[str, Any]]) -> int:
+    """Upsert the account codes of wide ``records`` into the long table; returns the rows written."""
+    items = account_items(records)
+    if not items:
+        return 0
+    ensure_account_items(conn)
+    conn.executemany(
+        f"""
+        INSERT INTO {ACCOUNT_ITEMS_TABLE} (organisationNumber, companyId, year, period, code, amount)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (organisationNumber, year, period, code)
+        DO UPDATE SET amount = excluded.amount, companyId = COALESCE(excluded.companyId, companyId)
+        """,
+        items,
+    )
+    return len(items)
+
+
+def store_accounts(conn: sqlite3.Connection, wide_table: str, records: Sequence[Mapping[str, Any]], accounts_format: str) -> int:
+    """Write account rows as ``wide`` (into ``wide_table``), ``long`` or ``both``; returns wide rows or long items."""
+    if accounts_format not in ACCOUNTS_FORMATS:
+        raise ValueError(f"accounts_format must be one of {ACCOUNTS_FORMATS}, not {accounts_format!r}")
+    written = 0
+    if accounts_format in ("wide", "both"):
+        written = insert_records(conn, wide_table, records)
+    if accounts_format in ("long", "both"):
+        items = insert_account_items(conn, records)
+        written = written or items
+    return written
+
+
+__all__ = [
+    "ACCOUNTS_FORMATS",
+    "ACCOUNT_ITEMS_TABLE",
+    "KPI_ACCOUNTS_VIEW",
+    "KPI_CODES",
+    "account_items",
+    "create_pivot_view",
+    "ensure_account_items",
+    "insert_account_items",
+    "store_accounts",
+]
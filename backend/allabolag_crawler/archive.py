@@ -0,0 +1,193 @@
+"""Archive of raw crawl responses, compressed and deduplicated by content.
+
+Every successful response body is stored once under its sha256 digest, compressed with zstd
+(with a dictionary trained per job type once enough samples are seen; allabolag JSON is very
+repetitive) or zlib when ``zstandard`` is not installed. A separate row per fetch records
+which task and URL produced which blob, so parsers can be re-run over the archive
+(``reextract_archive.py``) without touching the network.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is used instead
+    zstandard = None
+
+from .jobs import CrawlTask, FetchedResponse
+
+BLOBS_TABLE = "raw_blobs"
+RESPONSES_TABLE = "raw_responses"
+DICTS_TABLE = "compression_dicts"
+
+DICT_SAMPLES = 500  # Responses of a job type collected before its zstd dictionary is trained
+DICT_SIZE = 112 * 1024
+
+
+class ResponseArchive:
+    """Content-addressed store of raw responses in its own SQLite file."""
+
+    def __init__(self, path: str | Path, *, level: int = 9, read_only: bool = False) -> None:
+        self.path = Path(path)
+        self.level = level
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(self.path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_tables()
+        self._dicts: dict[int, bytes] = {}
+        self._job_dicts: dict[str, int] = {}
+        self._samples: dict[str, list[bytes]] = {}
+        for dict_id, job_type in self.conn.execute(f"SELECT id, job_type FROM {DICTS_TABLE} ORDER BY id"):
+            self._job_dicts[job_type] = dict_id
+
+    def _create_tables(self) -> None:
+        self.conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS {BLOBS_TABLE} (
+                digest BLOB PRIMARY KEY,
+                codec TEXT NOT NULL,
+                dict_id INTEGER,
+                size INTEGER NOT NULL,
+                data BLOB NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS {RESPONSES_TABLE} (
+                id INTEGER PRIMARY KEY,
+                job_type TEXT NOT NULL,
+                task_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                digest BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_{RESPONSES_TABLE}_task ON {RESPONSES_TABLE} (job_type, task_key, id);
+            CREATE TABLE IF NOT EXISTS {DICTS_TABLE} (
+                id INTEGER PRIMARY KEY,
+                job_type TEXT NOT NULL,
+                data BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # --- writing ---------------------------------------------------------------------------
+
+    def put(self, task: CrawlTask, response: FetchedResponse) -> bytes:
+        """Archive one response; returns the digest of its body."""
+        digest = hashlib.sha256(response.body).digest()
+        with self.conn:
+            exists = self.conn.execute(f"SELECT 1 FROM {BLOBS_TABLE} WHERE digest = ?", (digest,)).fetchone()
+            if not exists:
+                codec, dict_id, data = self._compress(task.job_type, response.body)
+                self.conn.execute(
+                    f"INSERT INTO {BLOBS_TABLE} (digest, codec, dict_id, size, data) VALUES (?, ?, ?, ?, ?)",
+                    (digest, codec, dict_id, len(response.body), data),
+                )
+            self.conn.execute(
+                f"INSERT INTO {RESPONSES_TABLE} (job_type, task_key, payload, url, status, fetched_at, digest) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (task.job_type, task.key, json.dumps(task.payload), response.url, response.status, time.time(), digest),
+            )
+        return digest
+
+    def _compress(self, job_type: str, body: bytes) -> tuple[str, Optional[int], bytes]:
+        if zstandard is None:
+            return "zlib", None, zlib.compress(body, min(self.level, 9))
+        dict_id = self._job_dicts.get(job_type)
+        if dict_id is None and body:
+            samples = self._samples.setdefault(job_type, [])
+            samples.append(body)
+            if len(samples) >= DICT_SAMPLES:
+                dict_id = self._train_dictionary(job_type, samples)
+        if dict_id is None:
+            return "zstd", None, zstandard.ZstdCompressor(level=self.level).compress(body)
+        compressor = zstandard.ZstdCompressor(level=self.level, dict_data=zstandard.ZstdCompressionDict(self._dict(dict_id)))
+        return "zstd", dict_id, compressor.compress(body)
+
+    def _train_dictionary(self, job_type: str, samples: list[bytes]) -> Optional[int]:
+        del self._samples[job_type]
+        try:
+            trained = zstandard.train_dictionary(DICT_SIZE, samples, level=self.level)
+        except zstandard.ZstdError:
+            return None  # Too little (or too uniform) sample data; keep compressing without
+        cursor = self.conn.execute(
+            f"INSERT INTO {DICTS_TABLE} (job_type, data, created_at) VALUES (?, ?, ?)",
+            (job_type, trained.as_bytes(), time.time()),
+        )
+        self._job_dicts[job_type] = cursor.lastrowid
+        self._dicts[cursor.lastrowid] = trained.as_bytes()
+        return cursor.lastrowid
+
+    # --- reading ---------------------------------------------------------------------------
+
+    def _dict(self, dict_id: int) -> bytes:
+        if dict_id not in self._dicts:
+            (self._dicts[dict_id],) = self.conn.execute(
+                f"SELECT data FROM {DICTS_TABLE} WHERE id = ?", (dict_id,)
+            ).fetchone()
+        return self._dicts[dict_id]
+
+    def _decompress(self, codec: str, dict_id: Optional[int], data: bytes) -> bytes:
+        if codec == "zlib":
+            return zlib.decompress(data)
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("This archive holds zstd blobs; install zstandard to read it")
+            if dict_id is None:
+                return zstandard.ZstdDecompressor().decompress(data)
+            return zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(self._dict(dict_id))).decompress(data)
+        raise ValueError(f"Unknown codec {codec!r}")
+
+    def get(self, digest: bytes) -> bytes:
+        row = self.conn.execute(f"SELECT codec, dict_id, data FROM {BLOBS_TABLE} WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest.hex())
+        return self._decompress(*row)
+
+    def response_ids(self, job_type: str, *, latest_only: bool = True) -> list[int]:
+        """Archive row ids of ``job_type``; with ``latest_only`` just the newest fetch of each task."""
+        if latest_only:
+            query = f"SELECT MAX(id) FROM {RESPONSES_TABLE} WHERE job_type = ? GROUP BY task_key ORDER BY 1"
+        else:
+            query = f"SELECT id FROM {RESPONSES_TABLE} WHERE job_type = ? ORDER BY id"
+        return [row[0] for row in self.conn.execute(query, (job_type,))]
+
+    def load(self, ids: Sequence[int]) -> Iterator[tuple[CrawlTask, FetchedResponse]]:
+        """The archived task and response for each row id."""
+        placeholders = ", ".join("?" * len(ids))
+        rows = self.conn.execute(
+            f"""
+            SELECT r.job_type, r.task_key, r.payload, r.url, r.status, b.codec, b.dict_id, b.data
+            FROM {RESPONSES_TABLE} r JOIN {BLOBS_TABLE} b ON b.digest = r.digest
+            WHERE r.id IN ({placeholders})
+            ORDER BY r.id
+            """,
+            list(ids),
+        )
+        for job_type, key, payload, url, status, codec, dict_id, data in rows:
+            body = self._decompress(codec, dict_id, data)
+            yield CrawlTask(job_type, key, json.loads(payload)), FetchedResponse(status, url, body)
+
+    def stats(self) -> dict[str, int]:
+        responses, unique = self.conn.execute(
+            f"SELECT COUNT(*), COUNT(DISTINCT digest) FROM {RESPONSES_TABLE}"
+        ).fetchone()
+        raw, stored = self.conn.execute(f"SELECT COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM {BLOBS_TABLE}").fetchone()
+        return {"responses": responses, "unique_bodies": unique, "raw_bytes": raw, "stored_bytes": stored}
+
+
+__all__ = ["ResponseArchive"]
@@ -0,0 +1,182 @@
+"""Discovery and caching of the allabolag.se Next.js buildId.
+
+Every ``/_next/data/{buildId}/...`` URL 404s once the site redeploys. The current id is read
+from the ``__NEXT_DATA__`` blob on the home page and cached in the crawl database, so all
+fetchers share it; a 404 on a data URL triggers one re-discovery instead of a retry storm.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://www.allabolag.se"
+STATE_TABLE = "crawl_state"
+BUILD_ID_KEY = "next_build_id"
+BUILD_ID_MAX_AGE = 6 * 3600.0  # Seconds a cached id is trusted without a 404
+RECHECK_INTERVAL = 60.0  # Within this long of confirming the id, a lone 404 is taken as a real 404...
+NOT_FOUND_BURST = 3  # ...but this many of them re-check it anyway
+
+BUILD_ID_PATTERN = re.compile(r'"buildId"\s*:\s*"([^"]+)"')
+
+_refresh_lock = threading.Lock()
+_not_found_count = 0
+_confirmed_at = float("-inf")  # When a 404 last re-checked the id (time.monotonic)
+
+
+class BuildIdNotFound(RuntimeError):
+    """The home page did not contain a Next.js buildId."""
+
+
+def parse_build_id(html: str) -> str:
+    match = BUILD_ID_PATTERN.search(html)
+    if not match:
+        raise BuildIdNotFound("No buildId in the __NEXT_DATA__ of the home page")
+    return match.group(1)
+
+
+def _ensure_state_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+    )
+
+
+def load_cached_build_id(conn: sqlite3.Connection, max_age: Optional[float] = BUILD_ID_MAX_AGE) -> Optional[str]:
+    _ensure_state_table(conn)
+    row = conn.execute(f"SELECT value, updated_at FROM {STATE_TABLE} WHERE key = ?", (BUILD_ID_KEY,)).fetchone()
+    if row is None or (max_age is not None and time.time() - row[1] > max_age):
+        return None
+    return row[0]
+
+
+def store_build_id(conn: sqlite3.Connection, build_id: str) -> None:
+    _ensure_state_table(conn)
+    with conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO {STATE_TABLE} (key, value, updated_at) VALUES (?, ?, ?)",
+            (BUILD_ID_KEY, build_id, time.time()),
+        )
+
+
+def discover_build_id(base_url: str = DEFAULT_BASE_URL, timeout: float = 30.0) -> str:
+    resp = requests.get(f"{base_url}/", timeout=timeout)
+    resp.raise_for_status()
+    return parse_build_id(resp.text)
+
+
+def get_build_id(db_path: str | Path = "allabolag.db", *, base_url: str = DEFAULT_BASE_URL) -> str:
+    """Cached buildId for synchronous scripts, discovered from the home page when missing or old."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        build_id = load_cached_build_id(conn)
+        if build_id is None:
+            with _refresh_lock:
+                build_id = load_cached_build_id(conn)
+                if build_id is None:
+                    build_id = discover_build_id(base_url)
+                    store_build_id(conn, build_id)
+                    logger.info(f"Discovered buildId {build_id}")
+        return build_id
+    finally:
+        conn.close()
+
+
+def refresh_build_id(stale: str, db_path: str | Path = "allabolag.db", *, base_url: str = DEFAULT_BASE_URL) -> str:
+    """Re-discover after a 404 on ``stale``; threads that hit the same 404 share one home page fetch.
+
+    Returns the id to retry with, which equals ``stale`` when the site has not redeployed.
+    """
+    global _confirmed_at, _not_found_count
+    with _refresh_lock:
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            cached = load_cached_build_id(conn, max_age=None)
+            if cached is not None and cached != stale:
+                return cached  # Already refreshed by another worker
+            _not_found_count += 1
+            if time.monotonic() - _confirmed_at < RECHECK_INTERVAL and _not_found_count < NOT_FOUND_BURST:
+                return stale
+            build_id = discover_build_id(base_url)
+            _confirmed_at = time.monotonic()
+            _not_found_count = 0
+            store_build_id(conn, build_id)
+            if build_id != stale:
+                logger.warning(f"buildId changed from {stale} to {build_id}")
+            return build_id
+        finally:
+            conn.close()
+
+
+class BuildIdResolver:
+    """Current buildId for the asyncio crawler.
+
+    A 404 on a data URL re-checks the home page unless the id was confirmed within
+    ``RECHECK_INTERVAL``; a burst of ``NOT_FOUND_BURST`` 404s re-checks regardless. Concurrent
+    404s wait on one re-discovery rather than each fetching the home page.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, base_url: str, build_id: Optional[str] = None) -> None:
+        self.conn = conn
+        self.base_url = base_url
+        self.build_id = build_id
+        self.refreshes = 0
+        self._confirmed_at = float("-inf")
+        self._not_found = 0
+        self._lock = asyncio.Lock()
+
+    async def ensure(self, session: aiohttp.ClientSession) -> str:
+        if self.build_id is None:
+            self.build_id = load_cached_build_id(self.conn)
+        if self.build_id is None:
+            await self._rediscover(session)
+        return self.build_id
+
+    async def handle_not_found(self, session: aiohttp.ClientSession, used: str) -> bool:
+        """Whether a 404 for a request made with ``used`` was caused by a redeploy (so it is worth retrying)."""
+        async with self._lock:
+            if self.build_id != used:
+                return True  # Another worker already switched to the new id
+            self._not_found += 1
+            if time.monotonic() - self._confirmed_at < RECHECK_INTERVAL and self._not_found < NOT_FOUND_BURST:
+                return False
+            previous = self.build_id
+            await self._rediscover(session)
+            self._confirmed_at = time.monotonic()
+            self._not_found = 0
+            if self.build_id != previous:
+                logger.warning(f"buildId changed from {previous} to {self.build_id}")
+                return True
+            return False
+
+    async def _rediscover(self, session: aiohttp.ClientSession) -> None:
+        async with session.get(f"{self.base_url}/") as resp:
+            resp.raise_for_status()
+            self.build_id = parse_build_id(await resp.text())
+        self.refreshes += 1
+        store_build_id(self.conn, self.build_id)
+        logger.info(f"Using buildId {self.build_id}")
+
+
+__all__ = [
+    "BUILD_ID_MAX_AGE",
+    "BuildIdNotFound",
+    "BuildIdResolver",
+    "DEFAULT_BASE_URL",
+    "discover_build_id",
+    "get_build_id",
+    "load_cached_build_id",
+    "parse_build_id",
+    "refresh_build_id",
+    "store_build_id",
+]
@@ -0,0 +1,70 @@
+"""Configuration for the asyncio allabolag crawler."""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict
+
+from .rate_control import AIMDSettings
+
+
+@dataclass(slots=True)
+class CrawlerConfig:
+    """Connection, politeness and retry settings shared by every job type."""
+
+    db_path: Path = Path("allabolag.db")
+    base_url: str = "https://www.allabolag.se"
+    build_id: str | None = None  # Next.js buildId; discovered from the home page (and cached) when unset
+    concurrency: int = 4  # Starting per-host concurrency; adapted (AIMD) from responses...
+    min_concurrency: int = 1
+    max_concurrency: int = 32  # ...within these bounds
+    target_latency: float = 2.0  # Seconds; slower responses stop the concurrency from growing
+    requests_per_second: float = 0.0  # Optional hard ceiling across all job types (0: adaptive limit only)
+    burst: int = 5
+    timeout: float = 30.0
+    max_attempts: int = 5
+    backoff_base: float = 2.0
+    backoff_max: float = 60.0
+    user_agent: str = "Mozilla/5.0 (compatible; NivoCrawler/1.0; +https://nivogroup.se)"
+    limit: int | None = None  # Cap on tasks claimed in one run, for test runs
+    claim_batch: int = 50  # Frontier tasks leased per claim
+    lease_seconds: float = 300.0  # After this a claimed task is considered abandoned and reclaimable
+    progress_interval: float = 30.0  # Seconds between progress log lines (and metrics file updates)
+    metrics_path: Path | None = None  # JSON snapshot of the live rate-control metrics
+    archive_path: Path | None = None  # Raw response archive (see archive.py); None disables archiving
+
+    def aimd_settings(self) -> AIMDSettings:
+        return AIMDSettings(
+            initial=self.concurrency,
+            minimum=self.min_concurrency,
+            maximum=self.max_concurrency,
+            target_latency=self.target_latency,
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered exponential delay before retry number ``attempt``."""
+        delay = min(self.backoff_max, self.backoff_base ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+
+@dataclass(slots=True)
+class SegmentationConfig:
+    """Query sent to segmentation.json (see SEGMENTATION_PARAMS in fetch_allabolag.py)."""
+
+    params: Dict[str, Any] = field(
+        default_factory=lambda: {
+            "profitFrom": 500,
+            "profitTo": 87067716,
+            "companyType": "AB",
+            "revenueFrom": 50000,
+            "revenueTo": 150000,
+        }
+    )
+    start_page: int = 1
+    exclude_nace_keywords: tuple[str, ...] = ()  # Companies in these NACE categories are skipped...
+    exception_nace: str | None = None  # ...unless they are also in this one
+
+
+__all__ = ["CrawlerConfig", "SegmentationConfig"]
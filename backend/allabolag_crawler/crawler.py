@@ -0,0 +1,399 @@
+"""Asyncio crawler running every allabolag job type over one shared HTTP session."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+import aiohttp
+
+from .archive import ResponseArchive
+from .build_id import BuildIdNotFound, BuildIdResolver
+from .config import CrawlerConfig
+from .frontier import CrawlFrontier
+from .jobs import CrawlJob, CrawlTask, FetchedResponse, JobResult
+from .rate_control import AsyncAdaptiveLimiter, parse_retry_after
+from .writer import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class AsyncRateLimiter:
+    """Token bucket shared by all workers: at most ``rate`` requests per second on average."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass(slots=True)
+class CrawlStats:
+    fetched: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    retried: int = 0
+    records: int = 0
+    by_job: dict[str, int] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.fetched / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "fetched": self.fetched,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "records": self.records,
+            "by_job": dict(self.by_job),
+            "elapsed": round(self.elapsed, 1),
+            "requests_per_second": round(self.requests_per_second, 2),
+        }
+
+    def summary(self) -> str:
+        return (
+            f"{self.succeeded} done, {self.failed} failed, {self.retried} retried, {self.records} rows "
+            f"in {self.elapsed:.0f}s ({self.requests_per_second:.1f} req/s)"
+        )
+
+
+class AllabolagCrawler:
+    """Runs crawl tasks for any mix of job types with adaptive per-host concurrency.
+
+    Work comes from the durable :class:`CrawlFrontier` in the crawl database: seeds and
+    follow-ups are added to it, and tasks are claimed from it in leased batches, so an
+    interrupted crawl resumes where it stopped and finished tasks are never fetched again.
+    One ``aiohttp`` session (keep-alive connection pool) serves every request. Concurrency per
+    host follows an AIMD controller (see :mod:`.rate_control`): it grows while responses are fast
+    and clean, and halves on 429/5xx/timeouts, so the crawl runs close to what the site tolerates
+    instead of at a hand-picked constant. Throttling and server errors are retried with jittered exponential backoff, honouring ``Retry-After``;
+    a retried task goes back to the frontier with a ``next_retry_at`` instead of blocking a worker.
+    A 404 on a ``/_next/data`` URL re-checks the buildId once; when the site has redeployed,
+    the task is retried right away with the new id without spending an attempt.
+    """
+
+    def __init__(self, config: CrawlerConfig, jobs: Sequence[CrawlJob]) -> None:
+        self.config = config
+        self.jobs = {job.name: job for job in jobs}
+        self.stats = CrawlStats()
+        self.frontier: Optional[CrawlFrontier] = None
+        self.build_ids: Optional[BuildIdResolver] = None
+        self.archive: Optional[ResponseArchive] = None
+        self._archive_thread: Optional[ThreadPoolExecutor] = None
+        self._frontier_thread: Optional[ThreadPoolExecutor] = None
+        self.writer: Optional[BatchWriter] = None
+        self._queue: asyncio.Queue[Optional[CrawlTask]] = asyncio.Queue()
+        self._in_flight = 0  # Claimed tasks not yet committed, retried or failed
+        self._claimed = 0
+        self._wakeup = asyncio.Event()
+        self._limiter = AsyncRateLimiter(config.requests_per_second, config.burst)
+        self.rate_control = AsyncAdaptiveLimiter(config.aimd_settings())
+        self._conn: Optional[sqlite3.Connection] = None  # Seeding and the buildId cache
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def run(self, seeds: Optional[Iterable[CrawlTask]] = None) -> CrawlStats:
+        """Add ``seeds`` (default: every job's own seed) to the frontier and crawl until it is drained."""
+        self.stats = CrawlStats()
+        self._loop = asyncio.get_running_loop()
+        self._conn = sqlite3.connect(self.config.db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        # Claims run on their own thread and connection, so the loop never waits for the SQLite write
+        # lock; retries and failures go through the writer like completions do
+        self._frontier_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crawl-frontier")
+        self.frontier = self._frontier_thread.submit(self._open_frontier).result()
+        self.writer = BatchWriter(self.config.db_path).start()
+        if self.config.archive_path is not None:
+            # The archive lives on its own thread: compression, dictionary training and its commits stay off the loop
+            self._archive_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-archive")
+            self.archive = self._archive_thread.submit(ResponseArchive, self.config.archive_path).result()
+        try:
+            added = await self._on_frontier(self.frontier.add, list(seeds) if seeds is not None else self._seed_tasks())
+            logger.info(f"Added {added} new tasks to the frontier; queue: {await self._frontier_summary()}")
+
+            connector = aiohttp.TCPConnector(
+                limit=self.config.max_concurrency,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            async with aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.config.timeout),
+                headers={"User-Agent": self.config.user_agent, "Accept": "application/json, text/html;q=0.9"},
+            ) as session:
+                self._session = session
+                self.build_ids = BuildIdResolver(self._conn, self.config.base_url, self.config.build_id)
+                logger.info(f"Using buildId {await self.build_ids.ensure(session)}")
+                # One worker per possible slot; the adaptive limiter decides how many fetch at once
+                workers = [asyncio.create_task(self._worker()) for _ in range(self.config.max_concurrency)]
+                progress = asyncio.create_task(self._report_progress())
+                try:
+                    await self._feed()
+                finally:
+                    while not self._queue.empty():  # Interrupted: unstarted leases are released below
+                        self._queue.get_nowait()
+                    for _ in workers:
+                        self._queue.put_nowait(None)
+                    await asyncio.gather(*workers)
+                    progress.cancel()
+            self._write_metrics()
+            logger.info(f"Crawl finished: {self.stats.summary()}; queue: {await self._frontier_summary()}")
+            return self.stats
+        finally:
+            self.writer.close()  # Commits what is still queued before the leases are released
+            released = self._frontier_thread.submit(self.frontier.release).result()
+            if released:
+                logger.info(f"Released {released} unfinished tasks back to the frontier")
+            self._frontier_thread.submit(self.frontier.conn.close)
+            self._frontier_thread.shutdown(wait=True)
+            self._frontier_thread = None
+            self._session = None
+            self._conn.close()
+            self._conn = None
+            if self.archive is not None:
+                self._archive_thread.submit(self.archive.close)
+                self._archive_thread.shutdown(wait=True)  # Archives the queued responses first
+                self.archive = None
+                self._archive_thread = None
+
+    def _seed_tasks(self) -> list[CrawlTask]:
+        tasks: list[CrawlTask] = []
+        for job in self.jobs.values():
+            seeded = list(job.seed(self._conn))
+            logger.info(f"Seeded {len(seeded)} {job.name} tasks")
+            tasks.extend(seeded)
+        return tasks
+
+    def _open_frontier(self) -> CrawlFrontier:
+        """Runs on the frontier thread, which owns the connection from then on."""
+        conn = sqlite3.connect(self.config.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return CrawlFrontier(conn, lease_seconds=self.config.lease_seconds)
+
+    def _on_frontier(self, fn: Callable[..., Any], *args: Any) -> asyncio.Future:
+        return self._loop.run_in_executor(self._frontier_thread, fn, *args)
+
+    async def _frontier_summary(self) -> str:
+        counts = await self._on_frontier(self.frontier.counts)
+        return "; ".join(
+            f"{job_type} " + ", ".join(f"{count} {status}" for status, count in sorted(counts[job_type].items()))
+            for job_type in self.jobs
+            if job_type in counts
+        ) or "empty"
+
+    async def _feed(self) -> None:
+        """Keep the workers supplied with claimed tasks until the frontier has nothing left."""
+        job_types = list(self.jobs)
+        while True:
+            self._wakeup.clear()
+            if not self.writer.running:
+                raise RuntimeError("SQLite writer thread stopped; claimed tasks can no longer be finished")
+            if self._queue.qsize() < self.config.max_concurrency:
+                batch = self.config.claim_batch
+                if self.config.limit is not None:
+                    batch = min(batch, self.config.limit - self._claimed)
+                tasks = await self._on_frontier(self.frontier.claim, job_types, batch)
+                for task in tasks:
+                    self._in_flight += 1
+                    self._claimed += 1
+                    self._queue.put_nowait(task)
+                if tasks:
+                    continue
+                if self._in_flight == 0:
+                    due = None if batch <= 0 else await self._on_frontier(self.frontier.next_due, job_types)
+                    if due is None:
+                        return
+                    # Only backed-off retries (or another crawler's leases) remain
+                    await asyncio.sleep(min(max(due - time.time(), 0.05), 5.0))
+                    continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    def _task_finished(self) -> None:
+        self._in_flight -= 1
+        self._wakeup.set()
+
+    async def _worker(self) -> None:
+        while True:
+            task = await self._queue.get()
+            if task is None:
+                return
+            try:
+                await self._process(task)
+            except Exception as exc:  # Parsing bugs must not kill the worker
+                self.stats.failed += 1
+                logger.error(f"{task.job_type} {task.key}: {exc}")
+                task.attempts += 1
+                self._fail(task, f"{type(exc).__name__}: {exc}")
+
+    async def _process(self, task: CrawlTask) -> None:
+        """Fetch and parse ``task`` and hand the outcome to the writer, which finishes the task once committed."""
+        job = self.jobs[task.job_type]
+        build_id = self.build_ids.build_id
+        spec = job.request(task, self.config.base_url, build_id)
+        await self.rate_control.acquire(spec.url)
+        started = time.monotonic()
+        response: Optional[FetchedResponse] = None
+        try:
+            await self._limiter.acquire()
+            started = time.monotonic()
+            async with self._session.get(spec.url, params=spec.params, allow_redirects=True) as resp:
+                body = await resp.read() if spec.read_body else b""
+                response = FetchedResponse(resp.status, str(resp.url), body, dict(resp.headers))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            self._retry_or_fail(task, f"{type(exc).__name__}: {exc}", None)
+            return
+        finally:
+            # Every outcome gives the slot back (unexpected errors and cancellation count as failures),
+            # otherwise the host's in-flight count leaks and its concurrency shrinks for good
+            if response is None:
+                await self.rate_control.release(spec.url, None, time.monotonic() - started)
+            else:
+                await self.rate_control.release(
+                    spec.url, response.status, time.monotonic() - started, parse_retry_after(response.headers.get("Retry-After"))
+                )
+        self.stats.fetched += 1
+
+        if response.status == 404 and build_id in spec.url:
+            try:
+                redeployed = await self.build_ids.handle_not_found(self._session, build_id)
+            except (aiohttp.ClientError, asyncio.TimeoutError, BuildIdNotFound) as exc:
+                self._retry_or_fail(task, f"buildId check failed: {exc}", None)
+                return
+            if redeployed:
+                self._retry(task, f"stale buildId {build_id}", 0)
+                return
+        if response.status in RETRYABLE_STATUS_CODES:
+            self._retry_or_fail(task, f"HTTP {response.status}", response.headers.get("Retry-After"))
+            return
+        if response.status != 200:
+            self.stats.failed += 1
+            logger.warning(f"{task.job_type} {task.key}: HTTP {response.status}, giving up")
+            task.attempts += 1
+            self._fail(task, f"HTTP {response.status}")
+            return
+
+        if self.archive is not None:
+            # Queued before parsing, so a parser bug can be fixed and re-run offline
+            self._archive_thread.submit(self._archive_response, self.archive, task, response)
+        result = job.parse(task, response)
+        # Records, completion and follow-ups commit together in the writer's next batch: a crash
+        # never leaves stored results behind a task that is still pending
+        self.writer.write(
+            job=job,
+            results=[(task, result)],
+            complete=[task],
+            follow_ups=result.follow_ups,
+            callback=self._store_callback(job, task, result),
+        )
+
+    @staticmethod
+    def _archive_response(archive: ResponseArchive, task: CrawlTask, response: FetchedResponse) -> None:
+        """Runs on the archive thread; a failed archive write must not fail the crawl."""
+        try:
+            archive.put(task, response)
+        except Exception as exc:
+            logger.warning(f"Could not archive {task.job_type} {task.key}: {type(exc).__name__}: {exc}")
+
+    def _store_callback(
+        self, job: CrawlJob, task: CrawlTask, result: JobResult
+    ) -> Callable[[int, Optional[BaseException]], None]:
+        """Runs on the writer thread, so ``job.stored`` sees the commit before the next batch is stored."""
+        def committed(written: int, error: Optional[BaseException]) -> None:
+            try:
+                if error is None:
+                    job.stored([(task, result)])
+            finally:
+                self._loop.call_soon_threadsafe(self._stored, task, written, error)
+
+        return committed
+
+    def _stored(self, task: CrawlTask, written: int, error: Optional[BaseException]) -> None:
+        if error is None:
+            self.stats.records += written
+            self.stats.succeeded += 1
+            self.stats.by_job[task.job_type] = self.stats.by_job.get(task.job_type, 0) + 1
+        else:
+            self.stats.failed += 1
+            task.attempts += 1
+            self._fail(task, f"storage: {type(error).__name__}: {error}")
+            return
+        self._task_finished()
+
+    def _retry(self, task: CrawlTask, reason: str, delay: float) -> None:
+        self.writer.write(retry=[(task, reason, delay)], callback=self._frontier_callback(task))
+
+    def _fail(self, task: CrawlTask, reason: str) -> None:
+        self.writer.write(fail=[(task, reason)], callback=self._frontier_callback(task))
+
+    def _frontier_callback(self, task: CrawlTask) -> Callable[[int, Optional[BaseException]], None]:
+        """Finishes ``task`` on the loop once the writer has committed its retry or failure."""
+        def updated(written: int, error: Optional[BaseException]) -> None:
+            if error is not None:
+                logger.error(f"{task.job_type} {task.key}: frontier update failed ({error}); its lease will expire")
+            self._task_finished()
+
+        return lambda written, error: self._loop.call_soon_threadsafe(updated, written, error)
+
+    def _retry_or_fail(self, task: CrawlTask, reason: str, retry_after: Optional[str]) -> None:
+        task.attempts += 1
+        if task.attempts >= self.config.max_attempts:
+            self.stats.failed += 1
+            logger.warning(f"{task.job_type} {task.key}: {reason}, giving up after {task.attempts} attempts")
+            self._fail(task, reason)
+            return
+        delay = max(self.config.backoff(task.attempts), parse_retry_after(retry_after) or 0.0)
+        self.stats.retried += 1
+        logger.info(f"{task.job_type} {task.key}: {reason}, retry {task.attempts} in {delay:.1f}s")
+        self._retry(task, reason, delay)
+
+    async def _report_progress(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.progress_interval)
+            logger.info(f"Progress: {self.stats.summary()}, {self._in_flight} claimed; {self.rate_control.summary()}")
+            self._write_metrics()
+
+    def _write_metrics(self) -> None:
+        if self.config.metrics_path is None:
+            return
+        try:
+            self.rate_control.write_metrics(self.config.metrics_path, {"crawl": self.stats.as_dict()})
+        except OSError as exc:
+            logger.warning(f"Could not write metrics to {self.config.metrics_path}: {exc}")
+
+
+__all__ = ["AllabolagCrawler", "AsyncRateLimiter", "CrawlStats"]
@@ -0,0 +1,212 @@
+"""Durable crawl frontier: every task's status, attempts and lease in SQLite."""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Iterable, Optional, Sequence
+
+from .jobs import CrawlTask
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+FRONTIER_TABLE = "crawl_frontier"
+
+
+def add_tasks(conn: sqlite3.Connection, tasks: Iterable[CrawlTask]) -> int:
+    """Insert tasks that are not yet known, in the caller's transaction; returns how many were new."""
+    now = time.time()
+    before = conn.total_changes
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {FRONTIER_TABLE} (job_type, task_key, payload, updated_at) VALUES (?, ?, ?, ?)",
+        [(task.job_type, task.key, json.dumps(task.payload), now) for task in tasks],
+    )
+    return conn.total_changes - before
+
+
+def complete_tasks(conn: sqlite3.Connection, tasks: Iterable[CrawlTask]) -> None:
+    """Mark tasks done, in the caller's transaction (the one that stores their results)."""
+    now = time.time()
+    conn.executemany(
+        f"UPDATE {FRONTIER_TABLE} SET status = '{DONE}', lease_owner = NULL, lease_expires_at = NULL, "
+        "last_error = NULL, updated_at = ? WHERE job_type = ? AND task_key = ?",
+        [(now, task.job_type, task.key) for task in tasks],
+    )
+
+
+def retry_tasks(conn: sqlite3.Connection, retries: Iterable[tuple[CrawlTask, str, float]]) -> None:
+    """Record failed attempts as ``(task, error, delay)``, each claimable again after ``delay`` seconds, in the caller's transaction."""
+    now = time.time()
+    conn.executemany(
+        f"UPDATE {FRONTIER_TABLE} SET status = '{PENDING}', attempts = ?, next_retry_at = ?, last_error = ?, "
+        "lease_owner = NULL, lease_expires_at = NULL, updated_at = ? WHERE job_type = ? AND task_key = ?",
+        [(task.attempts, now + delay, error, now, task.job_type, task.key) for task, error, delay in retries],
+    )
+
+
+def fail_tasks(conn: sqlite3.Connection, failures: Iterable[tuple[CrawlTask, str]]) -> None:
+    """Give up on ``(task, error)`` pairs, in the caller's transaction."""
+    now = time.time()
+    conn.executemany(
+        f"UPDATE {FRONTIER_TABLE} SET status = '{FAILED}', attempts = ?, last_error = ?, "
+        "lease_owner = NULL, lease_expires_at = NULL, updated_at = ? WHERE job_type = ? AND task_key = ?",
+        [(task.attempts, error, now, task.job_type, task.key) for task, error in failures],
+    )
+
+
+class CrawlFrontier:
+    """Work queue persisted in the crawl database.
+
+    Tasks are keyed by ``(job_type, task_key)`` and never re-added once known, so completed
+    work is not redone across restarts. Crawlers claim pending tasks in batches under a
+    time-limited lease; leases left behind by a crashed process expire and the tasks become
+    claimable again. Failed attempts are rescheduled through ``next_retry_at``.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, *, lease_seconds: float = 300.0, owner: Optional[str] = None) -> None:
+        self.conn = conn
+        self.lease_seconds = lease_seconds
+        self.owner = owner or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {FRONTIER_TABLE} (
+                job_type TEXT NOT NULL,
+                task_key TEXT NOT NULL,
+                payload TEXT NOT NULL DEFAULT '{{}}',
+                status TEXT NOT NULL DEFAULT '{PENDING}',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_retry_at REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_type, task_key)
+            )
+            """
+        )
+        self.conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{FRONTIER_TABLE}_claim ON {FRONTIER_TABLE} (job_type, status, next_retry_at)"
+        )
+        self.conn.commit()
+
+    def add(self, tasks: Iterable[CrawlTask], *, commit: bool = True) -> int:
+        """Insert tasks that are not yet known; returns how many were new."""
+        added = add_tasks(self.conn, tasks)
+        if commit:
+            self.conn.commit()
+        return added
+
+    def claim(self, job_types: Sequence[str], limit: int) -> list[CrawlTask]:
+        """Lease up to ``limit`` due tasks (pending, or leased with an expired lease)."""
+        if limit <= 0 or not job_types:
+            return []
+        now = time.time()
+        placeholders = ", ".join("?" * len(job_types))
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute(
+                f"""
+                SELECT job_type, task_key, payload, attempts FROM {FRONTIER_TABLE}
+                WHERE job_type IN ({placeholders})
+                  AND ((status = '{PENDING}' AND next_retry_at <= ?)
+                       OR (status = '{LEASED}' AND lease_expires_at <= ?))
+                ORDER BY next_retry_at
+                LIMIT ?
+                """,
+                [*job_types, now, now, limit],
+            ).fetchall()
+            self.conn.executemany(
+                f"UPDATE {FRONTIER_TABLE} SET status = '{LEASED}', lease_owner = ?, lease_expires_at = ?, updated_at = ? "
+                "WHERE job_type = ? AND task_key = ?",
+                [(self.owner, now + self.lease_seconds, now, job_type, key) for job_type, key, _, _ in rows],
+            )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return [CrawlTask(job_type, key, json.loads(payload), attempts) for job_type, key, payload, attempts in rows]
+
+    def complete(self, tasks: Iterable[CrawlTask]) -> None:
+        """Mark tasks done. Does not commit: call inside the transaction that stores their results."""
+        complete_tasks(self.conn, tasks)
+
+    def retry(self, task: CrawlTask, error: str, delay: float) -> None:
+        """Record a failed attempt and make the task claimable again after ``delay`` seconds."""
+        with self.conn:
+            retry_tasks(self.conn, [(task, error, delay)])
+
+    def fail(self, task: CrawlTask, error: str) -> None:
+        with self.conn:
+            fail_tasks(self.conn, [(task, error)])
+
+    def release(self) -> int:
+        """Return this crawler's unfinished leases to the queue (on shutdown) without counting an attempt."""
+        with self.conn:
+            cursor = self.conn.execute(
+                f"UPDATE {FRONTIER_TABLE} SET status = '{PENDING}', lease_owner = NULL, lease_expires_at = NULL, "
+                f"updated_at = ? WHERE status = '{LEASED}' AND lease_owner = ?",
+                (time.time(), self.owner),
+            )
+        return cursor.rowcount
+
+    def requeue_failed(self, job_types: Sequence[str]) -> int:
+        placeholders = ", ".join("?" * len(job_types))
+        with self.conn:
+            cursor = self.conn.execute(
+                f"UPDATE {FRONTIER_TABLE} SET status = '{PENDING}', attempts = 0, next_retry_at = 0, updated_at = ? "
+                f"WHERE status = '{FAILED}' AND job_type IN ({placeholders})",
+                [time.time(), *job_types],
+            )
+        return cursor.rowcount
+
+    def requeue_done(self, job_types: Sequence[str]) -> int:
+        """Make finished tasks of ``job_types`` claimable again, e.g. to re-crawl segmentation pages for new companies."""
+        placeholders = ", ".join("?" * len(job_types))
+        with self.conn:
+            cursor = self.conn.execute(
+                f"UPDATE {FRONTIER_TABLE} SET status = '{PENDING}', attempts = 0, next_retry_at = 0, updated_at = ? "
+                f"WHERE status = '{DONE}' AND job_type IN ({placeholders})",
+                [time.time(), *job_types],
+            )
+        return cursor.rowcount
+
+    def next_due(self, job_types: Sequence[str]) -> Optional[float]:
+        """Earliest time a task of ``job_types`` becomes claimable, or None if nothing is left to do."""
+        placeholders = ", ".join("?" * len(job_types))
+        row = self.conn.execute(
+            f"""
+            SELECT MIN(CASE WHEN status = '{PENDING}' THEN next_retry_at ELSE lease_expires_at END)
+            FROM {FRONTIER_TABLE}
+            WHERE job_type IN ({placeholders}) AND status IN ('{PENDING}', '{LEASED}')
+            """,
+            list(job_types),
+        ).fetchone()
+        return row[0]
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        counts: dict[str, dict[str, int]] = {}
+        for job_type, status, count in self.conn.execute(
+            f"SELECT job_type, status, COUNT(*) FROM {FRONTIER_TABLE} GROUP BY job_type, status"
+        ):
+            counts.setdefault(job_type, {})[status] = count
+        return counts
+
+
+__all__ = [
+    "CrawlFrontier",
+    "DONE",
+    "FAILED",
+    "FRONTIER_TABLE",
+    "LEASED",
+    "PENDING",
+    "add_tasks",
+    "complete_tasks",
+    "fail_tasks",
+    "retry_tasks",
+]
@@ -0,0 +1,378 @@
+"""Pluggable job types for the allabolag crawler.
+
+A job type knows how to seed its work from the database, which URL to fetch for a task,
+how to parse the response into records (and follow-up tasks), and how to store them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Mapping, Optional
+
+from .accounts import ACCOUNT_ITEMS_TABLE, ACCOUNTS_FORMATS, store_accounts
+from .config import SegmentationConfig
+from .storage import insert_records, table_columns, table_exists
+
+COMPANIES_TABLE = "segmentation_companies_raw"
+ACCOUNTS_TABLE = "company_accounts_by_id"
+ORGNR_ACCOUNTS_TABLE = "company_accounts"  # Written by enrich_financials.py
+
+
+@dataclass(slots=True)
+class CrawlTask:
+    job_type: str
+    key: str
+    payload: dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+
+
+@dataclass(slots=True)
+class FetchSpec:
+    url: str
+    params: Optional[dict[str, Any]] = None
+    read_body: bool = True  # False when only the status and final (redirected) URL matter
+
+
+@dataclass(slots=True)
+class FetchedResponse:
+    status: int
+    url: str
+    body: bytes
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+@dataclass(slots=True)
+class JobResult:
+    records: list[dict[str, Any]] = field(default_factory=list)
+    follow_ups: list[CrawlTask] = field(default_factory=list)
+
+
+class CrawlJob:
+    """Base class for a crawl job type."""
+
+    name: str = ""
+
+    def seed(self, conn: sqlite3.Connection) -> Iterable[CrawlTask]:
+        """Tasks still to be done, derived from the database."""
+        return []
+
+    def request(self, task: CrawlTask, base_url: str, build_id: str) -> FetchSpec:
+        raise NotImplementedError
+
+    def parse(self, task: CrawlTask, response: FetchedResponse) -> JobResult:
+        raise NotImplementedError
+
+    def store(self, conn: sqlite3.Connection, results: list[tuple[CrawlTask, JobResult]]) -> int:
+        """Persist the records of ``results``; returns the number of rows written."""
+        raise NotImplementedError
+
+    def stored(self, results: list[tuple[CrawlTask, JobResult]]) -> None:
+        """Called once the transaction holding ``results`` has committed (not after a rollback)."""
+
+
+def extract_segmentation_companies(
+    data: Mapping[str, Any],
+    *,
+    exclude_nace_keywords: Iterable[str] = (),
+    exception_nace: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    exclude_nace_keywords = tuple(exclude_nace_keywords)
+    companies = []
+    for company in data["pageProps"]["companies"]:
+        nace_categories = company.get("naceCategories") or []
+        if exception_nace and any(exception_nace in category for category in nace_categories):
+            pass  # Always keep if the exception is present
+        elif any(keyword in category for category in nace_categories for keyword in exclude_nace_keywords):
+            continue
+        companies.append({
+            "companyId": company.get("companyId") or company.get("organisationNumber"),
+            "organisationNumber": company.get("organisationNumber"),
+            "name": company.get("name"),
+            "homePage": company.get("homePage"),
+            "naceCategories": json.dumps(nace_categories),
+            "revenue": company.get("revenue"),
+            "profit": company.get("profit"),
+            "foundationYear": company.get("foundationYear"),
+        })
+    return companies
+
+
+def extract_account_rows(
+    data: Mapping[str, Any],
+    *,
+    company_id: Optional[str],
+    orgnr: Optional[str],
+    name: Optional[str],
+) -> list[dict[str, Any]]:
+    """One wide row per reported period, with each account code as its own column."""
+    company = (data.get("pageProps") or {}).get("company") or {}
+    rows = []
+    for account in company.get("companyAccounts") or []:
+        row = {
+            "companyId": company_id,
+            "organisationNumber": orgnr,
+            "name": name,
+            "year": account.get("year"),
+            "period": account.get("period"),
+            "periodStart": account.get("periodStart"),
+            "periodEnd": account.get("periodEnd"),
+            "length": account.get("length"),
+            "currency": account.get("currency"),
+            "remark": account.get("remark"),
+            "referenceUrl": account.get("referenceUrl"),
+            "accIncompleteCode": account.get("accIncompleteCode"),
+            "accIncompleteDesc": account.get("accIncompleteDesc"),
+        }
+        for item in account.get("accounts") or []:
+            if item.get("code"):
+                row[item["code"]] = item.get("amount")
+        rows.append(row)
+    return rows
+
+
+def segmentation_task_key(
+    params: Mapping[str, Any],
+    page: int,
+    *,
+    exclude_nace_keywords: Iterable[str] = (),
+    exception_nace: Optional[str] = None,
+) -> str:
+    """Frontier key of a segmentation page: a short hash of the query and filters, then the page number."""
+    query = {
+        "params": dict(params),
+        "exclude_nace_keywords": sorted(exclude_nace_keywords),
+        "exception_nace": exception_nace,
+    }
+    digest = hashlib.sha1(json.dumps(query, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+    return f"{digest}:{page}"
+
+
+class SegmentationPageJob(CrawlJob):
+    """Walks segmentation.json result pages, following ``pagination.next``.
+
+    Pages are keyed by query and number (see :func:`segmentation_task_key`), so the frontier
+    never queues a page twice for the same query, while a run with other parameters or NACE
+    filters starts its own walk instead of finding the pages already done.
+    """
+
+    name = "segmentation"
+
+    def __init__(self, config: Optional[SegmentationConfig] = None) -> None:
+        self.config = config or SegmentationConfig()
+        self._known_ids: set[str] = set()
+
+    def seed(self, conn: sqlite3.Connection) -> Iterable[CrawlTask]:
+        if table_exists(conn, COMPANIES_TABLE):
+            self._known_ids = {str(row[0]) for row in conn.execute(f"SELECT companyId FROM {COMPANIES_TABLE}")}
+        return [self.page_task(self.config.start_page)]
+
+    def page_task(self, page: int) -> CrawlTask:
+        key = segmentation_task_key(
+            self.config.params,
+            page,
+            exclude_nace_keywords=self.config.exclude_nace_keywords,
+            exception_nace=self.config.exception_nace,
+        )
+        return CrawlTask(self.name, key, {"page": page})
+
+    def request(self, task: CrawlTask, base_url: str, build_id: str) -> FetchSpec:
+        return FetchSpec(
+            f"{base_url}/_next/data/{build_id}/segmentation.json",
+            params={**self.config.params, "page": task.payload["page"]},
+        )
+
+    def parse(self, task: CrawlTask, response: FetchedResponse) -> JobResult:
+        data = response.json()
+        companies = extract_segmentation_companies(
+            data,
+            exclude_nace_keywords=self.config.exclude_nace_keywords,
+            exception_nace=self.config.exception_nace,
+        )
+        # Only committed ids are known: a page whose write rolls back is stored again when retried
+        new_companies = [company for company in companies if str(company["companyId"]) not in self._known_ids]
+
+        result = JobResult(records=new_companies)
+        next_page = (data["pageProps"].get("pagination") or {}).get("next")
+        if next_page:
+            result.follow_ups.append(self.page_task(next_page))
+        return result
+
+    def store(self, conn: sqlite3.Connection, results: list[tuple[CrawlTask, JobResult]]) -> int:
+        # Pages parsed before an earlier page committed can still repeat its companies
+        records, seen = [], set()
+        for _, result in results:
+            for record in result.records:
+                company_id = str(record["companyId"])
+                if company_id not in seen and company_id not in self._known_ids:
+                    seen.add(company_id)
+                    records.append(record)
+        return insert_records(conn, COMPANIES_TABLE, records)
+
+    def stored(self, results: list[tuple[CrawlTask, JobResult]]) -> None:
+        self._known_ids.update([str(record["companyId"]) for _, result in results for record in result.records])
+
+
+class CompanyIdResolutionJob(CrawlJob):
+    """Resolves the allabolag companyId of an org number from the /company/{orgnr} redirect."""
+
+    name = "resolve"
+
+    def seed(self, conn: sqlite3.Connection) -> Iterable[CrawlTask]:
+        if not table_exists(conn, COMPANIES_TABLE):
+            return []
+        rows = conn.execute(
+            f"SELECT DISTINCT organisationNumber FROM {COMPANIES_TABLE} "
+            "WHERE organisationNumber IS NOT NULL AND (companyId IS NULL OR companyId = organisationNumber)"
+        )
+        return [CrawlTask(self.name, str(orgnr)) for (orgnr,) in rows]
+
+    def request(self, task: CrawlTask, base_url: str, build_id: str) -> FetchSpec:
+        return FetchSpec(f"{base_url}/company/{task.key}", read_body=False)
+
+    def parse(self, task: CrawlTask, response: FetchedResponse) -> JobResult:
+        # The final URL after redirects ends with the companyId
+        company_id = response.url.rstrip("/").split("/")[-1]
+        if not company_id or company_id == task.key:
+            return JobResult()
+        return JobResult(records=[{"organisationNumber": task.key, "companyId": company_id}])
+
+    def store(self, conn: sqlite3.Connection, results: list[tuple[CrawlTask, JobResult]]) -> int:
+        updates = [(record["companyId"], record["organisationNumber"]) for _, result in results for record in result.records]
+        conn.executemany(f"UPDATE {COMPANIES_TABLE} SET companyId = ? WHERE organisationNumber = ?", updates)
+        return len(updates)
+
+
+class FinancialsJob(CrawlJob):
+    """Fetches the annual accounts of a company by companyId.
+
+    ``accounts_format`` chooses the wide table, the long ``company_account_items`` table or both.
+    """
+
+    name = "financials"
+
+    def __init__(self, accounts_format: str = "wide") -> None:
+        if accounts_format not in ACCOUNTS_FORMATS:
+            raise ValueError(f"accounts_format must be one of {ACCOUNTS_FORMATS}, not {accounts_format!r}")
+        self.accounts_format = accounts_format
+
+    def seed(self, conn: sqlite3.Connection) -> Iterable[CrawlTask]:
+        if not table_exists(conn, COMPANIES_TABLE):
+            return []
+        query = (
+            f"SELECT companyId, organisationNumber, name FROM {COMPANIES_TABLE} "
+            "WHERE companyId IS NOT NULL AND companyId != organisationNumber"
+        )
+        if table_exists(conn, ACCOUNTS_TABLE) and "companyId" in table_columns(conn, ACCOUNTS_TABLE):
+            query += f" AND companyId NOT IN (SELECT companyId FROM {ACCOUNTS_TABLE} WHERE companyId IS NOT NULL)"
+        if table_exists(conn, ACCOUNT_ITEMS_TABLE):
+            query += f" AND companyId NOT IN (SELECT companyId FROM {ACCOUNT_ITEMS_TABLE} WHERE companyId IS NOT NULL)"
+        return [
+            CrawlTask(self.name, str(company_id), {"organisationNumber": orgnr, "name": name})
+            for company_id, orgnr, name in conn.execute(query)
+        ]
+
+    def request(self, task: CrawlTask, base_url: str, build_id: str) -> FetchSpec:
+        return FetchSpec(f"{base_url}/_next/data/{build_id}/company/{task.key}.json")
+
+    def parse(self, task: CrawlTask, response: FetchedResponse) -> JobResult:
+        return JobResult(records=extract_account_rows(
+            response.json(),
+            company_id=task.key,
+            orgnr=task.payload.get("organisationNumber"),
+            name=task.payload.get("name"),
+        ))
+
+    def store(self, conn: sqlite3.Connection, results: list[tuple[CrawlTask, JobResult]]) -> int:
+        records = [record for _, result in results for record in result.records]
+        return store_accounts(conn, ACCOUNTS_TABLE, records, self.accounts_format)
+
+
+class OrgnrFinancialsJob(CrawlJob):
+    """Fetches annual accounts by org number into ``company_accounts`` (the enrich_financials.py layout).
+
+    ``accounts_format`` works as for :class:`FinancialsJob`.
+    """
+
+    name = "enrich"
+
+    def __init__(self, accounts_format: str = "wide") -> None:
+        if accounts_format not in ACCOUNTS_FORMATS:
+            raise ValueError(f"accounts_format must be one of {ACCOUNTS_FORMATS}, not {accounts_format!r}")
+        self.accounts_format = accounts_format
+
+    def seed(self, conn: sqlite3.Connection) -> Iterable[CrawlTask]:
+        if not table_exists(conn, COMPANIES_TABLE):
+            return []
+        query = (
+            f"SELECT organisationNumber, name FROM {COMPANIES_TABLE} "
+            "WHERE organisationNumber IS NOT NULL AND TRIM(COALESCE(name, '')) != ''"
+        )
+        if "exclude" in table_columns(conn, COMPANIES_TABLE):
+            query += " AND exclude = 0"
+        if table_exists(conn, ORGNR_ACCOUNTS_TABLE):
+            query += f" AND organisationNumber NOT IN (SELECT organisationNumber FROM {ORGNR_ACCOUNTS_TABLE})"
+        if table_exists(conn, ACCOUNT_ITEMS_TABLE):
+            query += f" AND organisationNumber NOT IN (SELECT organisationNumber FROM {ACCOUNT_ITEMS_TABLE})"
+        return [CrawlTask(self.name, str(orgnr), {"name": str(name)}) for orgnr, name in conn.execute(query)]
+
+    def request(self, task: CrawlTask, base_url: str, build_id: str) -> FetchSpec:
+        name = task.payload.get("name", "")
+        return FetchSpec(
+            f"{base_url}/_next/data/{build_id}/company/{task.key}.json",
+            params={"organisationNumber": task.key, "name": name.replace(" ", "-").lower()},
+        )
+
+    def parse(self, task: CrawlTask, response: FetchedResponse) -> JobResult:
+        company = (response.json().get("pageProps") or {}).get("company") or {}
+        records = []
+        for account in company.get("companyAccounts") or []:
+            record = {
+                "organisationNumber": task.key,
+                "name": task.payload.get("name", ""),
+                "year": int(account.get("year") or 0),
+                "PeriodStart": account.get("periodStart"),
+                "PeriodEnd": account.get("periodEnd"),
+            }
+            for item in account.get("accounts") or []:
+                if item.get("code"):
+                    record[item["code"]] = float(item["amount"]) if item.get("amount") is not None else None
+            records.append(record)
+        return JobResult(records=records)
+
+    def store(self, conn: sqlite3.Connection, results: list[tuple[CrawlTask, JobResult]]) -> int:
+        records = [record for _, result in results for record in result.records]
+        return store_accounts(conn, ORGNR_ACCOUNTS_TABLE, records, self.accounts_format)
+
+
+JOB_TYPES: dict[str, type[CrawlJob]] = {
+    SegmentationPageJob.name: SegmentationPageJob,
+    CompanyIdResolutionJob.name: CompanyIdResolutionJob,
+    FinancialsJob.name: FinancialsJob,
+    OrgnrFinancialsJob.name: OrgnrFinancialsJob,
+}
+
+
+__all__ = [
+    "ACCOUNTS_TABLE",
+    "COMPANIES_TABLE",
+    "CompanyIdResolutionJob",
+    "CrawlJob",
+    "CrawlTask",
+    "FetchSpec",
+    "FetchedResponse",
+    "FinancialsJob",
+    "JOB_TYPES",
+    "JobResult",
+    "ORGNR_ACCOUNTS_TABLE",
+    "OrgnrFinancialsJob",
+    "SegmentationPageJob",
+    "extract_account_rows",
+    "extract_segmentation_companies",
+    "segmentation_task_key",
+]
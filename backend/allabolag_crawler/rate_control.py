@@ -0,0 +1,238 @@
+"""Adaptive per-host concurrency (AIMD) for the allabolag fetchers.
+
+Each host gets a concurrency limit that grows additively while responses are fast and
+successful, and is cut multiplicatively on throttling (429), server errors (5xx) and
+timeouts. ``Retry-After`` pauses all requests to the host. The asyncio crawler uses
+:class:`AsyncAdaptiveLimiter`; the threaded scripts use :class:`ThreadAdaptiveLimiter`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Mapping, Optional
+from urllib.parse import urlsplit
+
+
+@dataclass(slots=True)
+class AIMDSettings:
+    initial: int = 4
+    minimum: int = 1
+    maximum: int = 32
+    target_latency: float = 2.0  # Seconds; above this (smoothed) the limit stops growing
+    increase: float = 1.0  # Added per limit's worth of successful responses (about one per round trip)
+    decrease: float = 0.5  # Multiplier applied on throttling or errors, at most once per round trip
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None  # HTTP-date form is not used by allabolag
+
+
+class AIMDController:
+    """Concurrency limit and metrics of one host. Not thread-safe: the limiters serialize access."""
+
+    def __init__(self, host: str, settings: AIMDSettings, window: int = 200) -> None:
+        self.host = host
+        self.settings = settings
+        self.limit = float(max(settings.minimum, min(settings.maximum, settings.initial)))
+        self.in_flight = 0
+        self.requests = 0
+        self.succeeded = 0
+        self.throttled = 0
+        self.errors = 0
+        self.increases = 0
+        self.decreases = 0
+        self.latency_ewma: Optional[float] = None
+        self.pause_until = 0.0
+        self._last_decrease = float("-inf")
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._outcomes: deque[tuple[float, bool]] = deque(maxlen=window)  # (finished_at, healthy)
+
+    @property
+    def allowed(self) -> int:
+        return int(self.limit)
+
+    def pause_remaining(self) -> float:
+        return max(0.0, self.pause_until - time.monotonic())
+
+    def can_start(self) -> bool:
+        return self.in_flight < self.allowed and self.pause_remaining() == 0
+
+    def on_start(self) -> None:
+        self.in_flight += 1
+        self.requests += 1
+
+    def on_result(self, status: Optional[int], latency: float, retry_after: Optional[float] = None) -> None:
+        """Record a finished request; ``status`` is None for connection errors and timeouts."""
+        now = time.monotonic()
+        self.in_flight -= 1
+        self._latencies.append(latency)
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        if status == 429 or status is None or status >= 500:
+            if status == 429:
+                self.throttled += 1
+            else:
+                self.errors += 1
+            self._outcomes.append((now, False))
+            if retry_after:
+                self.pause_until = max(self.pause_until, now + retry_after)
+            # One cut per round trip: the other requests of the same window saw the same overload
+            if now - self._last_decrease >= (self.latency_ewma or 0.0):
+                self.limit = max(float(self.settings.minimum), self.limit * self.settings.decrease)
+                self._last_decrease = now
+                self.decreases += 1
+            return
+
+        self.succeeded += 1
+        self._outcomes.append((now, True))
+        # Grow only while the limit is what holds us back and the host answers quickly
+        if self.latency_ewma <= self.settings.target_latency and self.in_flight + 1 >= self.allowed:
+            before = self.allowed
+            self.limit = min(float(self.settings.maximum), self.limit + self.settings.increase / self.limit)
+            if self.allowed > before:
+                self.increases += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.monotonic()
+        latencies = sorted(self._latencies)
+        recent = [healthy for finished, healthy in self._outcomes if now - finished <= 60]
+        span = now - self._outcomes[0][0] if self._outcomes else 0.0
+        return {
+            "host": self.host,
+            "concurrency_limit": self.allowed,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "succeeded": self.succeeded,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "error_rate_60s": round(1 - sum(recent) / len(recent), 4) if recent else 0.0,
+            "responses_per_second": round(len(self._outcomes) / span, 2) if span > 0 else 0.0,
+            "latency_ewma": round(self.latency_ewma, 4) if self.latency_ewma is not None else None,
+            "latency_p50": round(statistics.median(latencies), 4) if latencies else None,
+            "latency_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 4) if latencies else None,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "paused_for": round(self.pause_remaining(), 2),
+        }
+
+
+class _AdaptiveLimiter:
+    def __init__(self, settings: Optional[AIMDSettings] = None) -> None:
+        self.settings = settings or AIMDSettings()
+        self.controllers: dict[str, AIMDController] = {}
+
+    def _controller(self, url_or_host: str) -> AIMDController:
+        host = urlsplit(url_or_host).netloc or url_or_host
+        controller = self.controllers.get(host)
+        if controller is None:
+            controller = self.controllers[host] = AIMDController(host, self.settings)
+        return controller
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [controller.snapshot() for controller in self.controllers.values()]
+
+    def summary(self) -> str:
+        return "; ".join(
+            f"{m['host']} limit {m['concurrency_limit']} ({m['in_flight']} in flight), "
+            f"{m['responses_per_second']} resp/s, p50 {m['latency_p50']}s, {m['error_rate_60s']:.0%} errors"
+            for m in self.snapshot()
+        )
+
+    def write_metrics(self, path: str | Path, extra: Optional[Mapping[str, Any]] = None) -> None:
+        """Atomically replace ``path`` with a JSON snapshot (for dashboards or ``watch cat``)."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({"updated_at": time.time(), "hosts": self.snapshot(), **(extra or {})}, indent=2))
+        os.replace(tmp, path)
+
+
+class AsyncAdaptiveLimiter(_AdaptiveLimiter):
+    """AIMD concurrency gate for asyncio code: ``await acquire(url)`` ... ``release(url, status, latency)``."""
+
+    def __init__(self, settings: Optional[AIMDSettings] = None) -> None:
+        super().__init__(settings)
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, url: str) -> None:
+        controller = self._controller(url)
+        async with self._cond:
+            while not controller.can_start():
+                pause = controller.pause_remaining()
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=pause or None)
+                except asyncio.TimeoutError:
+                    pass
+            controller.on_start()
+
+    async def release(self, url: str, status: Optional[int], latency: float, retry_after: Optional[float] = None) -> None:
+        async with self._cond:
+            self._controller(url).on_result(status, latency, retry_after)
+            self._cond.notify_all()
+
+
+class RequestOutcome:
+    """Filled in by the caller of :meth:`ThreadAdaptiveLimiter.slot` once the response arrives."""
+
+    __slots__ = ("status", "retry_after")
+
+    def __init__(self) -> None:
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+
+    def record(self, response: Any) -> None:
+        self.status = response.status_code
+        self.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+
+class ThreadAdaptiveLimiter(_AdaptiveLimiter):
+    """AIMD concurrency gate for thread pools. Size the pool to ``settings.maximum``.
+
+    Usage::
+
+        with limiter.slot(url) as outcome:
+            resp = requests.get(url)
+            outcome.record(resp)
+    """
+
+    def __init__(self, settings: Optional[AIMDSettings] = None) -> None:
+        super().__init__(settings)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[RequestOutcome]:
+        controller = self._controller(url)
+        with self._cond:
+            while not controller.can_start():
+                self._cond.wait(timeout=controller.pause_remaining() or None)
+            controller.on_start()
+        outcome = RequestOutcome()
+        started = time.monotonic()
+        try:
+            yield outcome
+        finally:
+            with self._cond:
+                controller.on_result(outcome.status, time.monotonic() - started, outcome.retry_after)
+                self._cond.notify_all()
+
+
+__all__ = [
+    "AIMDController",
+    "AIMDSettings",
+    "AsyncAdaptiveLimiter",
+    "RequestOutcome",
+    "ThreadAdaptiveLimiter",
+    "parse_retry_after",
+]
@@ -0,0 +1,54 @@
+"""SQLite helpers for crawl output tables."""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Any, Iterable, Mapping, Sequence
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+
+
+def ensure_columns(conn: sqlite3.Connection, table: str, columns: Sequence[str]) -> None:
+    """Create ``table`` or add any missing ``columns`` to it.
+
+    Account codes arrive as columns in the wide financials tables and the set varies between
+    companies, so appends have to widen the table instead of failing like ``to_sql`` does.
+    The DDL only joins the caller's transaction if one is open (``BEGIN`` it explicitly).
+    """
+    if not table_exists(conn, table):
+        conn.execute(f"CREATE TABLE {quote_identifier(table)} ({', '.join(map(quote_identifier, columns))})")
+        return
+    existing = {column.lower() for column in table_columns(conn, table)}
+    for column in columns:
+        if column.lower() not in existing:
+            conn.execute(f"ALTER TABLE {quote_identifier(table)} ADD COLUMN {quote_identifier(column)}")
+            existing.add(column.lower())
+
+
+def insert_records(conn: sqlite3.Connection, table: str, records: Iterable[Mapping[str, Any]]) -> int:
+    """Append dict records with ``executemany``, widening the table as needed."""
+    records = list(records)
+    if not records:
+        return 0
+    columns = list(dict.fromkeys(column for record in records for column in record))
+    ensure_columns(conn, table, columns)
+    placeholders = ", ".join("?" * len(columns))
+    conn.executemany(
+        f"INSERT INTO {quote_identifier(table)} ({', '.join(map(quote_identifier, columns))}) VALUES ({placeholders})",
+        [tuple(record.get(column) for column in columns) for record in records],
+    )
+    return len(records)
+
+
+__all__ = ["ensure_columns", "insert_records", "quote_identifier", "table_columns", "table_exists"]
@@ -0,0 +1,214 @@
+"""Single writer thread for crawl output.
+
+Fetch workers hand records to :class:`BatchWriter` and carry on; the writer thread owns the
+SQLite connection (WAL, ``synchronous=NORMAL``) and applies everything queued since its last
+commit in one short transaction: one ``executemany`` per table, then the frontier updates for
+the same tasks (completions, follow-ups, retries and failures). Workers never wait on SQLite
+locks, and a task is only marked done in the transaction that stores its records.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence
+
+from .frontier import add_tasks, complete_tasks, fail_tasks, retry_tasks
+from .jobs import CrawlJob, CrawlTask, JobResult
+from .storage import insert_records
+
+logger = logging.getLogger(__name__)
+
+WriteCallback = Callable[[int, Optional[BaseException]], None]
+
+_INTERVAL = object()  # Queue wait timed out: the batch is due
+
+
+@dataclass(slots=True)
+class _WriteItem:
+    table: Optional[str] = None
+    records: Sequence[Mapping[str, Any]] = ()
+    job: Optional[CrawlJob] = None
+    results: Sequence[tuple[CrawlTask, JobResult]] = ()
+    complete: Sequence[CrawlTask] = ()
+    follow_ups: Sequence[CrawlTask] = ()
+    retries: Sequence[tuple[CrawlTask, str, float]] = ()
+    failures: Sequence[tuple[CrawlTask, str]] = ()
+    callback: Optional[WriteCallback] = None
+    flushed: Optional[threading.Event] = field(default=None)
+
+
+class BatchWriter:
+    """Queue-fed writer thread that commits batches every ``flush_interval`` or ``flush_rows`` rows.
+
+    Writes that add follow-up tasks are committed (with whatever is queued before them) right
+    away, so a crawl that discovers its next page from the current one is not slowed down.
+
+    ``callback(rows_written, error)`` runs on the writer thread once the write has committed
+    (``error`` is None) or failed. A failing write rolls back its batch, which is then replayed
+    one write per transaction so the other writes still land.
+    """
+
+    def __init__(self, db_path: str | Path, *, flush_rows: int = 2000, flush_interval: float = 0.5) -> None:
+        self.db_path = db_path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.transactions = 0
+        self.failed_writes = 0
+        self._queue: queue.Queue[Optional[_WriteItem]] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._started = False
+
+    def start(self) -> "BatchWriter":
+        if not self._started:
+            self._thread.start()
+            self._started = True
+        return self
+
+    def write(
+        self,
+        table: Optional[str] = None,
+        records: Iterable[Mapping[str, Any]] = (),
+        *,
+        job: Optional[CrawlJob] = None,
+        results: Iterable[tuple[CrawlTask, JobResult]] = (),
+        complete: Iterable[CrawlTask] = (),
+        follow_ups: Iterable[CrawlTask] = (),
+        retry: Iterable[tuple[CrawlTask, str, float]] = (),
+        fail: Iterable[tuple[CrawlTask, str]] = (),
+        callback: Optional[WriteCallback] = None,
+    ) -> None:
+        """Queue records for ``table`` and/or crawl ``results`` for ``job.store``, plus frontier updates.
+
+        ``retry`` takes ``(task, error, delay)`` and ``fail`` ``(task, error)``, as for
+        :meth:`CrawlFrontier.retry` and :meth:`CrawlFrontier.fail`.
+        """
+        if self._started and not self._thread.is_alive():
+            raise RuntimeError("SQLite writer thread has stopped; the write would never be committed")
+        self._queue.put(_WriteItem(
+            table, list(records), job, list(results), list(complete), list(follow_ups), list(retry), list(fail), callback
+        ))
+
+    @property
+    def running(self) -> bool:
+        return self._started and self._thread.is_alive()
+
+    def flush(self) -> None:
+        """Block until everything queued so far is committed; raises RuntimeError if the writer thread died."""
+        self._check_running()
+        done = threading.Event()
+        self._queue.put(_WriteItem(flushed=done))
+        while not done.wait(0.5):
+            self._check_running()
+
+    def _check_running(self) -> None:
+        if not self.running:
+            raise RuntimeError("SQLite writer thread is not running; queued writes were not committed")
+
+    def close(self) -> None:
+        if self._started and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self) -> None:
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        batch: list[_WriteItem] = []
+        rows = 0
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = _INTERVAL
+                if item is _INTERVAL or item is None or item.flushed is not None:
+                    self._commit(conn, batch)
+                    batch, rows, deadline = [], 0, None
+                    if item is None:
+                        return
+                    if item is not _INTERVAL:
+                        item.flushed.set()
+                    continue
+                batch.append(item)
+                rows += len(item.records) + sum(len(result.records) for _, result in item.results)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                # Follow-up tasks are new work for the crawl: don't hold them back for the interval
+                if rows >= self.flush_rows or item.follow_ups:
+                    self._commit(conn, batch)
+                    batch, rows, deadline = [], 0, None
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: list[_WriteItem]) -> None:
+        if not batch:
+            return
+        try:
+            written = self._apply(conn, batch)
+        except Exception as exc:
+            if len(batch) > 1:
+                # Rolled back: replay one write per transaction so only the bad one is lost
+                for item in batch:
+                    self._commit(conn, [item])
+                return
+            logger.error(f"SQLite write failed: {exc}")
+            self.failed_writes += 1
+            self._notify(batch, [0], exc)
+            return
+        self.transactions += 1
+        self.rows_written += sum(written)
+        self._notify(batch, written, None)
+
+    def _apply(self, conn: sqlite3.Connection, batch: list[_WriteItem]) -> list[int]:
+        by_table: dict[str, list[Mapping[str, Any]]] = {}
+        by_job: dict[int, tuple[CrawlJob, list[tuple[CrawlTask, JobResult]]]] = {}
+        for item in batch:
+            if item.table is not None and item.records:
+                by_table.setdefault(item.table, []).extend(item.records)
+            if item.job is not None and item.results:
+                by_job.setdefault(id(item.job), (item.job, []))[1].extend(item.results)
+        with conn:
+            # sqlite3 only opens a transaction before DML, so table widening (CREATE/ALTER in
+            # ensure_columns) would otherwise autocommit ahead of a batch that then rolls back
+            conn.execute("BEGIN IMMEDIATE")
+            for table, records in by_table.items():
+                insert_records(conn, table, records)
+            for job, results in by_job.values():
+                job.store(conn, results)
+            completed = [task for item in batch for task in item.complete]
+            if completed:
+                complete_tasks(conn, completed)
+            follow_ups = [task for item in batch for task in item.follow_ups]
+            if follow_ups:
+                add_tasks(conn, follow_ups)
+            retries = [retry for item in batch for retry in item.retries]
+            if retries:
+                retry_tasks(conn, retries)
+            failures = [failure for item in batch for failure in item.failures]
+            if failures:
+                fail_tasks(conn, failures)
+        return [
+            (len(item.records) if item.table is not None else 0) + sum(len(result.records) for _, result in item.results)
+            for item in batch
+        ]
+
+    @staticmethod
+    def _notify(batch: list[_WriteItem], written: list[int], error: Optional[BaseException]) -> None:
+        for item, count in zip(batch, written):
+            if item.callback is not None:
+                try:
+                    item.callback(count, error)
+                except Exception as exc:
+                    logger.error(f"SQLite writer callback failed: {exc}")
+
+
+__all__ = ["BatchWriter", "WriteCallback"]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Analytics rollup tables for the local data API
+Precomputes the dashboard, industry and city aggregates from master_analytics and keeps
+them current with triggers, so the landing page endpoints read a handful of rows
+"""
+
+import sqlite3
+import sys
+import time
+
+# Every measure is summed over master_analytics, which lets the triggers apply a row
+# insert/delete as +expr/-expr. Averages are stored as sum and count and divided on read.
+# {r} is the row prefix: "" for the full rebuild, "new."/"old." inside the triggers.
+DASHBOARD_MEASURES = {
+    "total_companies": "1",
+    "with_financials": "CASE WHEN {r}revenue IS NOT NULL AND {r}revenue != '' THEN 1 ELSE 0 END",
+    "with_kpis": "CASE WHEN {r}SDI IS NOT NULL OR {r}DR IS NOT NULL OR {r}ORS IS NOT NULL THEN 1 ELSE 0 END",
+    "with_digital_presence": "CASE WHEN {r}homepage IS NOT NULL AND {r}homepage != '' THEN 1 ELSE 0 END",
+    # Dashboard averages ignore extreme values (growth outside ±100%, |margin| >= 100%), so never ±inf
+    "growth_sum": "CASE WHEN {r}EBIT_margin IS NOT NULL AND {r}Revenue_growth > -1 AND {r}Revenue_growth < 1 THEN {r}Revenue_growth ELSE 0 END",
+    "growth_count": "CASE WHEN {r}EBIT_margin IS NOT NULL AND {r}Revenue_growth > -1 AND {r}Revenue_growth < 1 THEN 1 ELSE 0 END",
+    "margin_sum": "CASE WHEN {r}Revenue_growth IS NOT NULL AND ABS({r}EBIT_margin) < 1 THEN {r}EBIT_margin ELSE 0 END",
+    "margin_count": "CASE WHEN {r}Revenue_growth IS NOT NULL AND ABS({r}EBIT_margin) < 1 THEN 1 ELSE 0 END",
+}
+
+def _finite(expr, then=None):
+    """expr (or then) when expr is a finite number, else 0. Summing ±inf would make a later
+    delete compute inf - inf = NaN, which SQLite stores as NULL and the NOT NULL sums reject."""
+    return f"CASE WHEN ABS({expr}) < 1e308 THEN {expr if then is None else then} ELSE 0 END"
+
+# AVG(CAST(revenue AS REAL)) / AVG(Revenue_growth) over each group, skipping ±inf values
+GROUP_MEASURES = {
+    "count": "1",
+    "revenue_sum": _finite("CAST({r}revenue AS REAL)"),
+    "revenue_count": _finite("CAST({r}revenue AS REAL)", "1"),
+    "growth_sum": _finite("{r}Revenue_growth"),
+    "growth_count": _finite("{r}Revenue_growth", "1"),
+}
+
+DASHBOARD_ROLLUP = "analytics_dashboard_rollup"
+
+# Rollup table -> (group column, rows included)
+GROUP_ROLLUPS = {
+    "analytics_industry_rollup": ("industry_name", "{r}industry_name IS NOT NULL"),
+    "analytics_city_rollup": ("city", "{r}city IS NOT NULL AND {r}city != ''"),
+}
+
+def _measures(measures, prefix):
+    return {name: expr.format(r=prefix) for name, expr in measures.items()}
+
+def _dashboard_delta(prefix, sign):
+    assignments = ", ".join(
+        f"{name} = {name} {sign} ({expr})" for name, expr in _measures(DASHBOARD_MEASURES, prefix).items()
+    )
+    return f"UPDATE {DASHBOARD_ROLLUP} SET {assignments} WHERE id = 1;"
+
+def _group_delta(table, prefix, sign):
+    column, condition = GROUP_ROLLUPS[table]
+    measures = _measures(GROUP_MEASURES, prefix)
+    names = ", ".join(measures)
+    values = ", ".join(f"{sign}({expr})" for expr in measures.values())
+    updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in measures)
+    return (
+        f"INSERT INTO {table} (name, {names}) "
+        f"SELECT {prefix}{column}, {values} WHERE {condition.format(r=prefix)} "
+        f"ON CONFLICT(name) DO UPDATE SET {updates};"
+    )
+
+def _trigger_statements():
+    """Insert/delete/update triggers applying each row change to every rollup"""
+    def deltas(prefix, sign):
+        return [_dashboard_delta(prefix, sign)] + [_group_delta(table, prefix, sign) for table in GROUP_ROLLUPS]
+
+    bodies = {
+        "analytics_rollup_ai": ("AFTER INSERT", deltas("new.", "+")),
+        "analytics_rollup_ad": ("AFTER DELETE", deltas("old.", "-")),
+        "analytics_rollup_au": ("AFTER UPDATE", deltas("old.", "-") + deltas("new.", "+")),
+    }
+    return {
+        trigger: f"CREATE TRIGGER {trigger} {event} ON master_analytics BEGIN\n    " + "\n    ".join(statements) + "\nEND"
+        for trigger, (event, statements) in bodies.items()
+    }
+
+def refresh_rollups(db_path):
+    """Rebuild the rollup tables from master_analytics and (re)install their triggers.
+
+    Needed once initially and after anything that recreates master_analytics (which drops
+    its triggers, e.g. fix_local_db_types.py); row-level writes are applied by the triggers.
+    """
+
+    print(f"Opening database: {db_path}")
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    timings = {}
+
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+
+        print("\n=== REBUILDING ROLLUPS ===")
+        start = time.perf_counter()
+        dashboard = _measures(DASHBOARD_MEASURES, "")
+        cursor.execute(f"DROP TABLE IF EXISTS {DASHBOARD_ROLLUP}")
+        cursor.execute(
+            f"CREATE TABLE {DASHBOARD_ROLLUP} (id INTEGER PRIMARY KEY CHECK (id = 1), "
+            + ", ".join(f"{name} REAL NOT NULL DEFAULT 0" for name in dashboard)
+            + ")"
+        )
+        cursor.execute(
+            f"INSERT INTO {DASHBOARD_ROLLUP} (id, {', '.join(dashboard)}) "
+            f"SELECT 1, {', '.join(f'COALESCE(SUM({expr}), 0)' for expr in dashboard.values())} FROM master_analytics"
+        )
+        timings[DASHBOARD_ROLLUP] = time.perf_counter() - start
+        print(f"✓ {DASHBOARD_ROLLUP} in {timings[DASHBOARD_ROLLUP]:.2f}s")
+
+        group = _measures(GROUP_MEASURES, "")
+        for table, (column, condition) in GROUP_ROLLUPS.items():
+            start = time.perf_counter()
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(
+                f"CREATE TABLE {table} (name TEXT PRIMARY KEY, "
+                + ", ".join(f"{name} REAL NOT NULL DEFAULT 0" for name in group)
+                + ")"
+            )
+            cursor.execute(
+                f"INSERT INTO {table} (name, {', '.join(group)}) "
+                f"SELECT {column}, {', '.join(f'SUM({expr})' for expr in group.values())} "
+                f"FROM master_analytics WHERE {condition.format(r='')} GROUP BY {column}"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_count ON {table} (count DESC)")
+            timings[table] = time.perf_counter() - start
+            print(f"✓ {table}: {cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]} groups in {timings[table]:.2f}s")
+
+        print("\n=== INSTALLING TRIGGERS ===")
+        for trigger, sql in _trigger_statements().items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(sql)
+            print(f"✓ {trigger}")
+
+        conn.commit()
+
+        print("\n=== TIMINGS ===")
+        for table, seconds in timings.items():
+            print(f"  {table}: {seconds * 1000:.1f} ms")
+        print(f"  total: {sum(timings.values()) * 1000:.1f} ms")
+
+        print("\n✅ Analytics rollups are up to date.")
+        return timings
+
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        conn.rollback()
+        raise
+
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    db_path = '../allabolag.db'
+    if len(sys.argv) > 1:
+        db_path = sys.argv[1]
+
+    print("=" * 70)
+    print("REFRESHING ANALYTICS ROLLUPS")
+    print("=" * 70)
+
+    refresh_rollups(db_path)
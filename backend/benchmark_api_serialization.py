@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-page cost of the /companies response path in local_data_api
+Compares the previous path (SELECT *, per-row dict + digit normalization, a CompanyResponse
+per row, then response_model validation and JSON encoding) with the current one (SQL-side
+normalization, row_factory dicts, FastJSONResponse)
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("db_path", nargs="?", default=os.getenv("LOCAL_DB_PATH", "../allabolag.db"))
+parser.add_argument("--limit", type=int, default=100, help="Rows per page")
+parser.add_argument("--pages", type=int, default=50, help="Pages to time per path")
+args = parser.parse_args()
+
+# local_data_api reads the database path at import time
+os.environ["LOCAL_DB_PATH"] = args.db_path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import local_data_api as api
+
+def legacy_rows(conn, offset, limit):
+    cursor = conn.execute(
+        "SELECT * FROM master_analytics ORDER BY name, OrgNr LIMIT ? OFFSET ?", (limit, offset)
+    )
+    columns = [description[0] for description in cursor.description]
+    companies = []
+    for row in cursor.fetchall():
+        company_dict = dict(zip(columns, row))
+        for key in ('revenue', 'profit', 'employees'):
+            value = company_dict.get(key)
+            if isinstance(value, (int, float)):
+                company_dict[key] = str(int(value))
+            elif key != 'employees' and value and value.replace('.', '').replace('-', '').isdigit():
+                company_dict[key] = str(int(float(value)))
+        companies.append(api.CompanyResponse(**company_dict))
+    return companies
+
+def legacy_serialize(companies):
+    result = api.SearchResults(companies=companies, total=0, summary={})
+    # What FastAPI does with a returned model and response_model=SearchResults
+    validated = api.SearchResults.model_validate(result.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+def current_rows(conn, offset, limit):
+    return api.fetch_company_rows(
+        conn, "SELECT * FROM master_analytics ORDER BY name, OrgNr LIMIT ? OFFSET ?", (limit, offset)
+    )
+
+def current_serialize(companies):
+    return api.FastJSONResponse({"companies": companies, "total": 0, "summary": {}, "next_cursor": None}).body
+
+def measure(fetch, serialize):
+    fetch_ms, serialize_ms, sizes = [], [], []
+    for page in range(args.pages):
+        start = time.perf_counter()
+        companies = api.db.execute(fetch, page * args.limit, args.limit)
+        fetched = time.perf_counter()
+        body = serialize(companies)
+        done = time.perf_counter()
+        fetch_ms.append((fetched - start) * 1000)
+        serialize_ms.append((done - fetched) * 1000)
+        sizes.append(len(body))
+    return statistics.median(fetch_ms), statistics.median(serialize_ms), statistics.mean(sizes)
+
+if __name__ == '__main__':
+    print(f"Database: {args.db_path}")
+    print(f"Pages: {args.pages} x {args.limit} rows, orjson: {'yes' if api.orjson else 'no (stdlib json)'}")
+
+    # Warm the page cache and schema detection so neither path pays for it
+    api.db.execute(current_rows, 0, args.limit)
+    api.db.execute(legacy_rows, 0, args.limit)
+
+    results = {
+        "before": measure(legacy_rows, legacy_serialize),
+        "after": measure(current_rows, current_serialize),
+    }
+
+    print(f"\n{'path':<8} {'rows (ms)':>10} {'serialize (ms)':>15} {'total (ms)':>11} {'bytes':>9}")
+    for name, (fetch_ms, serialize_ms, size) in results.items():
+        print(f"{name:<8} {fetch_ms:>10.2f} {serialize_ms:>15.2f} {fetch_ms + serialize_ms:>11.2f} {size:>9.0f}")
+    before, after = (sum(results[name][:2]) for name in ("before", "after"))
+    print(f"\nPer-page speedup: {before / after:.1f}x (median of {args.pages} pages)")
+
+    api.db.close()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark KPI computation on a synthetic company_accounts_by_id table
+Compares the previous calc_kpis path (one groupby().apply(pct_change) per growth metric)
+with kpi_engine (one vectorized pass) on the same rows, checks they agree, and times the
+chunked SQLite rebuild end to end
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import kpi_engine
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--companies", type=int, default=500_000, help="Synthetic companies")
+parser.add_argument("--years", type=int, default=6, help="Reported years per company")
+parser.add_argument("--legacy-companies", type=int, default=20_000, help="Companies timed on the previous path (it is slow)")
+parser.add_argument("--chunk-rows", type=int, default=kpi_engine.CHUNK_ROWS, help="Account rows per chunk in the SQLite rebuild")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+def synthetic_accounts(companies, years, seed):
+    """Wide account rows shaped like company_accounts_by_id, with gaps and zero revenue"""
+    rng = np.random.default_rng(seed)
+    rows = companies * years
+    company = np.repeat(np.arange(companies), years)
+    revenue = np.repeat(rng.lognormal(9, 1.5, companies), years) * rng.lognormal(0, 0.2, rows)
+    revenue[rng.random(rows) < 0.01] = 0
+    df = pd.DataFrame({
+        "companyId": pd.Series(company).map("ID{:07d}".format),
+        "organisationNumber": pd.Series(company + 5560000000).astype(str),
+        "name": pd.Series(company).map("Company {} AB".format),
+        "year": np.tile(np.arange(2024 - years, 2024), companies),
+        "SDI": revenue.round(),
+        "RG": (revenue * rng.normal(0.05, 0.1, rows)).round(),
+        "DR": (revenue * rng.normal(0.03, 0.1, rows)).round(),
+        "resultat_e_finansnetto": (revenue * rng.normal(0.04, 0.1, rows)).round(),
+        "EKA": rng.uniform(0, 100, rows).round(1),
+        "avk_eget_kapital": rng.normal(10, 20, rows).round(1),
+    })
+    for code in ("RG", "DR", "resultat_e_finansnetto"):
+        df.loc[rng.random(rows) < 0.05, code] = np.nan  # Codes a company did not report that year
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)  # Appended in crawl order, not sorted
+
+def legacy_kpis(df):
+    """The calc_kpis.py computation before kpi_engine.
+    pct_change runs with fill_method=None: older pandas padded a missing year by default,
+    which neither pandas 3 nor the engine do, so the reference is the same on every version"""
+    df = df.copy()
+    df["year"] = pd.to_numeric(df["year"], errors="coerce")
+    for code in ("SDI", "RG", "DR", "resultat_e_finansnetto", "EKA", "avk_eget_kapital"):
+        df[code] = pd.to_numeric(df[code], errors="coerce")
+    df = df.sort_values(["companyId", "year"])
+
+    def calc_growth(x, col):
+        return x[col].pct_change(fill_method=None)
+
+    df["ebit_margin"] = df["RG"] / df["SDI"]
+    df["net_margin"] = df["DR"] / df["SDI"]
+    df["pbt_margin"] = df["resultat_e_finansnetto"] / df["SDI"]
+    df["revenue_growth"] = df.groupby("companyId").apply(lambda x: calc_growth(x, "SDI")).reset_index(level=0, drop=True)
+    df["ebit_growth"] = df.groupby("companyId").apply(lambda x: calc_growth(x, "RG")).reset_index(level=0, drop=True)
+    df["profit_growth"] = df.groupby("companyId").apply(lambda x: calc_growth(x, "DR")).reset_index(level=0, drop=True)
+    df["equity_ratio"] = df["EKA"]
+    df["return_on_equity"] = df["avk_eget_kapital"]
+    return df[kpi_engine.KPI_COLUMNS]
+
+def timed(fn, *fn_args, **fn_kwargs):
+    start = time.perf_counter()
+    result = fn(*fn_args, **fn_kwargs)
+    return result, time.perf_counter() - start
+
+if __name__ == '__main__':
+    print(f"Synthetic accounts: {args.companies:,} companies x {args.years} years")
+    accounts, seconds = timed(synthetic_accounts, args.companies, args.years, args.seed)
+    print(f"  generated {len(accounts):,} rows in {seconds:.1f}s")
+
+    subset = accounts[accounts["companyId"] < f"ID{args.legacy_companies:07d}"]
+    legacy, legacy_s = timed(legacy_kpis, subset)
+    engine_subset, engine_subset_s = timed(kpi_engine.compute_kpis, subset)
+    legacy = legacy.reset_index(drop=True)
+    pd.testing.assert_frame_equal(legacy, engine_subset, check_dtype=False)
+    print(f"\n{'path':<24} {'rows':>11} {'seconds':>9} {'rows/s':>12}")
+    print(f"{'previous (apply)':<24} {len(subset):>11,} {legacy_s:>9.2f} {len(subset) / legacy_s:>12,.0f}")
+    print(f"{'kpi_engine':<24} {len(subset):>11,} {engine_subset_s:>9.2f} {len(subset) / engine_subset_s:>12,.0f}")
+    _, engine_s = timed(kpi_engine.compute_kpis, accounts)
+    print(f"{'kpi_engine (all rows)':<24} {len(accounts):>11,} {engine_s:>9.2f} {len(accounts) / engine_s:>12,.0f}")
+    print(f"\nSpeedup on {args.legacy_companies:,} companies: {legacy_s / engine_subset_s:.0f}x")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "kpis.db")
+        conn = sqlite3.connect(db_path)
+        accounts.to_sql(kpi_engine.ACCOUNTS_TABLE, conn, index=False, chunksize=100_000)
+        written, rebuild_s = timed(kpi_engine.rebuild_kpis, conn, chunk_rows=args.chunk_rows)
+        conn.close()
+    print(f"SQLite rebuild ({args.chunk_rows:,} rows per chunk): {written:,} KPI rows in {rebuild_s:.1f}s")
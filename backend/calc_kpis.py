@@ -1,48 +1,34 @@
-import pandas as pd
-from sqlalchemy import create_engine
+import argparse
+import sqlite3
+import time
+
+import kpi_engine
 
 DB_FILE = "allabolag.db"
-TABLE_INPUT = "company_accounts_by_id"
+TABLE_INPUT = "company_accounts_by_id"  # Plus long-format accounts where the crawl wrote them (see kpi_engine.source_query)
 TABLE_OUTPUT = "company_kpis_by_id"
 
-engine = create_engine(f"sqlite:///{DB_FILE}")
-
-# Load all financials
-df = pd.read_sql(f"SELECT * FROM {TABLE_INPUT}", engine)
-
-# Convert numeric columns
-df["year"] = pd.to_numeric(df["year"], errors="coerce")
-df["SDI"] = pd.to_numeric(df["SDI"], errors="coerce")
-df["RG"] = pd.to_numeric(df["RG"], errors="coerce")
-df["DR"] = pd.to_numeric(df["DR"], errors="coerce")
-df["resultat_e_finansnetto"] = pd.to_numeric(df["resultat_e_finansnetto"], errors="coerce")
-df["EKA"] = pd.to_numeric(df["EKA"], errors="coerce")
-df["avk_eget_kapital"] = pd.to_numeric(df["avk_eget_kapital"], errors="coerce")
-
-# Sort for growth calculation
-df = df.sort_values(["companyId", "year"])
-
-# Calculate KPIs
-def calc_growth(x, col):
-    return x[col].pct_change()
-
-df["ebit_margin"] = df["RG"] / df["SDI"]
-df["net_margin"] = df["DR"] / df["SDI"]
-df["pbt_margin"] = df["resultat_e_finansnetto"] / df["SDI"]
-df["revenue_growth"] = df.groupby("companyId").apply(lambda x: calc_growth(x, "SDI")).reset_index(level=0, drop=True)
-df["ebit_growth"] = df.groupby("companyId").apply(lambda x: calc_growth(x, "RG")).reset_index(level=0, drop=True)
-df["profit_growth"] = df.groupby("companyId").apply(lambda x: calc_growth(x, "DR")).reset_index(level=0, drop=True)
-df["equity_ratio"] = df["EKA"]
-df["return_on_equity"] = df["avk_eget_kapital"]
-
-# Select columns to save
-cols = [
-    "companyId", "organisationNumber", "name", "year",
-    "ebit_margin", "net_margin", "pbt_margin", "revenue_growth", "ebit_growth", "profit_growth", "equity_ratio", "return_on_equity"
-]
-kpis = df[cols]
-
-with engine.begin() as conn:
-    kpis.to_sql(TABLE_OUTPUT, conn, if_exists="replace", index=False)
-
-print(f"Saved {len(kpis)} rows to '{TABLE_OUTPUT}'.")
\ No newline at end of file
+parser = argparse.ArgumentParser(description=f"Compute company KPIs from '{TABLE_INPUT}' into '{TABLE_OUTPUT}'")
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Only recompute companies whose accounts changed since the last run (a full rebuild the first time)",
+)
+args = parser.parse_args()
+
+conn = sqlite3.connect(DB_FILE)
+started = time.perf_counter()
+try:
+    # Margins and growth for all companies in one vectorized pass, a chunk of whole companies at a time
+    if args.incremental:
+        companies, written = kpi_engine.update_kpis(conn, accounts_table=TABLE_INPUT, kpi_table=TABLE_OUTPUT)
+    else:
+        companies, written = None, kpi_engine.rebuild_kpis(conn, accounts_table=TABLE_INPUT, kpi_table=TABLE_OUTPUT)
+finally:
+    conn.close()
+
+elapsed = time.perf_counter() - started
+if companies is None:
+    print(f"Saved {written} rows to '{TABLE_OUTPUT}' in {elapsed:.1f}s.")
+else:
+    print(f"Updated {written} rows of {companies} companies with new accounts in '{TABLE_OUTPUT}' in {elapsed:.1f}s.")
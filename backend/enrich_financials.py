@@ -1,16 +1,41 @@
+import time
+import sqlite3
 import pandas as pd
 import requests
 import sqlalchemy
 import concurrent.futures
 from sqlalchemy import create_engine
 
+from allabolag_crawler import (
+    AIMDSettings,
+    BatchWriter,
+    CrawlFrontier,
+    CrawlTask,
+    ThreadAdaptiveLimiter,
+    get_build_id,
+    refresh_build_id,
+)
+
 DB_FILE = "allabolag.db"
 TABLE_COMPANIES = "segmentation_companies_raw"
 TABLE_FINANCIALS = "company_accounts"
-CONCURRENCY = 5
+MAX_CONCURRENCY = 32  # Thread pool size; requests in flight adapt below it, starting at 5
+FRONTIER_JOB = "enrich"  # Same tasks as `run_allabolag_crawler.py enrich`, so both resume each other
+CLAIM_BATCH = 50
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 5  # Seconds before a failed company may be claimed again (throttling is handled by the limiter)
+
+BASE_URL = "https://www.allabolag.se"
+URL_TEMPLATE = BASE_URL + "/_next/data/{build_id}/company/{organisationNumber}.json"
 
-BUILD_ID = "TErsib-B2eQfZjo2ZZyYp"
-URL_BASE = f"https://www.allabolag.se/_next/data/{BUILD_ID}/company/{{organisationNumber}}.json"
+limiter = ThreadAdaptiveLimiter(AIMDSettings(initial=5, maximum=MAX_CONCURRENCY))
+writer = BatchWriter(DB_FILE)  # Single thread doing every insert and frontier update, in batched transactions
+
+def get_with_limiter(url, params):
+    with limiter.slot(url) as outcome:
+        resp = requests.get(url, params=params, timeout=20)
+        outcome.record(resp)
+    return resp
 
 def get_missing_companies():
     engine = create_engine(f"sqlite:///{DB_FILE}")
@@ -28,19 +53,26 @@ def get_missing_companies():
         print(f"(No financials table found yet, will fetch for all companies) {e}")
     return companies
 
-def fetch_company_financials(row):
-    organisationNumber, name = row.organisationNumber, row.name
+def fetch_company_financials(organisationNumber, name):
+    """Rows for every reported year, or None if the request failed and should be retried."""
     name_str = str(name) if pd.notnull(name) else ""
     if not name_str.strip():
         print(f"  Skipping {organisationNumber}: empty or invalid company name")
         return []
-    url = URL_BASE.format(organisationNumber=organisationNumber)
     params = {
         "organisationNumber": organisationNumber,
         "name": name_str.replace(' ', '-').lower(),
     }
     try:
-        resp = requests.get(url, params=params, timeout=20)
+        build_id = get_build_id(DB_FILE, base_url=BASE_URL)
+        url = URL_TEMPLATE.format(build_id=build_id, organisationNumber=organisationNumber)
+        resp = get_with_limiter(url, params)
+        if resp.status_code == 404:
+            # The site may have redeployed: retry once with the current buildId
+            fresh_id = refresh_build_id(build_id, DB_FILE, base_url=BASE_URL)
+            if fresh_id != build_id:
+                url = URL_TEMPLATE.format(build_id=fresh_id, organisationNumber=organisationNumber)
+                resp = get_with_limiter(url, params)
         resp.raise_for_status()
         j = resp.json()
         company = j.get("pageProps", {}).get("company", {})
@@ -65,29 +97,60 @@ def fetch_company_financials(row):
         return financial_rows
     except Exception as e:
         print(f"Error for {organisationNumber} ({name_str}): {e}")
-        return []
+        return None
 
-def save_financials(financials):
-    if not financials:
-        print("No financial data to save.")
-        return
-    df = pd.DataFrame(financials)
-    engine = create_engine(f"sqlite:///{DB_FILE}")
-    df.to_sql(TABLE_FINANCIALS, engine, if_exists="append", index=False)
-    print(f"Saved {len(df)} rows to '{TABLE_FINANCIALS}'.")
+def save_financials(financials, complete=()):
+    """Queue rows for the writer; the company tasks are completed in the same transaction."""
+    writer.write(TABLE_FINANCIALS, financials, complete=complete)
 
 def main():
     companies = get_missing_companies()
-    print(f"Loaded {len(companies)} companies missing financial data.")
+    frontier = CrawlFrontier(sqlite3.connect(DB_FILE, timeout=30))
+    added = frontier.add(
+        CrawlTask(FRONTIER_JOB, str(row.organisationNumber), {"name": str(row.name) if pd.notnull(row.name) else ""})
+        for row in companies.itertuples()
+    )
+    print(f"Loaded {len(companies)} companies missing financial data ({added} new in the frontier).")
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
-        futures = [executor.submit(fetch_company_financials, row) for _, row in companies.iterrows()]
-        for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
-            result = future.result()
-            if result:
-                save_financials(result)
-            if i % 10 == 0:
-                print(f"Fetched data for {i} companies")
+    fetched = 0
+    writer.start()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            while True:
+                tasks = frontier.claim([FRONTIER_JOB], CLAIM_BATCH)
+                if not tasks:
+                    due = frontier.next_due([FRONTIER_JOB])
+                    if due is None:
+                        break
+                    time.sleep(min(max(due - time.time(), 1), RETRY_DELAY))  # Wait for retries and queued writes
+                    continue
+                futures = {
+                    executor.submit(fetch_company_financials, task.key, task.payload.get("name", "")): task
+                    for task in tasks
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    task = futures[future]
+                    result = future.result()
+                    if result is None:
+                        task.attempts += 1
+                        if task.attempts >= MAX_ATTEMPTS:
+                            frontier.fail(task, "fetch failed")
+                        else:
+                            frontier.retry(task, "fetch failed", RETRY_DELAY)
+                        continue
+                    save_financials(result, [task])  # Companies without accounts are completed too
+                    fetched += 1
+                    if fetched % 10 == 0:
+                        print(f"Fetched data for {fetched} companies")
+                    if fetched % 500 == 0:
+                        print(f"Rate control: {limiter.summary()}")
+        writer.flush()
+        print(f"Frontier: {frontier.counts().get(FRONTIER_JOB, {})}")
+        print(f"Writer: {writer.rows_written} rows in {writer.transactions} transactions")
+    finally:
+        writer.close()  # Queued rows commit with their tasks before the leases are released
+        frontier.release()
+        frontier.conn.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,16 +1,30 @@
 import os
 import time
 import json
+import sqlite3
 import requests
 import pandas as pd
 from sqlalchemy import create_engine, inspect
 from urllib.parse import urlencode
 from threading import Thread, Lock
-from queue import Queue
+
+from allabolag_crawler import (
+    AIMDSettings,
+    BatchWriter,
+    CrawlFrontier,
+    CrawlTask,
+    ThreadAdaptiveLimiter,
+    get_build_id,
+    refresh_build_id,
+    segmentation_task_key,
+)
 
 DB_PATH = "allabolag.db"
 TABLE_NAME = "segmentation_companies_raw"
-MAX_WORKERS = 10  # Number of concurrent requests
+MAX_WORKERS = 10  # Ceiling for concurrent requests; the limiter adapts below it
+FRONTIER_JOB = "segmentation"  # Same page tasks as run_allabolag_crawler.py, so both resume each other
+CLAIM_BATCH = 5
+RETRY_DELAY = 5  # Seconds before a failed page may be claimed again (throttling is handled by the limiter)
 
 # ---- Easily adjustable segmentation parameters ----
 SEGMENTATION_PARAMS = {
@@ -22,11 +36,16 @@ SEGMENTATION_PARAMS = {
     # Add more params as needed
 }
 
-SEGMENTATION_BASE_URL = "https://www.allabolag.se/_next/data/TErsib-B2eQfZjo2ZZyYp/segmentation.json"
+BASE_URL = "https://www.allabolag.se"
+
+def segmentation_url(build_id):
+    return f"{BASE_URL}/_next/data/{build_id}/segmentation.json"
 
 # ---- DB SETUP ----
 engine = create_engine(f"sqlite:///{DB_PATH}")
 lock = Lock()
+writer = BatchWriter(DB_PATH)  # Single thread doing every insert and frontier update, in batched transactions
+limiter = ThreadAdaptiveLimiter(AIMDSettings(initial=2, maximum=MAX_WORKERS))
 
 def get_existing_company_ids():
     inspector = inspect(engine)
@@ -35,12 +54,9 @@ def get_existing_company_ids():
         return set(df['companyId'].astype(str))
     return set()
 
-def save_companies(companies):
-    if not companies:
-        return
-    df = pd.DataFrame(companies)
-    with lock:
-        df.to_sql(TABLE_NAME, engine, if_exists="append", index=False)
+def save_companies(companies, complete=(), follow_ups=()):
+    """Queue companies for the writer; the page tasks are completed in the same transaction."""
+    writer.write(TABLE_NAME, companies, complete=complete, follow_ups=follow_ups)
 
 def extract_companies_from_json(data):
     companies = []
@@ -63,69 +79,90 @@ def extract_companies_from_json(data):
     return companies
 
 def get_last_processed_page():
+    """Progress file of earlier runs; only used to seed an empty frontier."""
     if os.path.exists("segmentation_last_page.txt"):
         with open("segmentation_last_page.txt", "r") as f:
             return int(f.read().strip())
     return 1
 
-def set_last_processed_page(page):
-    with open("segmentation_last_page.txt", "w") as f:
-        f.write(str(page))
-
-def fetch_page_worker(q, seen_pages, existing_ids):
-    while True:
-        try:
-            page = q.get(timeout=3)
-        except:
-            return
-        params = SEGMENTATION_PARAMS.copy()
-        params["page"] = page
-        url = SEGMENTATION_BASE_URL + "?" + urlencode(params)
-        try:
-            r = requests.get(url, timeout=30)
-            r.raise_for_status()
-            data = r.json()
-            companies = extract_companies_from_json(data)
-            # Deduplicate
-            new_companies = [c for c in companies if str(c["companyId"]) not in existing_ids]
-            if new_companies:
-                save_companies(new_companies)
-                print(f"Page {page}: Added {len(new_companies)} new companies.")
-                with lock:
-                    existing_ids.update(str(c["companyId"]) for c in new_companies)
-            else:
-                print(f"Page {page}: No new companies to add.")
-            set_last_processed_page(page)
-            next_page = data["pageProps"].get("pagination", {}).get("next")
-            if next_page and next_page not in seen_pages:
-                with lock:
-                    if next_page not in seen_pages:
-                        seen_pages.add(next_page)
-                        q.put(next_page)
-        except Exception as e:
-            print(f"Error on page {page}: {e}")
-            print("Sleeping 60s before retrying...")
-            time.sleep(60)
-            q.put(page)  # retry this page
-        finally:
-            q.task_done()
-        time.sleep(1)
+def open_frontier():
+    return CrawlFrontier(sqlite3.connect(DB_PATH, timeout=30))
+
+def page_task(page):
+    return CrawlTask(FRONTIER_JOB, segmentation_task_key(SEGMENTATION_PARAMS, page), {"page": page})
+
+def get_page(build_id, params):
+    url = segmentation_url(build_id)
+    with limiter.slot(url) as outcome:
+        r = requests.get(url + "?" + urlencode(params), timeout=30)
+        outcome.record(r)
+    return r
+
+def fetch_page_worker(existing_ids):
+    frontier = open_frontier()
+    try:
+        while True:
+            tasks = frontier.claim([FRONTIER_JOB], CLAIM_BATCH)
+            if not tasks:
+                if frontier.next_due([FRONTIER_JOB]) is None:
+                    return
+                time.sleep(1)  # Pages leased by other workers or waiting for a retry
+                continue
+            for task in tasks:
+                page = task.payload["page"]
+                params = SEGMENTATION_PARAMS.copy()
+                params["page"] = page
+                try:
+                    build_id = get_build_id(DB_PATH, base_url=BASE_URL)
+                    r = get_page(build_id, params)
+                    if r.status_code == 404:
+                        # The site may have redeployed: retry once with the current buildId
+                        fresh_id = refresh_build_id(build_id, DB_PATH, base_url=BASE_URL)
+                        if fresh_id != build_id:
+                            r = get_page(fresh_id, params)
+                    r.raise_for_status()
+                    data = r.json()
+                    companies = extract_companies_from_json(data)
+                    # Deduplicate
+                    with lock:
+                        new_companies = [c for c in companies if str(c["companyId"]) not in existing_ids]
+                        existing_ids.update(str(c["companyId"]) for c in new_companies)
+                    next_page = data["pageProps"].get("pagination", {}).get("next")
+                    save_companies(new_companies, [task], [page_task(next_page)] if next_page else [])
+                    if new_companies:
+                        print(f"Page {page}: Added {len(new_companies)} new companies.")
+                    else:
+                        print(f"Page {page}: No new companies to add.")
+                except Exception as e:
+                    print(f"Error on page {page}: {e}")
+                    print(f"Page {page} will be retried in {RETRY_DELAY}s")
+                    task.attempts += 1
+                    frontier.retry(task, str(e), RETRY_DELAY)
+    finally:
+        writer.flush()  # Pages handed to the writer are completed, not released
+        frontier.release()
+        frontier.conn.close()
 
 def main():
     existing_ids = get_existing_company_ids()
+    frontier = open_frontier()
     start_page = get_last_processed_page()
-    print(f"Starting from page {start_page}")
-    q = Queue()
-    seen_pages = set()
-    seen_pages.add(start_page)
-    q.put(start_page)
+    if frontier.add([page_task(start_page)]):
+        print(f"Starting from page {start_page}")
+    print(f"Frontier pages: {frontier.counts().get(FRONTIER_JOB, {})}")
+    frontier.conn.close()
+    writer.start()
     threads = []
     for _ in range(MAX_WORKERS):
-        t = Thread(target=fetch_page_worker, args=(q, seen_pages, existing_ids))
+        t = Thread(target=fetch_page_worker, args=(existing_ids,))
         t.daemon = True
         t.start()
         threads.append(t)
-    q.join()  # Wait for all work to finish
+    for t in threads:
+        t.join()  # Workers exit once no page is pending or leased
+    writer.close()
+    print(f"Writer: {writer.rows_written} rows in {writer.transactions} transactions")
+    print(f"Rate control: {limiter.summary()}")
     print("All pages processed.")
 
 if __name__ == "__main__":
@@ -5,6 +5,8 @@ import os
 import json
 from typing import List, Dict, Any
 
+import kpi_engine
+
 class CompanyFilter:
     def __init__(self, config_path: str = 'filter_config.json'):
         self.engine = create_engine('sqlite:///allabolag.db')
@@ -129,24 +131,14 @@ class CompanyFilter:
         """
         financials = pd.read_sql(query, self.engine)
         
-        # Calculate growth metrics for each company using its latest 3 years
-        growth_metrics = []
-        count_3y = 0
-        for orgnr in df['OrgNr']:
-            company_fin = financials[financials['OrgNr'] == orgnr].sort_values('year', ascending=False)
-            years = company_fin['year'].unique()
-            if len(years) >= 3:
-                count_3y += 1
-                last3 = company_fin.head(3).sort_values('year')
-                revenue_growth = last3['revenue'].pct_change().mean()
-                profit_growth = last3['profit'].pct_change().mean()
-                growth_metrics.append({
-                    'OrgNr': orgnr,
-                    'revenue_growth': revenue_growth,
-                    'profit_growth': profit_growth
-                })
-        print(f"[DEBUG] Companies with at least 3 years of data: {count_3y}")
-        growth_df = pd.DataFrame(growth_metrics)
+        # Average year-over-year growth over each company's latest 3 years, for all companies at once
+        trends = kpi_engine.compute_trends(financials, key='OrgNr', revenue='revenue', profit='profit', ebit=None, carry=())
+        latest = trends.groupby('OrgNr', sort=False).tail(1)
+        latest = latest[latest['years_reported'] >= 3]
+        print(f"[DEBUG] Companies with at least 3 years of data: {len(latest)}")
+        growth_df = latest[['OrgNr', 'revenue_growth_avg_3y', 'profit_growth_avg_3y']].rename(
+            columns={'revenue_growth_avg_3y': 'revenue_growth', 'profit_growth_avg_3y': 'profit_growth'}
+        )
         print("[DEBUG] Shape of growth_df:", growth_df.shape)
         print("[DEBUG] Columns in growth_df:", growth_df.columns.tolist())
         print("[DEBUG] Sample growth_df:", growth_df.head())
@@ -1,11 +1,65 @@
 #!/usr/bin/env python3
 """
 Fix local SQLite database column types
-Convert revenue, profit, employees from TEXT to proper numeric types
+Convert revenue, profit, employees from TEXT to proper numeric types,
+then add typed shadow columns, indexes, the FTS5 search index and the analytics
+rollups for the local data API
 """
 
 import sqlite3
 import sys
+import time
+
+from analytics_rollups import refresh_rollups
+
+# Typed shadow columns used by local_data_api filters. They are VIRTUAL generated
+# columns, so they always match the source columns and only their indexes take space.
+# The expressions mirror the CAST(...) filters the API used before this migration.
+FILTER_COLUMNS = {
+    "revenue_num": "REAL GENERATED ALWAYS AS (CAST(revenue AS REAL)) VIRTUAL",
+    "profit_num": "REAL GENERATED ALWAYS AS (CAST(profit AS REAL)) VIRTUAL",
+    "employees_num": "INTEGER GENERATED ALWAYS AS (CAST(employees AS INTEGER)) VIRTUAL",
+    "ebit_amount": "REAL GENERATED ALWAYS AS (EBIT_margin * CAST(revenue AS REAL)) VIRTUAL",
+}
+
+# B-tree indexes for the filtered and sorted columns of /companies.
+# (name, OrgNr) is the keyset pagination order, so a cursor page is a single index seek.
+FILTER_INDEXES = {
+    "idx_master_analytics_orgnr": "OrgNr",
+    "idx_master_analytics_name_orgnr": "name, OrgNr",
+    "idx_master_analytics_revenue_num": "revenue_num",
+    "idx_master_analytics_profit_num": "profit_num",
+    "idx_master_analytics_employees_num": "employees_num",
+    "idx_master_analytics_ebit_amount": "ebit_amount",
+    "idx_master_analytics_revenue_growth": "Revenue_growth",
+    "idx_master_analytics_industry": "industry_name",
+    "idx_master_analytics_city": "city",
+    "idx_master_analytics_profitability": "profitability_category, name, OrgNr",
+    "idx_master_analytics_size": "company_size_category, name, OrgNr",
+    "idx_master_analytics_growth": "growth_category, name, OrgNr",
+}
+
+# FTS5 index behind /companies/search and the name filter. It is an external-content table
+# over master_analytics (no second copy of the text) kept in sync by the triggers below.
+# unicode61 with remove_diacritics lets "goteborg" match "Göteborg"; the prefix indexes
+# make two- and three-letter type-ahead queries index lookups.
+SEARCH_TABLE = "master_analytics_fts"
+SEARCH_COLUMNS = ["name", "city", "industry_name", "segment_name"]
+SEARCH_TRIGGERS = {
+    "master_analytics_fts_ai": """
+        AFTER INSERT ON master_analytics BEGIN
+            INSERT INTO {table} (rowid, {columns}) VALUES (new.rowid, {new_values});
+        END""",
+    "master_analytics_fts_ad": """
+        AFTER DELETE ON master_analytics BEGIN
+            INSERT INTO {table} ({table}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+        END""",
+    "master_analytics_fts_au": """
+        AFTER UPDATE OF {columns} ON master_analytics BEGIN
+            INSERT INTO {table} ({table}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO {table} (rowid, {columns}) VALUES (new.rowid, {new_values});
+        END""",
+}
 
 def fix_column_types(db_path):
     """Convert TEXT columns to numeric types in master_analytics table"""
@@ -237,6 +291,139 @@ def fix_column_types(db_path):
     finally:
         conn.close()
 
+def needs_type_fix(db_path):
+    """True while revenue/profit/employees are still stored as TEXT"""
+    conn = sqlite3.connect(db_path)
+    try:
+        columns = conn.execute("PRAGMA table_info(master_analytics)").fetchall()
+    finally:
+        conn.close()
+    return any(col[1] in ['revenue', 'profit', 'employees'] and col[2].upper() == 'TEXT' for col in columns)
+
+def add_filter_indexes(db_path):
+    """Add typed shadow columns and B-tree indexes used by the local data API, then ANALYZE"""
+    
+    print(f"Opening database: {db_path}")
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    try:
+        print("\n=== ADDING TYPED SHADOW COLUMNS ===")
+        existing = {col[1] for col in cursor.execute("PRAGMA table_xinfo(master_analytics)").fetchall()}
+        for column, definition in FILTER_COLUMNS.items():
+            if column in existing:
+                print(f"- {column} already present")
+                continue
+            try:
+                cursor.execute(f"ALTER TABLE master_analytics ADD COLUMN {column} {definition}")
+            except sqlite3.OperationalError as e:
+                raise RuntimeError(
+                    f"Could not add generated column {column} (SQLite {sqlite3.sqlite_version}; 3.31+ required): {e}"
+                )
+            print(f"✓ Added {column}")
+        conn.commit()
+        
+        print("\n=== CREATING INDEXES ===")
+        for index_name, columns in FILTER_INDEXES.items():
+            start = time.perf_counter()
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON master_analytics ({columns})")
+            print(f"✓ {index_name} ({columns}) in {time.perf_counter() - start:.2f}s")
+        conn.commit()
+        
+        print("\n=== ANALYZE ===")
+        start = time.perf_counter()
+        cursor.execute("ANALYZE")
+        cursor.execute("PRAGMA optimize")
+        conn.commit()
+        print(f"✓ Statistics refreshed in {time.perf_counter() - start:.2f}s")
+        
+        print("\n=== SAMPLE FILTERED PAGE ===")
+        sample_query = """
+            SELECT OrgNr FROM master_analytics
+            WHERE revenue_num BETWEEN ? AND ? AND employees_num <= ?
+            ORDER BY name, OrgNr LIMIT 20
+        """
+        sample_params = (10_000_000, 50_000_000, 50)
+        plan = cursor.execute(f"EXPLAIN QUERY PLAN {sample_query}", sample_params).fetchall()
+        for row in plan:
+            print(f"  {row[-1]}")
+        start = time.perf_counter()
+        cursor.execute(sample_query, sample_params).fetchall()
+        print(f"  Page fetched in {(time.perf_counter() - start) * 1000:.1f} ms")
+        
+        print("\n✅ Filter columns and indexes are in place.")
+        
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        conn.rollback()
+        raise
+    
+    finally:
+        conn.close()
+
+def create_search_index(db_path):
+    """Create (or rebuild) the FTS5 company search index and its sync triggers.
+
+    The index is keyed on master_analytics.rowid, so re-run this after anything that
+    rewrites the table (fix_column_types, VACUUM) to drop stale entries.
+    """
+    
+    print(f"Opening database: {db_path}")
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    columns = ", ".join(SEARCH_COLUMNS)
+    
+    try:
+        print("\n=== CREATING FTS5 TABLE ===")
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+                {columns},
+                content='master_analytics',
+                content_rowid='rowid',
+                prefix='2 3',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        print(f"✓ {SEARCH_TABLE} ({columns})")
+        
+        print("\n=== CREATING SYNC TRIGGERS ===")
+        for trigger, body in SEARCH_TRIGGERS.items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"CREATE TRIGGER {trigger} " + body.format(
+                table=SEARCH_TABLE,
+                columns=columns,
+                new_values=", ".join(f"new.{col}" for col in SEARCH_COLUMNS),
+                old_values=", ".join(f"old.{col}" for col in SEARCH_COLUMNS),
+            ))
+            print(f"✓ {trigger}")
+        
+        print("\n=== BUILDING INDEX ===")
+        start = time.perf_counter()
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        conn.commit()
+        print(f"✓ Indexed in {time.perf_counter() - start:.2f}s")
+        
+        print("\n=== SAMPLE PREFIX SEARCH ===")
+        sample_query = f"""
+            SELECT m.name FROM {SEARCH_TABLE} f JOIN master_analytics m ON m.rowid = f.rowid
+            WHERE {SEARCH_TABLE} MATCH ?
+            ORDER BY bm25({SEARCH_TABLE}, 10.0, 2.0, 2.0, 1.0) LIMIT 20
+        """
+        start = time.perf_counter()
+        rows = cursor.execute(sample_query, ('"nor"*',)).fetchall()
+        print(f"  'nor*' -> {len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+        
+        print("\n✅ Search index is in place.")
+        
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        conn.rollback()
+        raise
+    
+    finally:
+        conn.close()
+
 if __name__ == '__main__':
     db_path = '../allabolag.db'
     if len(sys.argv) > 1:
@@ -246,5 +433,27 @@ if __name__ == '__main__':
     print("FIXING LOCAL DATABASE COLUMN TYPES")
     print("=" * 70)
     
-    fix_column_types(db_path)
+    if needs_type_fix(db_path):
+        fix_column_types(db_path)
+    else:
+        print("Column types already numeric, skipping conversion")
+    
+    print("\n" + "=" * 70)
+    print("ADDING FILTER COLUMNS AND INDEXES")
+    print("=" * 70)
+    
+    add_filter_indexes(db_path)
+    
+    print("\n" + "=" * 70)
+    print("BUILDING FULL-TEXT SEARCH INDEX")
+    print("=" * 70)
+    
+    create_search_index(db_path)
+    
+    # fix_column_types recreates master_analytics, which drops the rollup triggers
+    print("\n" + "=" * 70)
+    print("REFRESHING ANALYTICS ROLLUPS")
+    print("=" * 70)
+    
+    refresh_rollups(db_path)
 
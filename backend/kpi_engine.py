@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+KPI engine for allabolag account rows
+Margins and year-over-year growth for every company in one vectorized pass (groupby shift,
+no per-company apply), reading the accounts in chunks that never split a company so
+multi-million-row tables stay within memory. compute_trends() adds rolling multi-year
+features (CAGR, growth volatility, margin trend, drawdown) the same way. update_kpis()
+recomputes only the companies whose accounts changed since the last run (rowid watermarks
+plus re-fetched crawl tasks)
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from allabolag_crawler import ACCOUNT_ITEMS_TABLE, KPI_ACCOUNTS_VIEW, KPI_CODES, FinancialsJob
+from allabolag_crawler.frontier import DONE, FRONTIER_TABLE
+from allabolag_crawler.storage import quote_identifier, table_columns, table_exists
+
+ACCOUNTS_TABLE = "company_accounts_by_id"
+COMPANIES_TABLE = "segmentation_companies_raw"
+KPI_TABLE = "company_kpis_by_id"
+TRENDS_TABLE = "company_kpi_trends"
+KPI_STATE_TABLE = "kpi_state"  # Watermarks of the last KPI run, per KPI table
+CHUNK_ROWS = 500_000  # Account rows read per chunk (rounded to whole companies)
+
+KEY_COLUMNS = ["companyId", "organisationNumber", "name", "year"]
+MARGINS = {"ebit_margin": "RG", "net_margin": "DR", "pbt_margin": "resultat_e_finansnetto"}  # Code / SDI
+GROWTH = {"revenue_growth": "SDI", "ebit_growth": "RG", "profit_growth": "DR"}  # Change on the company's previous year
+RATIOS = {"equity_ratio": "EKA", "return_on_equity": "avk_eget_kapital"}  # Reported by allabolag as is
+KPI_COLUMNS = KEY_COLUMNS + list(MARGINS) + list(GROWTH) + list(RATIOS)
+
+# Rolling features over each company's latest reported years (rows), as of every year
+TREND_FEATURES = [
+    "years_reported",
+    "revenue_cagr_3y",
+    "revenue_cagr_5y",
+    "revenue_growth_avg_3y",  # Mean year-over-year growth across the latest 3 years
+    "profit_growth_avg_3y",
+    "revenue_growth_volatility_5y",  # Standard deviation of year-over-year revenue growth
+    "ebit_margin_slope_5y",  # Least-squares change in EBIT margin per year
+    "revenue_drawdown_5y",  # Revenue against its 5-year peak (0 at the peak, negative below it)
+]
+TREND_COLUMNS = ["companyId", "organisationNumber", "year"] + TREND_FEATURES
+
+def compute_kpis(accounts):
+    """KPI rows for the account rows of whole companies (one row per company and year)"""
+    df = accounts.sort_values(["companyId", "year"], kind="stable")
+    kpis = df[KEY_COLUMNS].reset_index(drop=True)
+    kpis["year"] = pd.to_numeric(kpis["year"], errors="coerce")
+    values = df[list(KPI_CODES)].apply(pd.to_numeric, errors="coerce").reset_index(drop=True)
+
+    for kpi, code in MARGINS.items():
+        kpis[kpi] = values[code] / values["SDI"]
+    # All growth rates in one grouped shift; same as pct_change without filling missing years
+    growth_codes = list(GROWTH.values())
+    previous = values[growth_codes].groupby(kpis["companyId"], sort=False).shift()
+    growth = values[growth_codes] / previous - 1
+    for kpi, code in GROWTH.items():
+        kpis[kpi] = growth[code]
+    for kpi, code in RATIOS.items():
+        kpis[kpi] = values[code]
+    return kpis[KPI_COLUMNS]
+
+def _lag(values, position, lag):
+    """Value ``lag`` reported years back within the company; rows are sorted by company and year"""
+    return values.shift(lag).where(position >= lag)
+
+def _window(values, position, window):
+    """Array of each row's value and those of the company's ``window - 1`` previous rows, one column per lag"""
+    return np.column_stack([_lag(values, position, lag).to_numpy(dtype=float) for lag in range(window)])
+
+def _row_mean(window, min_count=1):
+    count = np.isfinite(window).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(window, axis=1) / count
+    return np.where(count >= min_count, mean, np.nan), count
+
+def _row_std(window, min_count):
+    """Sample standard deviation (ddof=1) of the known values in each row"""
+    mean, count = _row_mean(window)
+    squares = np.nansum((window - mean[:, None]) ** 2, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count >= max(min_count, 2), np.sqrt(squares / (count - 1)), np.nan)
+
+def _window_slope(x, y, position, window, min_points):
+    """Least-squares slope of ``y`` on ``x`` over each row's window, from rows where both are known"""
+    xs, ys = _window(x, position, window), _window(y, position, window)
+    unknown = np.isnan(xs) | np.isnan(ys)
+    xs[unknown] = np.nan
+    ys[unknown] = np.nan
+    dx = xs - _row_mean(xs)[0][:, None]
+    dy = ys - _row_mean(ys)[0][:, None]
+    variance = np.nansum(dx * dx, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.nansum(dx * dy, axis=1) / variance
+    return np.where(((~unknown).sum(axis=1) >= min_points) & (variance > 0), slope, np.nan)
+
+def compute_trends(accounts, key="companyId", revenue="SDI", profit="DR", ebit="RG", carry=("organisationNumber",)):
+    """Rolling multi-year features for every company and year, vectorized across companies
+
+    Windows count reported years (rows), like the KPI growth rates; the CAGR exponent uses the
+    actual years between the two reports. ``ebit`` may be None when it is not available. Columns
+    in ``carry`` are passed through. Returns ``key``, ``carry``, year and TREND_FEATURES
+    """
+    df = accounts.sort_values([key, "year"], kind="stable").reset_index(drop=True)
+    # Position within the company: a plain shift by n is the same company's value n rows back when >= n
+    position = df.groupby(key, sort=False).cumcount()
+    year = pd.to_numeric(df["year"], errors="coerce")
+    sales = pd.to_numeric(df[revenue], errors="coerce")
+    earnings = pd.to_numeric(df[profit], errors="coerce")
+
+    trends = df[[key, *carry]].copy()
+    trends["year"] = year
+    trends["years_reported"] = position + 1
+    for years in (3, 5):
+        base = _lag(sales, position, years)
+        span = year - _lag(year, position, years)
+        ratio = (sales / base).where((sales > 0) & (base > 0) & (span > 0))
+        trends[f"revenue_cagr_{years}y"] = ratio ** (1 / span) - 1
+
+    growth = (sales / _lag(sales, position, 1) - 1).replace([np.inf, -np.inf], np.nan)
+    profit_growth = (earnings / _lag(earnings, position, 1) - 1).replace([np.inf, -np.inf], np.nan)
+    has_3y = (position >= 2).to_numpy()
+    trends["revenue_growth_avg_3y"] = np.where(has_3y, _row_mean(_window(growth, position, 2))[0], np.nan)
+    trends["profit_growth_avg_3y"] = np.where(has_3y, _row_mean(_window(profit_growth, position, 2))[0], np.nan)
+    # 5 years give 4 year-over-year changes
+    trends["revenue_growth_volatility_5y"] = _row_std(_window(growth, position, 4), min_count=3)
+
+    if ebit is not None and ebit in df:
+        margin = (pd.to_numeric(df[ebit], errors="coerce") / sales).replace([np.inf, -np.inf], np.nan)
+        trends["ebit_margin_slope_5y"] = _window_slope(year, margin, position, 5, min_points=3)
+    else:
+        trends["ebit_margin_slope_5y"] = np.nan
+    with np.errstate(invalid="ignore"):
+        peak = pd.Series(np.fmax.reduce(_window(sales, position, 5), axis=1))
+    trends["revenue_drawdown_5y"] = (sales / peak - 1).where(peak > 0)
+    return trends[[key, *carry, "year", *TREND_FEATURES]]
+
+def has_account_items(conn):
+    return table_exists(conn, ACCOUNT_ITEMS_TABLE) and conn.execute(f"SELECT 1 FROM {ACCOUNT_ITEMS_TABLE} LIMIT 1").fetchone() is not None
+
+def source_query(conn, accounts_table=ACCOUNTS_TABLE):
+    """SQL for the KPI inputs: long-format rows, plus the wide rows of every (company, year) the long table lacks"""
+    codes = ", ".join(quote_identifier(code) for code in KPI_CODES)
+    parts = []
+    if has_account_items(conn):
+        if table_exists(conn, COMPANIES_TABLE):
+            name, names = "c.name", f"LEFT JOIN (SELECT companyId, MAX(name) AS name FROM {COMPANIES_TABLE} GROUP BY companyId) c USING (companyId) "
+        else:
+            name, names = "NULL AS name", ""
+        parts.append(
+            f"SELECT companyId, v.organisationNumber, {name}, v.year, {codes} "
+            f"FROM {KPI_ACCOUNTS_VIEW} v {names}"
+            "WHERE companyId IS NOT NULL"
+        )
+    if table_exists(conn, accounts_table) or not parts:
+        # Only the columns the KPIs use; codes no company reported yet are read as NULL
+        existing = {column.lower() for column in table_columns(conn, accounts_table)}
+        columns = ", ".join(
+            quote_identifier(column) if column.lower() in existing else f"NULL AS {quote_identifier(column)}"
+            for column in KEY_COLUMNS + list(KPI_CODES)
+        )
+        wide = f"SELECT {columns} FROM {quote_identifier(accounts_table)} w"
+        if parts:
+            # Years crawled in both formats are read from the long table; the company's other years stay
+            wide += (
+                f" WHERE NOT EXISTS (SELECT 1 FROM {ACCOUNT_ITEMS_TABLE} i"
+                " WHERE i.companyId = w.companyId AND i.year = w.year)"
+            )
+        parts.append(wide)
+    return " UNION ALL ".join(parts)
+
+def ensure_source_indexes(conn, accounts_table=ACCOUNTS_TABLE):
+    """Index the long table by (companyId, year) for source_query's per-year lookups"""
+    if has_account_items(conn) and table_exists(conn, accounts_table):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'idx_{ACCOUNT_ITEMS_TABLE}_company_year')} ON {ACCOUNT_ITEMS_TABLE} (companyId, year)")
+        conn.commit()
+
+def read_company_chunks(conn, query, params=(), chunk_rows=CHUNK_ROWS):
+    """DataFrames of ``query`` rows ordered by company, about ``chunk_rows`` each, never splitting a company"""
+    carry = None
+    for chunk in pd.read_sql(f"SELECT * FROM ({query}) ORDER BY companyId, year", conn, params=params, chunksize=chunk_rows):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        # The last company may continue in the next chunk
+        last = chunk["companyId"].eq(chunk["companyId"].iloc[-1])
+        carry = chunk[last]
+        if not last.all():
+            yield chunk[~last]
+    if carry is not None and len(carry):
+        yield carry
+
+def kpi_rows(kpis):
+    """``kpis`` as tuples for executemany, with NaN as NULL"""
+    return kpis.astype(object).where(kpis.notna(), None).itertuples(index=False, name=None)
+
+def insert_rows(conn, table, frame):
+    columns = ", ".join(quote_identifier(column) for column in frame.columns)
+    placeholders = ", ".join("?" * len(frame.columns))
+    conn.executemany(f"INSERT INTO {quote_identifier(table)} ({columns}) VALUES ({placeholders})", kpi_rows(frame))
+    return len(frame)
+
+def create_output_table(conn, table, columns):
+    types = {"companyId": "TEXT", "organisationNumber": "TEXT", "name": "TEXT", "year": "INTEGER", "years_reported": "INTEGER"}
+    definitions = ", ".join(f"{quote_identifier(column)} {types.get(column, 'REAL')}" for column in columns)
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+    conn.execute(f"CREATE TABLE {quote_identifier(table)} ({definitions})")
+    ensure_kpi_index(conn, table)
+
+def ensure_kpi_index(conn, kpi_table):
+    """Index for replacing one company's rows (tables written by older calc_kpis runs lack it)"""
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'idx_{kpi_table}_company')} ON {quote_identifier(kpi_table)} (companyId, year)")
+
+def current_watermarks(conn, accounts_table=ACCOUNTS_TABLE):
+    """Where the account tables end now; rows past these are new to the next incremental run"""
+    marks = {"frontier_at": time.time()}
+    for name, table in (("accounts_rowid", accounts_table), ("items_rowid", ACCOUNT_ITEMS_TABLE)):
+        if table_exists(conn, table):
+            marks[name] = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {quote_identifier(table)}").fetchone()[0]
+        else:
+            marks[name] = 0
+    return marks
+
+def load_watermarks(conn, kpi_table=KPI_TABLE):
+    if not table_exists(conn, KPI_STATE_TABLE):
+        return None
+    rows = conn.execute(f"SELECT key, value FROM {KPI_STATE_TABLE} WHERE key LIKE ?", (f"{kpi_table}:%",)).fetchall()
+    return {key.split(":", 1)[1]: float(value) for key, value in rows} or None
+
+def save_watermarks(conn, kpi_table, marks):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {KPI_STATE_TABLE} (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)")
+    now = time.time()
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {KPI_STATE_TABLE} (key, value, updated_at) VALUES (?, ?, ?)",
+        [(f"{kpi_table}:{name}", str(value), now) for name, value in marks.items()],
+    )
+
+def changed_companies(conn, accounts_table, since, until):
+    """companyIds with account rows added between two sets of watermarks, or None when a table was rewritten
+
+    Long-format upserts keep their rowid, so companies whose financials task completed again
+    (a re-fetch) in between count as changed as well
+    """
+    if until["accounts_rowid"] < since.get("accounts_rowid", 0) or until["items_rowid"] < since.get("items_rowid", 0):
+        return None  # Rows were deleted and the table vacuumed or recreated (e.g. by a dedupe): rowids are no longer comparable
+    queries = []
+    for name, table in (("accounts_rowid", accounts_table), ("items_rowid", ACCOUNT_ITEMS_TABLE)):
+        if until[name] > since.get(name, 0):
+            queries.append((
+                f"SELECT companyId FROM {quote_identifier(table)} WHERE rowid > ? AND rowid <= ?",
+                (int(since.get(name, 0)), until[name]),
+            ))
+    if table_exists(conn, FRONTIER_TABLE):
+        queries.append((
+            f"SELECT task_key FROM {FRONTIER_TABLE} WHERE job_type = ? AND status = '{DONE}' AND updated_at > ? AND updated_at <= ?",
+            (FinancialsJob.name, since.get("frontier_at", 0), until["frontier_at"]),
+        ))
+    changed = set()
+    for query, params in queries:
+        changed.update(company_id for (company_id,) in conn.execute(query, params) if company_id is not None)
+    return changed
+
+def write_chunk(conn, accounts, kpi_table, trends_table):
+    """KPIs and trend features of one chunk of whole companies; returns the KPI rows written"""
+    insert_rows(conn, trends_table, compute_trends(accounts))
+    return insert_rows(conn, kpi_table, compute_kpis(accounts))
+
+def rebuild_kpis(conn, accounts_table=ACCOUNTS_TABLE, kpi_table=KPI_TABLE, trends_table=TRENDS_TABLE, chunk_rows=CHUNK_ROWS):
+    """Recompute every company's KPIs and trends into fresh tables in one transaction; returns the KPI rows written"""
+    ensure_source_indexes(conn, accounts_table)
+    query = source_query(conn, accounts_table)
+    written = 0
+    with conn:
+        conn.execute("BEGIN")  # The drops and creates are rolled back too if anything fails
+        marks = current_watermarks(conn, accounts_table)  # Rows appended while this runs are picked up next time
+        # Before the read starts: SQLite can't drop a table while a cursor is open
+        create_output_table(conn, kpi_table, KPI_COLUMNS)
+        create_output_table(conn, trends_table, TREND_COLUMNS)
+        for accounts in read_company_chunks(conn, query, chunk_rows=chunk_rows):
+            written += write_chunk(conn, accounts, kpi_table, trends_table)
+        save_watermarks(conn, kpi_table, marks)
+    return written
+
+def update_kpis(conn, accounts_table=ACCOUNTS_TABLE, kpi_table=KPI_TABLE, trends_table=TRENDS_TABLE, chunk_rows=CHUNK_ROWS):
+    """Recompute and replace the KPIs and trends of companies whose accounts changed since the last run
+
+    Falls back to rebuild_kpis() when there is no earlier run to start from. Returns
+    (companies recomputed or None for a full rebuild, KPI rows written)
+    """
+    since = load_watermarks(conn, kpi_table)
+    marks = current_watermarks(conn, accounts_table)
+    earlier_run = since and table_exists(conn, kpi_table) and table_exists(conn, trends_table)
+    changed = changed_companies(conn, accounts_table, since, marks) if earlier_run else None
+    if changed is None:
+        return None, rebuild_kpis(conn, accounts_table, kpi_table, trends_table, chunk_rows)
+    if not changed:
+        with conn:
+            save_watermarks(conn, kpi_table, marks)
+        return 0, 0
+
+    ensure_source_indexes(conn, accounts_table)
+    source = source_query(conn, accounts_table)
+    if table_exists(conn, accounts_table):
+        # Look up the changed companies' wide rows instead of scanning every row
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'idx_{accounts_table}_company')} ON {quote_identifier(accounts_table)} (companyId)")
+    written = 0
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS kpi_changed (companyId TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.kpi_changed")
+        conn.executemany("INSERT INTO temp.kpi_changed (companyId) VALUES (?)", [(company_id,) for company_id in changed])
+        # Replace each changed company's rows, all years, since growth and trends depend on earlier years
+        for table in (kpi_table, trends_table):
+            ensure_kpi_index(conn, table)
+            conn.execute(f"DELETE FROM {quote_identifier(table)} WHERE companyId IN (SELECT companyId FROM temp.kpi_changed)")
+        query = f"SELECT * FROM ({source}) WHERE companyId IN (SELECT companyId FROM temp.kpi_changed)"
+        for accounts in read_company_chunks(conn, query, chunk_rows=chunk_rows):
+            written += write_chunk(conn, accounts, kpi_table, trends_table)
+        save_watermarks(conn, kpi_table, marks)
+    return len(changed), written
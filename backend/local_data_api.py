@@ -5,17 +5,113 @@ Serves data from the local SQLite database to the frontend
 """
 
 import os
-import sqlite3
+import io
+import re
+import csv
+import base64
+import hashlib
 import json
+import math
+import uuid
+from datetime import datetime
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 import pandas as pd
 
-app = FastAPI(title="Nivo Local Data API", version="1.0.0")
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
 
-# Add CORS middleware
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for Parquet exports
+    pa = None
+
+from analytics_rollups import DASHBOARD_ROLLUP, GROUP_ROLLUPS
+from local_db import QueryCache, ReadOnlyConnectionPool
+
+# Database path
+DB_PATH = os.getenv("LOCAL_DB_PATH", "../allabolag.db")
+DB_POOL_SIZE = int(os.getenv("LOCAL_DB_POOL_SIZE", "8"))
+BATCH_MAX_ORGNRS = 5000
+BATCH_CHUNK_SIZE = 500  # Org numbers per IN (...) query, well below SQLite's parameter limit
+EXPORT_CHUNK_ROWS = 5000  # Rows per CSV chunk / Parquet row group
+SUMMARY_CACHE_SIZE = int(os.getenv("LOCAL_DB_SUMMARY_CACHE_SIZE", "256"))
+
+db = ReadOnlyConnectionPool(DB_PATH, size=DB_POOL_SIZE)
+summary_cache = QueryCache(SUMMARY_CACHE_SIZE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db.enable_wal()
+    yield
+    db.close()
+
+app = FastAPI(title="Nivo Local Data API", version="1.0.0", lifespan=lifespan)
+
+# Cache-Control per read endpoint (first match wins, None = not cached). Responses carry
+# an ETag, so clients revalidate cheaply with If-None-Match once max-age runs out.
+CACHE_POLICIES = [
+    (re.compile(r"^/analytics/"), "public, max-age=300, stale-while-revalidate=600"),
+    (re.compile(r"^/companies/(export|batch)$"), None),
+    (re.compile(r"^/companies(/[^/]+)?$"), "public, max-age=60"),
+]
+# The data generation counter restarts with the process, so ETags are scoped to it
+ETAG_SCOPE = uuid.uuid4().hex
+
+def cache_policy(path: str):
+    for pattern, policy in CACHE_POLICIES:
+        if pattern.search(path):
+            return policy
+    return None
+
+def make_etag(generation: int, request: Request) -> str:
+    """Weak ETag over the data generation and the normalized query (blank parameters dropped, order fixed)"""
+    query = sorted((key, value.strip()) for key, value in request.query_params.multi_items() if value.strip())
+    digest = hashlib.blake2b(
+        json.dumps([ETAG_SCOPE, generation, request.url.path, query]).encode("utf-8"), digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    # Weak comparison, so a gzip-encoded copy still matches
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag.removeprefix("W/") for candidate in candidates)
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """ETag/Cache-Control for read endpoints, answering unchanged If-None-Match requests with 304"""
+    policy = cache_policy(request.url.path) if request.method in ("GET", "HEAD") else None
+    if policy is None:
+        return await call_next(request)
+    try:
+        # Read before the handler runs, so an ETag is never newer than the data it labels
+        generation = await db.run(db.data_generation)
+    except FileNotFoundError:
+        return await call_next(request)
+    
+    etag = make_etag(generation, request)
+    cache_headers = {"ETag": etag, "Cache-Control": policy}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=cache_headers)
+    
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(cache_headers)
+    return response
+
+# Compress large JSON payloads (the industry and city lists in particular)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Add CORS middleware (added last so it is outermost and also covers 304 responses)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8080", "http://localhost:3000", "http://localhost:5173"],
@@ -24,14 +120,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database path
-DB_PATH = "../allabolag.db"
+def json_bytes(content: Any) -> bytes:
+    """Compact UTF-8 JSON, via orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for rows that are already API-shaped.
+    Returning it from an endpoint skips FastAPI's response_model validation and re-encoding."""
+    
+    def render(self, content: Any) -> bytes:
+        return json_bytes(content)
 
-def get_db_connection():
-    """Get database connection"""
-    if not os.path.exists(DB_PATH):
+async def run_query(fn, *args):
+    """Run a blocking query function on the pooled read-only connections"""
+    try:
+        return await db.run(fn, *args)
+    except FileNotFoundError:
         raise HTTPException(status_code=500, detail="Database not found")
-    return sqlite3.connect(DB_PATH)
 
 class CompanyResponse(BaseModel):
     OrgNr: str
@@ -58,331 +165,710 @@ class CompanyResponse(BaseModel):
     profitability_category: Optional[str] = None
     growth_category: Optional[str] = None
 
+class CompanyFilters(BaseModel):
+    """Filter query parameters shared by the company listing endpoints"""
+    name: Optional[str] = None
+    industry: Optional[str] = None
+    city: Optional[str] = None
+    minRevenue: Optional[float] = None
+    maxRevenue: Optional[float] = None
+    minProfit: Optional[float] = None
+    maxProfit: Optional[float] = None
+    minRevenueGrowth: Optional[float] = None
+    maxRevenueGrowth: Optional[float] = None
+    minEBITAmount: Optional[float] = None
+    maxEBITAmount: Optional[float] = None
+    minEmployees: Optional[int] = None
+    maxEmployees: Optional[int] = None
+    profitability: Optional[str] = None
+    size: Optional[str] = None
+    growth: Optional[str] = None
+
+class CompanyBatchRequest(BaseModel):
+    orgnrs: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_ORGNRS)
+
 class SearchResults(BaseModel):
     companies: List[CompanyResponse]
-    total: int
+    total: Optional[int] = None
     summary: Dict[str, Any]
+    next_cursor: Optional[str] = None
 
 @app.get("/")
 async def root():
     return {"message": "Nivo Local Data API", "version": "1.0.0"}
 
-@app.get("/companies", response_model=SearchResults)
-async def get_companies(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100),
-    name: Optional[str] = None,
-    industry: Optional[str] = None,
-    city: Optional[str] = None,
-    minRevenue: Optional[float] = None,
-    maxRevenue: Optional[float] = None,
-    minProfit: Optional[float] = None,
-    maxProfit: Optional[float] = None,
-    minRevenueGrowth: Optional[float] = None,
-    maxRevenueGrowth: Optional[float] = None,
-    minEBITAmount: Optional[float] = None,
-    maxEBITAmount: Optional[float] = None,
-    minEmployees: Optional[int] = None,
-    maxEmployees: Optional[int] = None,
-    profitability: Optional[str] = None,
-    size: Optional[str] = None,
-    growth: Optional[str] = None
-):
-    """Get companies with filtering and pagination"""
-    try:
-        conn = get_db_connection()
-        
-        # Build WHERE clause
-        where_conditions = []
-        params = []
-        
-        if name:
+# Numeric filter expressions. The typed shadow columns added by fix_local_db_types.py are
+# indexed; the CAST fallback keeps the API working on databases that were not migrated.
+CAST_FILTER_COLUMNS = {
+    "revenue": "CAST(revenue AS REAL)",
+    "profit": "CAST(profit AS REAL)",
+    "employees": "CAST(employees AS INTEGER)",
+    "ebit_amount": "(EBIT_margin * CAST(revenue AS REAL))",
+}
+TYPED_FILTER_COLUMNS = {
+    "revenue": "revenue_num",
+    "profit": "profit_num",
+    "employees": "employees_num",
+    "ebit_amount": "ebit_amount",
+}
+# FTS5 index created by fix_local_db_types.py; searches fall back to LIKE without it
+SEARCH_TABLE = "master_analytics_fts"
+SEARCH_RANK = f"bm25({SEARCH_TABLE}, 10.0, 2.0, 2.0, 1.0)"  # name, city, industry_name, segment_name
+_schema_features: Dict[int, Dict[str, Any]] = {}
+
+def schema_features(conn):
+    """Detect typed filter columns and the search index, re-checked whenever the schema changes"""
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    features = _schema_features.get(schema_version)
+    if features is None:
+        available = {row[1] for row in conn.execute("PRAGMA table_xinfo(master_analytics)")}
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        features = {
+            "available": available,
+            "columns": TYPED_FILTER_COLUMNS if set(TYPED_FILTER_COLUMNS.values()) <= available else CAST_FILTER_COLUMNS,
+            "search_index": SEARCH_TABLE in tables,
+            # Rollups are only trusted while their triggers exist; recreating master_analytics drops them
+            "rollups": {DASHBOARD_ROLLUP, *GROUP_ROLLUPS} <= tables and "analytics_rollup_ai" in triggers,
+        }
+        _schema_features[schema_version] = features
+    return features
+
+def fts_match_query(text: str, column: Optional[str] = None):
+    """Turn free text into an FTS5 prefix query ("nor dat" -> "nor"* "dat"*), or None"""
+    terms = [f'"{term}"*' for term in re.findall(r"\w+", text)]
+    if not terms:
+        return None
+    query = " ".join(terms)
+    return f"{column} : ({query})" if column else query
+
+def build_where_clause(filters: CompanyFilters, columns: Dict[str, str] = CAST_FILTER_COLUMNS, search_index: bool = False):
+    """Translate company filters into a SQL WHERE clause and its parameters"""
+    where_conditions = []
+    params = []
+    
+    if filters.name:
+        match_query = fts_match_query(filters.name, "name") if search_index else None
+        if match_query:
+            where_conditions.append(f"rowid IN (SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?)")
+            params.append(match_query)
+        else:
             where_conditions.append("name LIKE ?")
-            params.append(f"%{name}%")
-        
-        if industry:
-            where_conditions.append("industry_name LIKE ?")
-            params.append(f"%{industry}%")
-        
-        if city:
-            where_conditions.append("city LIKE ?")
-            params.append(f"%{city}%")
-        
-        if minRevenue is not None:
-            where_conditions.append("CAST(revenue AS REAL) >= ?")
-            params.append(minRevenue * 1000000)  # Convert million SEK to SEK
-        
-        if maxRevenue is not None:
-            where_conditions.append("CAST(revenue AS REAL) <= ?")
-            params.append(maxRevenue * 1000000)  # Convert million SEK to SEK
-        
-        if minProfit is not None:
-            where_conditions.append("CAST(profit AS REAL) >= ?")
-            params.append(minProfit * 1000000)  # Convert million SEK to SEK
-        
-        if maxProfit is not None:
-            where_conditions.append("CAST(profit AS REAL) <= ?")
-            params.append(maxProfit * 1000000)  # Convert million SEK to SEK
-        
-        if minRevenueGrowth is not None:
-            where_conditions.append("Revenue_growth >= ?")
-            params.append(minRevenueGrowth)
-        
-        if maxRevenueGrowth is not None:
-            where_conditions.append("Revenue_growth <= ?")
-            params.append(maxRevenueGrowth)
-        
-        if minEBITAmount is not None:
-            # Filter by EBIT amount (EBIT margin * revenue)
-            where_conditions.append("(EBIT_margin * CAST(revenue AS REAL)) >= ?")
-            params.append(minEBITAmount * 1000000)  # Convert million SEK to SEK
-        
-        if maxEBITAmount is not None:
-            where_conditions.append("(EBIT_margin * CAST(revenue AS REAL)) <= ?")
-            params.append(maxEBITAmount * 1000000)  # Convert million SEK to SEK
-        
-        if minEmployees is not None:
-            where_conditions.append("CAST(employees AS INTEGER) >= ?")
-            params.append(minEmployees)
-        
-        if maxEmployees is not None:
-            where_conditions.append("CAST(employees AS INTEGER) <= ?")
-            params.append(maxEmployees)
-        
-        if profitability:
-            where_conditions.append("profitability_category = ?")
-            params.append(profitability)
-        
-        if size:
-            where_conditions.append("company_size_category = ?")
-            params.append(size)
-        
-        if growth:
-            where_conditions.append("growth_category = ?")
-            params.append(growth)
-        
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-        
-        # Get total count
-        count_query = f"SELECT COUNT(*) FROM master_analytics WHERE {where_clause}"
-        cursor = conn.execute(count_query, params)
-        total = cursor.fetchone()[0]
-        
-        # Get paginated results
-        offset = (page - 1) * limit
-        query = f"""
-            SELECT * FROM master_analytics 
+            params.append(f"%{filters.name}%")
+    
+    if filters.industry:
+        where_conditions.append("industry_name LIKE ?")
+        params.append(f"%{filters.industry}%")
+    
+    if filters.city:
+        where_conditions.append("city LIKE ?")
+        params.append(f"%{filters.city}%")
+    
+    if filters.minRevenue is not None:
+        where_conditions.append(f"{columns['revenue']} >= ?")
+        params.append(filters.minRevenue * 1000000)  # Convert million SEK to SEK
+    
+    if filters.maxRevenue is not None:
+        where_conditions.append(f"{columns['revenue']} <= ?")
+        params.append(filters.maxRevenue * 1000000)  # Convert million SEK to SEK
+    
+    if filters.minProfit is not None:
+        where_conditions.append(f"{columns['profit']} >= ?")
+        params.append(filters.minProfit * 1000000)  # Convert million SEK to SEK
+    
+    if filters.maxProfit is not None:
+        where_conditions.append(f"{columns['profit']} <= ?")
+        params.append(filters.maxProfit * 1000000)  # Convert million SEK to SEK
+    
+    if filters.minRevenueGrowth is not None:
+        where_conditions.append("Revenue_growth >= ?")
+        params.append(filters.minRevenueGrowth)
+    
+    if filters.maxRevenueGrowth is not None:
+        where_conditions.append("Revenue_growth <= ?")
+        params.append(filters.maxRevenueGrowth)
+    
+    if filters.minEBITAmount is not None:
+        # Filter by EBIT amount (EBIT margin * revenue)
+        where_conditions.append(f"{columns['ebit_amount']} >= ?")
+        params.append(filters.minEBITAmount * 1000000)  # Convert million SEK to SEK
+    
+    if filters.maxEBITAmount is not None:
+        where_conditions.append(f"{columns['ebit_amount']} <= ?")
+        params.append(filters.maxEBITAmount * 1000000)  # Convert million SEK to SEK
+    
+    if filters.minEmployees is not None:
+        where_conditions.append(f"{columns['employees']} >= ?")
+        params.append(filters.minEmployees)
+    
+    if filters.maxEmployees is not None:
+        where_conditions.append(f"{columns['employees']} <= ?")
+        params.append(filters.maxEmployees)
+    
+    if filters.profitability:
+        where_conditions.append("profitability_category = ?")
+        params.append(filters.profitability)
+    
+    if filters.size:
+        where_conditions.append("company_size_category = ?")
+        params.append(filters.size)
+    
+    if filters.growth:
+        where_conditions.append("growth_category = ?")
+        params.append(filters.growth)
+    
+    where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+    return where_clause, params
+
+COMPANY_FIELDS = list(CompanyResponse.model_fields)
+FLOAT_FIELDS = [name for name, field in CompanyResponse.model_fields.items() if field.annotation == Optional[float]]
+
+# revenue/profit/employees are rendered as the integer strings the frontend expects, in SQL:
+# the columns are REAL/INTEGER once fix_local_db_types.py has run and TEXT before that.
+INTEGER_STRING_SQL = """CASE
+            WHEN typeof({column}) IN ('integer', 'real')
+              OR (replace(replace({column}, '.', ''), '-', '') != ''
+                  AND replace(replace({column}, '.', ''), '-', '') NOT GLOB '*[^0-9]*')
+            THEN CAST(CAST(CAST({column} AS REAL) AS INTEGER) AS TEXT)
+            ELSE {column}
+        END"""
+
+def company_select_list(conn, prefix: str = ""):
+    """SELECT list producing COMPANY_FIELDS in order, normalized and with NULL for absent columns"""
+    available = schema_features(conn)["available"]
+    expressions = []
+    for field in COMPANY_FIELDS:
+        if field not in available:
+            expressions.append(f"NULL AS {field}")
+        elif field in ("revenue", "profit", "employees"):
+            expressions.append(f"{INTEGER_STRING_SQL.format(column=prefix + field)} AS {field}")
+        else:
+            expressions.append(f"{prefix}{field}")
+    return ",\n        ".join(expressions)
+
+def to_float(value):
+    """SQLite columns are loosely typed: numeric text becomes a number, anything else non-numeric None.
+    Non-finite values (inf/nan, e.g. a growth rate over a zero base) become None too: JSON can't hold them."""
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+def company_row(cursor, row):
+    """row_factory for queries selecting company_select_list().
+    Rows skip response_model validation, so float fields are coerced here as pydantic would."""
+    company = dict(zip(COMPANY_FIELDS, row))
+    for name in FLOAT_FIELDS:
+        value = company[name]
+        if value is not None and not isinstance(value, int):
+            company[name] = to_float(value)
+    return company
+
+def fetch_company_rows(conn, page_query: str, params, order_by: str = "page.name, page.OrgNr", with_rowid: bool = False):
+    """Shape the rows of a paged master_analytics query for the API.
+    Normalization runs outside the LIMITed subquery, so SQLite evaluates it only for
+    returned rows instead of for every row it sorts. With with_rowid the page query must
+    select rowid AS page_rowid, and (row, rowid) pairs are returned."""
+    cursor = conn.cursor()
+    select_list = company_select_list(conn, 'page.')
+    if with_rowid:
+        select_list += ", page.page_rowid"
+        cursor.row_factory = lambda cursor, row: (company_row(cursor, row), row[-1])
+    else:
+        cursor.row_factory = company_row
+    query = f"SELECT {select_list} FROM ({page_query}) AS page ORDER BY {order_by}"
+    return cursor.execute(query, params).fetchall()
+
+def encode_cursor(name: Optional[str], orgnr: Optional[str], rowid: int) -> str:
+    """Opaque keyset cursor for the (name, OrgNr, rowid) sort order; name and OrgNr may be NULL"""
+    return base64.urlsafe_b64encode(json.dumps([name, orgnr, rowid]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not (
+        isinstance(value, list) and len(value) == 3
+        and all(v is None or isinstance(v, str) for v in value[:2])
+        and isinstance(value[2], int) and not isinstance(value[2], bool)
+    ):
+        raise ValueError("Invalid cursor")
+    return value
+
+def keyset_condition(after):
+    """WHERE condition for rows after a decoded cursor in ORDER BY name, OrgNr, rowid.
+    SQLite sorts NULLs first and a row-value comparison with NULL is never true, so NULL
+    keys get explicit terms; the common all-set case stays a single seek on the index."""
+    name, orgnr, rowid = after
+    if orgnr is None:
+        tail, tail_params = "OrgNr IS NOT NULL OR rowid > ?", [rowid]
+    else:
+        tail, tail_params = "(OrgNr, rowid) > (?, ?)", [orgnr, rowid]
+    if name is None:
+        return f"name IS NOT NULL OR (name IS NULL AND ({tail}))", tail_params
+    if orgnr is None:
+        return f"name >= ? AND (name > ? OR {tail})", [name, name, *tail_params]
+    return "(name, OrgNr, rowid) > (?, ?, ?)", [name, orgnr, rowid]
+
+def filter_cache_key(filters: CompanyFilters):
+    """Normalized filter set: unset and blank filters dropped, strings trimmed, order fixed"""
+    values = {}
+    for key, value in filters.model_dump().items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            continue
+        values[key] = value
+    return tuple(sorted(values.items()))
+
+def fetch_filter_summary(conn, filters: CompanyFilters, where_clause: str, params: list, numeric_columns: Dict[str, str]):
+    """Total and summary block for a filter set, computed in one pass and cached until the data changes"""
+    generation = db.data_generation(conn)
+    key = filter_cache_key(filters)
+    cached = summary_cache.get(generation, key)
+    if cached is not None:
+        return cached
+    
+    # The matching rows are materialized once (a CTE referenced several times) and the
+    # count, averages and top lists are all read from that instead of re-running the filter.
+    query = f"""
+        WITH matched AS (
+            SELECT
+                {numeric_columns['revenue']} AS revenue_value,
+                revenue IS NOT NULL AND revenue != '' AS has_revenue,
+                Revenue_growth, EBIT_margin, industry_name, city
+            FROM master_analytics
             WHERE {where_clause}
-            ORDER BY name
-            LIMIT ? OFFSET ?
-        """
-        cursor = conn.execute(query, params + [limit, offset])
-        
-        columns = [description[0] for description in cursor.description]
-        companies = []
-        
-        for row in cursor.fetchall():
-            company_dict = dict(zip(columns, row))
-            # Convert numeric strings to numbers where appropriate
-            if company_dict.get('revenue') and company_dict['revenue'].replace('.', '').replace('-', '').isdigit():
-                company_dict['revenue'] = str(int(float(company_dict['revenue'])))
-            if company_dict.get('profit') and company_dict['profit'].replace('.', '').replace('-', '').isdigit():
-                company_dict['profit'] = str(int(float(company_dict['profit'])))
-            companies.append(CompanyResponse(**company_dict))
-        
-        # Calculate summary statistics
-        summary_query = f"""
-            SELECT 
-                AVG(CAST(revenue AS REAL)) as avg_revenue,
-                AVG(Revenue_growth) as avg_growth,
-                AVG(EBIT_margin) as avg_margin,
-                COUNT(DISTINCT industry_name) as industry_count
-            FROM master_analytics 
-            WHERE {where_clause} AND revenue IS NOT NULL AND revenue != ''
-        """
-        cursor = conn.execute(summary_query, params)
-        summary_row = cursor.fetchone()
-        
-        # Get top industries
-        industry_query = f"""
-            SELECT industry_name, COUNT(*) as count
-            FROM master_analytics 
-            WHERE {where_clause} AND industry_name IS NOT NULL
+        ),
+        totals AS (
+            SELECT
+                COUNT(*) AS total,
+                AVG(CASE WHEN has_revenue THEN revenue_value END) AS avg_revenue,
+                AVG(CASE WHEN has_revenue THEN Revenue_growth END) AS avg_growth,
+                AVG(CASE WHEN has_revenue THEN EBIT_margin END) AS avg_margin
+            FROM matched
+        ),
+        top_industries AS (
+            SELECT industry_name, COUNT(*) AS count
+            FROM matched
+            WHERE industry_name IS NOT NULL
             GROUP BY industry_name
             ORDER BY count DESC
             LIMIT 5
-        """
-        cursor = conn.execute(industry_query, params)
-        top_industries = [{"industry": row[0], "count": row[1]} for row in cursor.fetchall()]
-        
-        # Get top cities
-        city_query = f"""
-            SELECT city, COUNT(*) as count
-            FROM master_analytics 
-            WHERE {where_clause} AND city IS NOT NULL AND city != ''
+        ),
+        top_cities AS (
+            SELECT city, COUNT(*) AS count
+            FROM matched
+            WHERE city IS NOT NULL AND city != ''
             GROUP BY city
             ORDER BY count DESC
             LIMIT 5
-        """
-        cursor = conn.execute(city_query, params)
-        top_cities = [{"city": row[0], "count": row[1]} for row in cursor.fetchall()]
-        
-        summary = {
-            "avgRevenue": (summary_row[0] or 0) / 1000000,  # Convert to million SEK
-            "avgGrowth": summary_row[1] or 0,
-            "avgMargin": summary_row[2] or 0,
-            "topIndustries": top_industries,
-            "topCities": top_cities
-        }
-        
-        conn.close()
-        
-        return SearchResults(
-            companies=companies,
-            total=total,
-            summary=summary
         )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        SELECT 'totals', total, avg_revenue, avg_growth, avg_margin FROM totals
+        UNION ALL SELECT 'industry', count, industry_name, NULL, NULL FROM top_industries
+        UNION ALL SELECT 'city', count, city, NULL, NULL FROM top_cities
+    """
+    totals = None
+    top_industries = []
+    top_cities = []
+    for kind, count, value, avg_growth, avg_margin in conn.execute(query, params):
+        if kind == 'totals':
+            totals = (count, value, avg_growth, avg_margin)
+        elif kind == 'industry':
+            top_industries.append({"industry": value, "count": count})
+        else:
+            top_cities.append({"city": value, "count": count})
+    top_industries.sort(key=lambda item: item["count"], reverse=True)
+    top_cities.sort(key=lambda item: item["count"], reverse=True)
+    
+    total, avg_revenue, avg_growth, avg_margin = totals
+    summary = {
+        "avgRevenue": (avg_revenue or 0) / 1000000,  # Convert to million SEK
+        "avgGrowth": avg_growth or 0,
+        "avgMargin": avg_margin or 0,
+        "topIndustries": top_industries,
+        "topCities": top_cities
+    }
+    
+    summary_cache.put(generation, key, (total, summary))
+    return total, summary
 
-@app.get("/companies/{orgnr}", response_model=CompanyResponse)
-async def get_company(orgnr: str):
-    """Get a specific company by organization number"""
+def fetch_companies(conn, filters: CompanyFilters, page: int, limit: int, after=None, include_totals: bool = True):
+    features = schema_features(conn)
+    numeric_columns = features["columns"]
+    where_clause, params = build_where_clause(filters, numeric_columns, features["search_index"])
+    
+    # Get paginated results. With a cursor this is a keyset seek on (name, OrgNr, rowid), so
+    # deep pages cost the same as the first; page/OFFSET is kept for existing clients. rowid
+    # breaks ties between rows sharing name and OrgNr, which the seek would otherwise skip.
+    if after is not None:
+        seek, seek_params = keyset_condition(after)
+        page_where, page_params, offset = f"({where_clause}) AND ({seek})", params + seek_params, 0
+    else:
+        page_where, page_params, offset = where_clause, params, (page - 1) * limit
+    query = f"""
+        SELECT *, rowid AS page_rowid FROM master_analytics 
+        WHERE {page_where}
+        ORDER BY name, OrgNr, rowid
+        LIMIT ? OFFSET ?
+    """
+    rows = fetch_company_rows(
+        conn, query, page_params + [limit + 1, offset], "page.name, page.OrgNr, page.page_rowid", with_rowid=True
+    )
+    companies = [company for company, _ in rows[:limit]]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last, last_rowid = rows[limit - 1]
+        next_cursor = encode_cursor(last["name"], last["OrgNr"], last_rowid)
+    
+    if not include_totals:
+        return {"companies": companies, "total": None, "summary": {}, "next_cursor": next_cursor}
+    
+    total, summary = fetch_filter_summary(conn, filters, where_clause, params, numeric_columns)
+    
+    return {
+        "companies": companies,
+        "total": total,
+        "summary": summary,
+        "next_cursor": next_cursor
+    }
+
+@app.get("/companies", response_model=SearchResults)
+async def get_companies(
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    includeTotals: Optional[bool] = Query(None, description="Compute total and summary (default: only without a cursor)"),
+    filters: CompanyFilters = Depends()
+):
+    """Get companies with filtering and pagination (page numbers or keyset cursor)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.execute("SELECT * FROM master_analytics WHERE OrgNr = ?", (orgnr,))
-        
-        columns = [description[0] for description in cursor.description]
-        row = cursor.fetchone()
-        
-        if not row:
-            raise HTTPException(status_code=404, detail="Company not found")
-        
-        company_dict = dict(zip(columns, row))
-        conn.close()
-        
-        return CompanyResponse(**company_dict)
-        
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    include_totals = includeTotals if includeTotals is not None else after is None
+    try:
+        return FastJSONResponse(await run_query(fetch_companies, filters, page, limit, after, include_totals))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/companies/search")
-async def search_companies(q: str = Query(..., min_length=2), limit: int = Query(20, ge=1, le=100)):
-    """Search companies by name"""
-    try:
-        conn = get_db_connection()
+def fetch_company_search(conn, q: str, limit: int):
+    match_query = fts_match_query(q) if schema_features(conn)["search_index"] else None
+    if match_query:
+        # Prefix match on every word, best bm25 score first (name hits weigh the most)
+        query = f"""
+            SELECT m.*, {SEARCH_RANK} AS search_rank
+            FROM {SEARCH_TABLE} f
+            JOIN master_analytics m ON m.rowid = f.rowid
+            WHERE {SEARCH_TABLE} MATCH ?
+            ORDER BY search_rank, m.name
+            LIMIT ?
+        """
+        companies = fetch_company_rows(conn, query, (match_query, limit), "page.search_rank, page.name")
+    else:
         query = """
             SELECT * FROM master_analytics 
             WHERE name LIKE ? 
             ORDER BY name
             LIMIT ?
         """
-        cursor = conn.execute(query, (f"%{q}%", limit))
-        
-        columns = [description[0] for description in cursor.description]
-        companies = []
-        
-        for row in cursor.fetchall():
-            company_dict = dict(zip(columns, row))
-            companies.append(CompanyResponse(**company_dict))
-        
-        conn.close()
-        
-        return {"companies": companies}
-        
+        companies = fetch_company_rows(conn, query, (f"%{q}%", limit), "page.name")
+    
+    return {"companies": companies}
+
+# Registered before /companies/{orgnr} so "search" is not captured as an org number
+@app.get("/companies/search")
+async def search_companies(q: str = Query(..., min_length=2), limit: int = Query(20, ge=1, le=100)):
+    """Search companies by name, city or industry (word-prefix matching, ranked by relevance)"""
+    try:
+        return FastJSONResponse(await run_query(fetch_company_search, q, limit))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def fetch_company_batch(conn, orgnrs: List[str]):
+    placeholders = ", ".join("?" * len(orgnrs))
+    query = f"SELECT * FROM master_analytics WHERE OrgNr IN ({placeholders})"
+    companies = fetch_company_rows(conn, query, orgnrs, "page.OrgNr")
+    position = {orgnr: index for index, orgnr in enumerate(orgnrs)}
+    companies.sort(key=lambda company: position[company["OrgNr"]])
+    return companies
+
+# Registered before /companies/{orgnr} along with /companies/search
+@app.post("/companies/batch")
+async def get_companies_batch(request: CompanyBatchRequest):
+    """Look up many companies by organization number, streamed back as NDJSON in request order.
+    Duplicates are collapsed and unknown organization numbers are left out."""
+    orgnrs = list(dict.fromkeys(orgnr.strip().replace("-", "") for orgnr in request.orgnrs if orgnr.strip()))
+    chunks = [orgnrs[start:start + BATCH_CHUNK_SIZE] for start in range(0, len(orgnrs), BATCH_CHUNK_SIZE)]
+    
+    # The first chunk runs before streaming starts so database errors still map to a status code
+    try:
+        first = await run_query(fetch_company_batch, chunks[0]) if chunks else []
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def ndjson_lines():
+        companies = first
+        for chunk in chunks[1:] + [None]:
+            if companies:
+                yield b"".join(json_bytes(company) + b"\n" for company in companies)
+            if chunk is not None:
+                companies = await run_query(fetch_company_batch, chunk)
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+def build_export_query(conn, filters: CompanyFilters):
+    features = schema_features(conn)
+    where_clause, params = build_where_clause(filters, features["columns"], features["search_index"])
+    # No ORDER BY: rows stream in table order, so SQLite never buffers the result for a sort
+    return f"SELECT {company_select_list(conn)} FROM master_analytics WHERE {where_clause}", params
+
+def export_row_chunks(query: str, params: list):
+    """Yield lists of rows, EXPORT_CHUNK_ROWS at a time.
+    An export holds its connection for as long as the client takes to download it, so it
+    gets one of its own rather than a pooled one the other endpoints are waiting for."""
+    with db.dedicated_connection() as conn:
+        cursor = conn.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+def csv_export(query: str, params: list):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COMPANY_FIELDS)
+    for rows in export_row_chunks(query, params):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every row group"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def parquet_export(query: str, params: list):
+    float_fields = set(FLOAT_FIELDS)
+    schema = pa.schema([(name, pa.float64() if name in float_fields else pa.string()) for name in COMPANY_FIELDS])
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in export_row_chunks(query, params):
+            columns = []
+            for name, values in zip(COMPANY_FIELDS, zip(*rows)):
+                if name in float_fields:
+                    values = [to_float(value) for value in values]
+                else:
+                    values = [None if value is None else str(value) for value in values]
+                columns.append(pa.array(values, type=schema.field(name).type))
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+# Registered before /companies/{orgnr} along with /companies/search
+@app.get("/companies/export")
+async def export_companies(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    filters: CompanyFilters = Depends()
+):
+    """Stream every company matching the /companies filters as CSV or Parquet"""
+    if format == "parquet" and pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    try:
+        query, params = await run_query(build_export_query, filters)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    filename = f"companies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "parquet":
+        return StreamingResponse(parquet_export(query, params), media_type="application/vnd.apache.parquet", headers=headers)
+    return StreamingResponse(csv_export(query, params), media_type="text/csv; charset=utf-8", headers=headers)
+
+def fetch_company(conn, orgnr: str):
+    cursor = conn.cursor()
+    cursor.row_factory = company_row
+    return cursor.execute(
+        f"SELECT {company_select_list(conn)} FROM master_analytics WHERE OrgNr = ?", (orgnr,)
+    ).fetchone()
+
+@app.get("/companies/{orgnr}", response_model=CompanyResponse)
+async def get_company(orgnr: str):
+    """Get a specific company by organization number"""
+    try:
+        company = await run_query(fetch_company, orgnr)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if company is None:
+        raise HTTPException(status_code=404, detail="Company not found")
+    return FastJSONResponse(company)
+
+def fetch_dashboard_analytics(conn):
+    if schema_features(conn)["rollups"]:
+        row = conn.execute(f"""
+            SELECT total_companies, with_financials, with_kpis, with_digital_presence,
+                   growth_sum, growth_count, margin_sum, margin_count
+            FROM {DASHBOARD_ROLLUP} WHERE id = 1
+        """).fetchone()
+        if row:
+            return {
+                "totalCompanies": int(row[0]),
+                "totalWithFinancials": int(row[1]),
+                "totalWithKPIs": int(row[2]),
+                "totalWithDigitalPresence": int(row[3]),
+                "averageRevenueGrowth": row[4] / row[5] if row[5] else 0,
+                "averageEBITMargin": row[6] / row[7] if row[7] else 0
+            }
+    
+    # Total companies
+    cursor = conn.execute("SELECT COUNT(*) FROM master_analytics")
+    total_companies = cursor.fetchone()[0]
+    
+    # Companies with financial data
+    cursor = conn.execute("""
+        SELECT COUNT(*) FROM master_analytics 
+        WHERE revenue IS NOT NULL AND revenue != ''
+    """)
+    total_with_financials = cursor.fetchone()[0]
+    
+    # Companies with KPIs
+    cursor = conn.execute("""
+        SELECT COUNT(*) FROM master_analytics 
+        WHERE SDI IS NOT NULL OR DR IS NOT NULL OR ORS IS NOT NULL
+    """)
+    total_with_kpis = cursor.fetchone()[0]
+    
+    # Companies with digital presence
+    cursor = conn.execute("""
+        SELECT COUNT(*) FROM master_analytics 
+        WHERE homepage IS NOT NULL AND homepage != ''
+    """)
+    total_with_digital = cursor.fetchone()[0]
+    
+    # Average metrics (filter out extreme values - cap at ±100% growth)
+    cursor = conn.execute("""
+        SELECT 
+            AVG(CASE WHEN Revenue_growth IS NOT NULL AND Revenue_growth > -1 AND Revenue_growth < 1 THEN Revenue_growth ELSE NULL END) as avg_growth,
+            AVG(CASE WHEN EBIT_margin IS NOT NULL AND ABS(EBIT_margin) < 1 THEN EBIT_margin ELSE NULL END) as avg_margin
+        FROM master_analytics 
+        WHERE Revenue_growth IS NOT NULL AND EBIT_margin IS NOT NULL
+    """)
+    avg_row = cursor.fetchone()
+    avg_growth = avg_row[0] if avg_row[0] is not None else 0
+    avg_margin = avg_row[1] if avg_row[1] is not None else 0
+    
+    return {
+        "totalCompanies": total_companies,
+        "totalWithFinancials": total_with_financials,
+        "totalWithKPIs": total_with_kpis,
+        "totalWithDigitalPresence": total_with_digital,
+        "averageRevenueGrowth": avg_growth,
+        "averageEBITMargin": avg_margin
+    }
 
 @app.get("/analytics/dashboard")
 async def get_dashboard_analytics():
     """Get dashboard analytics"""
     try:
-        conn = get_db_connection()
-        
-        # Total companies
-        cursor = conn.execute("SELECT COUNT(*) FROM master_analytics")
-        total_companies = cursor.fetchone()[0]
-        
-        # Companies with financial data
-        cursor = conn.execute("""
-            SELECT COUNT(*) FROM master_analytics 
-            WHERE revenue IS NOT NULL AND revenue != ''
-        """)
-        total_with_financials = cursor.fetchone()[0]
-        
-        # Companies with KPIs
-        cursor = conn.execute("""
-            SELECT COUNT(*) FROM master_analytics 
-            WHERE SDI IS NOT NULL OR DR IS NOT NULL OR ORS IS NOT NULL
-        """)
-        total_with_kpis = cursor.fetchone()[0]
-        
-        # Companies with digital presence
-        cursor = conn.execute("""
-            SELECT COUNT(*) FROM master_analytics 
-            WHERE homepage IS NOT NULL AND homepage != ''
-        """)
-        total_with_digital = cursor.fetchone()[0]
-        
-        # Average metrics (filter out extreme values - cap at ±100% growth)
-        cursor = conn.execute("""
-            SELECT 
-                AVG(CASE WHEN Revenue_growth IS NOT NULL AND Revenue_growth > -1 AND Revenue_growth < 1 THEN Revenue_growth ELSE NULL END) as avg_growth,
-                AVG(CASE WHEN EBIT_margin IS NOT NULL AND ABS(EBIT_margin) < 1 THEN EBIT_margin ELSE NULL END) as avg_margin
-            FROM master_analytics 
-            WHERE Revenue_growth IS NOT NULL AND EBIT_margin IS NOT NULL
-        """)
-        avg_row = cursor.fetchone()
-        avg_growth = avg_row[0] if avg_row[0] is not None else 0
-        avg_margin = avg_row[1] if avg_row[1] is not None else 0
-        
-        conn.close()
-        
-        return {
-            "totalCompanies": total_companies,
-            "totalWithFinancials": total_with_financials,
-            "totalWithKPIs": total_with_kpis,
-            "totalWithDigitalPresence": total_with_digital,
-            "averageRevenueGrowth": avg_growth,
-            "averageEBITMargin": avg_margin
-        }
-        
+        return await run_query(fetch_dashboard_analytics)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def fetch_group_stats(conn, column: str, where: str, rollup: str):
+    if schema_features(conn)["rollups"]:
+        cursor = conn.execute(f"""
+            SELECT name, count, revenue_sum / NULLIF(revenue_count, 0), growth_sum / NULLIF(growth_count, 0)
+            FROM {rollup}
+            WHERE count > 0
+            ORDER BY count DESC, name
+        """)
+        return [
+            {
+                "name": row[0],
+                "count": int(row[1]),
+                "avgRevenue": row[2] or 0,
+                "avgGrowth": row[3] or 0
+            }
+            for row in cursor.fetchall()
+        ]
+    
+    query = f"""
+        SELECT 
+            {column},
+            COUNT(*) as count,
+            AVG(CASE WHEN ABS(CAST(revenue AS REAL)) < 1e308 THEN CAST(revenue AS REAL) END) as avg_revenue,
+            AVG(CASE WHEN ABS(Revenue_growth) < 1e308 THEN Revenue_growth END) as avg_growth
+        FROM master_analytics 
+        WHERE {where}
+        GROUP BY {column}
+        ORDER BY count DESC
+    """
+    cursor = conn.execute(query)
+    
+    return [
+        {
+            "name": row[0],
+            "count": row[1],
+            "avgRevenue": row[2] or 0,
+            "avgGrowth": row[3] or 0
+        }
+        for row in cursor.fetchall()
+    ]
+
 @app.get("/analytics/industries")
 async def get_industry_stats():
     """Get industry statistics"""
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT 
-                industry_name,
-                COUNT(*) as count,
-                AVG(CAST(revenue AS REAL)) as avg_revenue,
-                AVG(Revenue_growth) as avg_growth
-            FROM master_analytics 
-            WHERE industry_name IS NOT NULL
-            GROUP BY industry_name
-            ORDER BY count DESC
-        """
-        cursor = conn.execute(query)
-        
-        industries = []
-        for row in cursor.fetchall():
-            industries.append({
-                "name": row[0],
-                "count": row[1],
-                "avgRevenue": row[2] or 0,
-                "avgGrowth": row[3] or 0
-            })
-        
-        conn.close()
-        return industries
-        
+        return await run_query(fetch_group_stats, "industry_name", "industry_name IS NOT NULL", "analytics_industry_rollup")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -390,32 +876,9 @@ async def get_industry_stats():
 async def get_city_stats():
     """Get city statistics"""
     try:
-        conn = get_db_connection()
-        query = """
-            SELECT 
-                city,
-                COUNT(*) as count,
-                AVG(CAST(revenue AS REAL)) as avg_revenue,
-                AVG(Revenue_growth) as avg_growth
-            FROM master_analytics 
-            WHERE city IS NOT NULL AND city != ''
-            GROUP BY city
-            ORDER BY count DESC
-        """
-        cursor = conn.execute(query)
-        
-        cities = []
-        for row in cursor.fetchall():
-            cities.append({
-                "name": row[0],
-                "count": row[1],
-                "avgRevenue": row[2] or 0,
-                "avgGrowth": row[3] or 0
-            })
-        
-        conn.close()
-        return cities
-        
+        return await run_query(fetch_group_stats, "city", "city IS NOT NULL AND city != ''", "analytics_city_rollup")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Pooled, read-only SQLite access for the local data API.
+Queries run on a dedicated thread pool so async handlers never block the event loop.
+"""
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Iterator, Optional, TypeVar
+from urllib.parse import quote
+
+T = TypeVar("T")
+
+
+class ReadOnlyConnectionPool:
+    """Fixed-size pool of read-only SQLite connections paired with a query executor"""
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = 8,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kib: int = 64 * 1024,
+    ):
+        self.db_path = db_path
+        self.size = size
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sqlite-ro")
+
+    def enable_wal(self) -> bool:
+        """Switch the database to WAL so readers never wait on a writer (needs write access once)"""
+        if not os.path.exists(self.db_path):
+            return False
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            finally:
+                conn.close()
+            return str(mode).lower() == "wal"
+        except sqlite3.Error:
+            return False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"Database not found: {self.db_path}")
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, opening a new one while the pool is below its size"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def dedicated_connection(self) -> Iterator[sqlite3.Connection]:
+        """Open a read-only connection outside the pool, for long reads that would starve it"""
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def data_generation(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        """Counter that moves whenever another process commits to the database.
+
+        PRAGMA data_version is only comparable between calls on the same connection, so it is
+        always read on one connection kept for that purpose (``conn`` is accepted so this can
+        be passed to run()/execute(), but not used): each external commit advances the
+        generation once, however many pooled connections have observed it.
+        """
+        with self._lock:
+            if self._version_conn is None:
+                self._version_conn = self._connect()
+            version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._data_version = version
+                self._generation += 1
+            return self._generation
+
+    def execute(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run fn(conn, *args) synchronously on a pooled connection"""
+        with self.connection() as conn:
+            return fn(conn, *args)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run fn(conn, *args) on the query thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.execute, fn, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+            self._data_version = None
+
+
+class QueryCache:
+    """Thread-safe LRU of query results, emptied whenever the data generation advances"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _sync(self, generation: int) -> bool:
+        if generation > self._generation:
+            self._entries.clear()
+            self._generation = generation
+        return generation == self._generation
+
+    def get(self, generation: int, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if self._sync(generation) and key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, generation: int, key: Hashable, value: Any):
+        with self._lock:
+            # Results computed against an older generation may already be stale
+            if not self._sync(generation) or self.maxsize <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
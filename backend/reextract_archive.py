@@ -0,0 +1,84 @@
+"""Re-run crawl job parsers over the raw response archive (no network access).
+
+Decompression and parsing run in a process pool; the main process stores the records with the
+job's own ``store``, into a separate database by default so the crawl tables stay untouched.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from allabolag_crawler import ACCOUNTS_FORMATS, JOB_TYPES, ResponseArchive
+
+ACCOUNTS_JOBS = ("financials", "enrich")  # Job types taking an accounts_format
+
+
+def extract_chunk(archive_path: Path, job_type: str, ids: list[int]):
+    """Parse archived responses ``ids`` in a worker process; returns (results, failed count)."""
+    archive = ResponseArchive(archive_path, read_only=True)
+    job = JOB_TYPES[job_type]()
+    results, failed = [], 0
+    try:
+        for task, response in archive.load(ids):
+            try:
+                results.append((task, job.parse(task, response)))
+            except Exception as exc:  # A malformed body must not sink the whole chunk
+                failed += 1
+                print(f"  {job_type} {task.key}: {exc}")
+    finally:
+        archive.close()
+    return results, failed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-extract records from archived allabolag responses")
+    parser.add_argument("job", choices=sorted(JOB_TYPES), help="Job type whose parser and storage to run")
+    parser.add_argument("--archive", type=Path, default=Path("allabolag_archive.db"), help="Response archive path")
+    parser.add_argument("--db", type=Path, default=Path("allabolag_reextracted.db"), help="Output SQLite database")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Responses per worker task")
+    parser.add_argument(
+        "--accounts-format", choices=ACCOUNTS_FORMATS, default="wide", help="Layout for financials jobs (see run_allabolag_crawler.py)"
+    )
+    parser.add_argument("--all-fetches", action="store_true", help="Every archived fetch, not just the newest per task")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    archive = ResponseArchive(args.archive, read_only=True)
+    ids = archive.response_ids(args.job, latest_only=not args.all_fetches)
+    archive.close()
+    chunks = [ids[i:i + args.chunk_size] for i in range(0, len(ids), args.chunk_size)]
+    print(f"Re-extracting {len(ids)} archived {args.job} responses in {len(chunks)} chunks -> {args.db}")
+
+    job = JOB_TYPES[args.job](args.accounts_format) if args.job in ACCOUNTS_JOBS else JOB_TYPES[args.job]()
+    conn = sqlite3.connect(args.db)
+    started = time.perf_counter()
+    parsed = failed = written = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            outputs = executor.map(extract_chunk, [args.archive] * len(chunks), [args.job] * len(chunks), chunks)
+            for results, chunk_failed in outputs:
+                with conn:
+                    conn.execute("BEGIN")  # Keeps table widening in the chunk's transaction
+                    written += job.store(conn, results)
+                job.stored(results)
+                parsed += len(results)
+                failed += chunk_failed
+                print(f"  {parsed}/{len(ids)} responses, {written} rows")
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    rate = parsed / elapsed if elapsed > 0 else 0.0
+    print(f"✓ {parsed} responses parsed ({failed} failed), {written} rows written in {elapsed:.1f}s ({rate:.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,22 @@
-import requests
-import pandas as pd
-from sqlalchemy import create_engine, text
-import concurrent.futures
-import time
+import asyncio
+import logging
+from pathlib import Path
 
-DB_FILE = "allabolag.db"
-TABLE = "segmentation_companies_raw"
-CONCURRENCY = 20
-BASE_URL = "https://www.allabolag.se/company/{}"
-
-engine = create_engine(f"sqlite:///{DB_FILE}")
+from allabolag_crawler import AllabolagCrawler, CompanyIdResolutionJob, CrawlerConfig
 
-# Get all org numbers
-companies = pd.read_sql(f"SELECT rowid, organisationNumber FROM {TABLE} WHERE organisationNumber IS NOT NULL", engine)
+DB_FILE = "allabolag.db"
+CONCURRENCY = 20  # Starting requests in flight; adapts (AIMD) from the responses...
+MAX_CONCURRENCY = 32  # ...up to this ceiling
 
-# Function to resolve companyId from org number
-def resolve_companyid(row):
-    rowid, orgnr = row.rowid, row.organisationNumber
-    try:
-        url = BASE_URL.format(orgnr)
-        resp = requests.get(url, allow_redirects=True, timeout=20)
-        resp.raise_for_status()
-        # The final URL after redirects contains the Allabolag companyId as the last part
-        final_url = resp.url
-        company_id = final_url.rstrip('/').split('/')[-1]
-        # Only update if the company_id is not the same as orgnr (to avoid overwriting with orgnr)
-        if company_id and company_id != orgnr:
-            return (rowid, company_id)
-    except Exception as e:
-        print(f"Error resolving companyId for {orgnr}: {e}")
-        return (rowid, None)
+# Same tasks as `run_allabolag_crawler.py resolve`, so both resume each other. Every org number in
+# segmentation_companies_raw without a companyId is resolved from the /company/{orgnr} redirect.
 
 def main():
-    updates = []
-    with engine.begin() as conn:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
-            futures = [executor.submit(resolve_companyid, row) for row in companies.itertuples()]
-            for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
-                rowid, company_id = future.result()
-                if company_id:
-                    try:
-                        conn.execute(
-                            text(f"UPDATE {TABLE} SET companyId = :companyId WHERE rowid = :rowid"),
-                            {"companyId": company_id, "rowid": rowid}
-                        )
-                    except Exception as e:
-                        print(f"DB update error for rowid {rowid}: {e}")
-                if i % 10 == 0:
-                    print(f"Saved {i} companies...")
-    print(f"Processed {len(companies)} companies...")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    config = CrawlerConfig(db_path=Path(DB_FILE), concurrency=CONCURRENCY, max_concurrency=MAX_CONCURRENCY)
+    crawler = AllabolagCrawler(config, [CompanyIdResolutionJob()])
+    stats = asyncio.run(crawler.run())
+    print(f"Resolved companyIds: {stats.summary()}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -50,6 +50,14 @@ def parse_args() -> argparse.Namespace:
         default="ai_company_analysis",
         help="Supabase table for storing AI analysis results",
     )
+    parser.add_argument("--ai-max-usd", type=float, default=None, help="Spend cap in USD for the AI analysis run")
+    parser.add_argument("--ai-max-tokens", type=int, default=None, help="Token cap for the AI analysis run")
+    parser.add_argument(
+        "--ai-budget-action",
+        choices=["stop", "downgrade"],
+        default="stop",
+        help="When the projected spend exceeds the cap: stop, or downgrade to the screening model",
+    )
     return parser.parse_args()
 
 
@@ -69,14 +77,17 @@ def main() -> None:
     output_payload = {"quality_issues": issues, "shortlist_size": len(artifacts.shortlist)}
 
     if args.ai_analysis:
-        ai_config = AIAnalysisConfig(model=args.ai_model, supabase_table=args.ai_table)
+        ai_config = AIAnalysisConfig(
+            model=args.ai_model,
+            company_table=args.ai_table,
+            max_budget_usd=args.ai_max_usd,
+            max_budget_tokens=args.ai_max_tokens,
+            budget_action=args.ai_budget_action,
+        )
         supabase_writer = None
         if not args.ai_no_supabase:
             try:
-                supabase_writer = SupabaseAnalysisWriter(
-                    table=ai_config.supabase_table,
-                    conflict_column=ai_config.supabase_conflict_column,
-                )
+                supabase_writer = SupabaseAnalysisWriter(config=ai_config)
             except ValueError as exc:
                 print(f"⚠️  Supabase writer disabled: {exc}")
 
@@ -85,6 +96,7 @@ def main() -> None:
         output_payload["ai_run_id"] = batch.run.id
         output_payload["ai_analysis_rows"] = len(batch.companies)
         output_payload["ai_errors"] = batch.errors
+        output_payload["ai_budget"] = batch.budget
         company_df = batch.company_dataframe()
         output_payload["ai_output_columns"] = list(company_df.columns)
 
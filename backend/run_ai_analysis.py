@@ -9,6 +9,7 @@ from pathlib import Path
 import pandas as pd
 
 from agentic_pipeline import AIAnalysisConfig, AgenticLLMAnalyzer, SupabaseAnalysisWriter
+from agentic_pipeline.checkpoint import DEFAULT_CHECKPOINT_PATH
 
 
 def parse_args() -> argparse.Namespace:
@@ -23,6 +24,52 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("--initiated-by", type=str, default=None, help="Identifier of the triggering user")
     parser.add_argument("--filters", type=str, default=None, help="JSON string describing shortlist filters")
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        metavar="RUN_ID",
+        help="Resume an interrupted run, skipping companies it already completed (implies --checkpoint)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        nargs="?",
+        const=DEFAULT_CHECKPOINT_PATH,
+        default=None,
+        metavar="PATH",
+        help=f"Journal completed companies locally so the run can be resumed (default path: {DEFAULT_CHECKPOINT_PATH})",
+    )
+    parser.add_argument(
+        "--funnel",
+        action="store_true",
+        help="Screen all rows and deep-analyse those above --score-threshold while screening runs",
+    )
+    parser.add_argument(
+        "--score-threshold",
+        type=float,
+        default=70.0,
+        help="Minimum screening score for deep analysis in --funnel mode (default: 70)",
+    )
+    parser.add_argument(
+        "--deep-limit",
+        type=int,
+        default=None,
+        help="Maximum number of deep analyses in --funnel mode",
+    )
+    parser.add_argument("--max-usd", type=float, default=None, help="Stop dispatching once the run would exceed this spend")
+    parser.add_argument("--max-tokens", type=int, default=None, help="Stop dispatching once the run would exceed this many tokens")
+    parser.add_argument(
+        "--budget-action",
+        choices=["stop", "downgrade"],
+        default="stop",
+        help="When the projected spend exceeds the budget: stop, or downgrade deep analysis to the screening model",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream model responses and persist results as they complete",
+    )
     return parser.parse_args()
 
 
@@ -36,18 +83,54 @@ def main() -> None:
     args = parse_args()
     shortlist = load_shortlist(args.input)
 
-    config = AIAnalysisConfig(model=args.model)
+    config = AIAnalysisConfig(
+        model=args.model,
+        stream_responses=args.stream,
+        max_budget_usd=args.max_usd,
+        max_budget_tokens=args.max_tokens,
+        budget_action=args.budget_action,
+        checkpoint_path=args.checkpoint or (DEFAULT_CHECKPOINT_PATH if args.resume else None),
+    )
     writer = None
     if args.write_supabase:
         writer = SupabaseAnalysisWriter(config=config)
 
     filters = json.loads(args.filters) if args.filters else None
     analyzer = AgenticLLMAnalyzer(config, supabase_writer=writer)
+    if args.funnel:
+        funnel = analyzer.run_funnel(
+            shortlist,
+            score_threshold=args.score_threshold,
+            deep_limit=args.deep_limit,
+            limit=args.limit,
+            run_id=args.resume,
+            initiated_by=args.initiated_by,
+            filters=filters,
+            resume=args.resume is not None,
+        )
+        print(
+            json.dumps(
+                {
+                    "screening_run_id": funnel.screening.run.id,
+                    "deep_run_id": funnel.deep.run.id,
+                    "screened": len(funnel.screening.results),
+                    "deep_analysed": len(funnel.deep.companies),
+                    "skipped": len(funnel.screening.skipped_orgnrs),
+                    "errors": funnel.screening.errors + funnel.deep.errors,
+                    "budget": funnel.deep.budget,
+                },
+                indent=2,
+            )
+        )
+        return
+
     batch = analyzer.run(
         shortlist,
         limit=args.limit,
+        run_id=args.resume,
         initiated_by=args.initiated_by,
         filters=filters,
+        resume=args.resume is not None,
     )
 
     company_df = batch.company_dataframe()
@@ -56,6 +139,8 @@ def main() -> None:
             {
                 "run_id": batch.run.id,
                 "rows": len(batch.companies),
+                "skipped": len(batch.skipped_orgnrs),
+                "budget": batch.budget,
                 "errors": batch.errors,
                 "columns": list(company_df.columns),
             },
@@ -0,0 +1,111 @@
+"""CLI for the asyncio allabolag crawler (segmentation pages, companyId resolution, financials)."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sqlite3
+from pathlib import Path
+
+from allabolag_crawler import (
+    ACCOUNTS_FORMATS,
+    JOB_TYPES,
+    AllabolagCrawler,
+    CrawlerConfig,
+    CrawlFrontier,
+    SegmentationConfig,
+)
+
+LEGACY_PAGE_FILE = Path("segmentation_last_page.txt")  # Progress file of fetch_allabolag.py before the frontier
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Crawl allabolag.se into the local SQLite database")
+    parser.add_argument(
+        "jobs",
+        nargs="+",
+        choices=sorted(JOB_TYPES),
+        help="Job types to run in this crawl (they share the session and rate limit)",
+    )
+    parser.add_argument("--db", type=Path, default=Path("allabolag.db"), help="SQLite database path")
+    parser.add_argument("--concurrency", type=int, default=4, help="Starting requests in flight per host")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=32, help="Ceiling for the adaptive (AIMD) concurrency per host"
+    )
+    parser.add_argument(
+        "--rps", type=float, default=0.0, help="Optional hard request rate ceiling (requests per second, 0: none)"
+    )
+    parser.add_argument(
+        "--archive", type=Path, default=Path("allabolag_archive.db"), help="Raw response archive (for reextract_archive.py)"
+    )
+    parser.add_argument("--no-archive", action="store_true", help="Do not keep raw responses")
+    parser.add_argument("--metrics-file", type=Path, default=None, help="Write live rate-control metrics (JSON) here")
+    parser.add_argument("--limit", type=int, default=None, help="Claim at most this many tasks in this run")
+    parser.add_argument("--build-id", type=str, default=None, help="Next.js buildId for /_next/data URLs (default: discovered from the home page)")
+    parser.add_argument(
+        "--start-page",
+        type=int,
+        default=None,
+        help=f"First segmentation page when the frontier has none yet (default: {LEGACY_PAGE_FILE} or 1)",
+    )
+    parser.add_argument(
+        "--accounts-format",
+        choices=ACCOUNTS_FORMATS,
+        default="wide",
+        help="Store financials one column per account code (wide), in company_account_items (long) or both",
+    )
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue tasks that previously gave up")
+    parser.add_argument(
+        "--recrawl", action="store_true", help="Requeue finished tasks, e.g. to walk the segmentation pages again for new companies"
+    )
+    parser.add_argument("--status", action="store_true", help="Print the frontier counts and exit")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    config = CrawlerConfig(
+        db_path=args.db,
+        concurrency=args.concurrency,
+        max_concurrency=args.max_concurrency,
+        requests_per_second=args.rps,
+        metrics_path=args.metrics_file,
+        archive_path=None if args.no_archive else args.archive,
+        limit=args.limit,
+    )
+    if args.build_id:
+        config.build_id = args.build_id
+
+    conn = sqlite3.connect(config.db_path)
+    try:
+        frontier = CrawlFrontier(conn)
+        if args.status:
+            for job_type, counts in sorted(frontier.counts().items()):
+                print(f"{job_type}: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+            return
+        if args.retry_failed:
+            print(f"Requeued {frontier.requeue_failed(args.jobs)} failed tasks")
+        if args.recrawl:
+            print(f"Requeued {frontier.requeue_done(args.jobs)} finished tasks")
+    finally:
+        conn.close()
+
+    start_page = args.start_page
+    if start_page is None:
+        start_page = int(LEGACY_PAGE_FILE.read_text().strip()) if LEGACY_PAGE_FILE.exists() else 1
+    job_args = {
+        "segmentation": (SegmentationConfig(start_page=start_page),),
+        "financials": (args.accounts_format,),
+        "enrich": (args.accounts_format,),
+    }
+    jobs = [JOB_TYPES[name](*job_args.get(name, ())) for name in args.jobs]
+    crawler = AllabolagCrawler(config, jobs)
+    stats = asyncio.run(crawler.run())
+    print(f"Crawl complete: {stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
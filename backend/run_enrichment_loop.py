@@ -1,90 +1,75 @@
-import subprocess
+import asyncio
+import logging
+import sqlite3
 import time
-import pandas as pd
 from datetime import datetime
-from sqlalchemy import create_engine, text
 
-def get_missing_count():
-    """Get the number of companies still missing financial data"""
-    engine = create_engine('sqlite:///allabolag.db')
+from allabolag_crawler import AllabolagCrawler, CrawlerConfig, CrawlFrontier, OrgnrFinancialsJob
+
+DB_FILE = "allabolag.db"
+
+def get_frontier_counts():
+    """Status counts of the enrich tasks in the crawl frontier"""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
     try:
-        # Get count of companies with companyId
-        total = pd.read_sql(
-            text("SELECT COUNT(*) as count FROM companies_enriched WHERE companyId IS NOT NULL"),
-            engine
-        ).iloc[0]['count']
-        
-        # Get count of companies with financials
-        have_financials = pd.read_sql(
-            text("SELECT COUNT(DISTINCT OrgNr) as count FROM company_accounts"),
-            engine
-        ).iloc[0]['count']
-        
-        return total - have_financials
+        return CrawlFrontier(conn).counts().get(OrgnrFinancialsJob.name, {})
     except Exception as e:
-        print(f"Error checking missing count: {e}")
+        print(f"Error reading crawl frontier: {e}")
         return None
+    finally:
+        conn.close()
 
 def run_enrichment():
-    """Run the enrichment script and return success status"""
+    """Seed newly found companies into the frontier and fetch every pending one; returns the crawl stats"""
     try:
-        result = subprocess.run(
-            ['python', 'enrich_financials.py'],
-            capture_output=True,
-            text=True
-        )
-        print(f"\nRun completed with exit code: {result.returncode}")
-        print("Output:")
-        print(result.stdout)
-        if result.stderr:
-            print("Errors:")
-            print(result.stderr)
-        return result.returncode == 0
+        crawler = AllabolagCrawler(CrawlerConfig(db_path=DB_FILE), [OrgnrFinancialsJob()])
+        stats = asyncio.run(crawler.run())
+        print(f"\nRun completed: {stats.summary()}")
+        return stats
     except Exception as e:
-        print(f"Error running enrichment script: {e}")
-        return False
+        print(f"Error running enrichment crawl: {e}")
+        return None
 
 def main():
     iteration = 1
     max_iterations = 100  # Safety limit
     min_wait_time = 60  # Minimum seconds between runs
-    
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     print(f"Starting enrichment loop at {datetime.now()}")
-    
+
     while iteration <= max_iterations:
         print(f"\n=== Iteration {iteration} ===")
-        
-        # Check how many companies are still missing data
-        missing = get_missing_count()
-        if missing is None:
-            print("Error checking missing count, waiting 5 minutes before retry...")
+
+        # Each run resumes from the frontier: finished companies are never fetched again
+        stats = run_enrichment()
+        if stats is None:
+            print("\nEnrichment crawl failed, waiting 5 minutes before retry...")
             time.sleep(300)
             continue
-            
-        print(f"Companies still missing financial data: {missing}")
-        
-        if missing == 0:
-            print("\nAll companies have financial data! Exiting loop.")
-            break
-            
-        # Run the enrichment script
-        success = run_enrichment()
-        
-        if not success:
-            print("\nEnrichment script failed, waiting 5 minutes before retry...")
+
+        counts = get_frontier_counts()
+        if counts is None:
+            print("Error checking frontier, waiting 5 minutes before retry...")
             time.sleep(300)
             continue
-            
-        # Wait before next iteration
+
+        print(f"Enrich tasks: {counts}")
+        remaining = counts.get("pending", 0) + counts.get("leased", 0)
+        if stats.succeeded == 0 and remaining == 0:
+            print(f"\nAll companies have financial data ({counts.get('failed', 0)} gave up). Exiting loop.")
+            break
+
+        # Wait before looking for newly added companies
         print(f"\nWaiting {min_wait_time} seconds before next iteration...")
         time.sleep(min_wait_time)
-        
+
         iteration += 1
-    
+
     if iteration > max_iterations:
         print("\nReached maximum number of iterations. Please check the data manually.")
-    
+
     print(f"\nEnrichment loop completed at {datetime.now()}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,69 @@
+import math
+import sqlite3
+
+import pytest
+
+from analytics_rollups import DASHBOARD_ROLLUP, GROUP_ROLLUPS, refresh_rollups
+
+ROWS = [
+    # OrgNr, revenue, Revenue_growth, EBIT_margin, industry_name, city
+    ("5560000001", "1000", 0.1, 0.05, "Bygg", "Stockholm"),
+    ("5560000002", "2000", math.inf, 0.02, "Bygg", "Stockholm"),
+    ("5560000003", "3000", -math.inf, None, "Bygg", "Göteborg"),
+    ("5560000004", "4000", 0.3, 0.10, "Handel", "Göteborg"),
+    ("5560000005", None, None, None, "Handel", ""),
+]
+
+
+def rollups(conn):
+    tables = [DASHBOARD_ROLLUP, *GROUP_ROLLUPS]
+    return {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall() for table in tables}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "analytics.db"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE master_analytics (OrgNr TEXT, revenue TEXT, Revenue_growth REAL, EBIT_margin REAL, "
+        "SDI REAL, DR REAL, ORS REAL, homepage TEXT, industry_name TEXT, city TEXT)"
+    )
+    conn.executemany(
+        "INSERT INTO master_analytics (OrgNr, revenue, Revenue_growth, EBIT_margin, industry_name, city) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        ROWS,
+    )
+    conn.commit()
+    conn.close()
+    refresh_rollups(path)
+    return path
+
+
+def test_group_sums_skip_infinite_growth(db_path):
+    conn = sqlite3.connect(db_path)
+    count, growth_sum, growth_count = conn.execute(
+        "SELECT count, growth_sum, growth_count FROM analytics_industry_rollup WHERE name = 'Bygg'"
+    ).fetchone()
+    assert (count, growth_sum, growth_count) == (3, pytest.approx(0.1), 1)
+
+
+def test_triggers_update_and_delete_infinite_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE master_analytics SET revenue = '2500' WHERE OrgNr = '5560000002'")
+        conn.execute("UPDATE master_analytics SET Revenue_growth = 0.2 WHERE OrgNr = '5560000003'")
+        conn.execute("DELETE FROM master_analytics WHERE OrgNr = '5560000002'")
+        conn.execute(
+            "INSERT INTO master_analytics (OrgNr, revenue, Revenue_growth, industry_name, city) "
+            "VALUES ('5560000006', '500', ?, 'Handel', 'Malmö')",
+            (math.inf,),
+        )
+    incremental = rollups(conn)
+    conn.close()
+
+    refresh_rollups(db_path)
+    conn = sqlite3.connect(db_path)
+    rebuilt = rollups(conn)
+    assert incremental.keys() == rebuilt.keys()
+    for table in rebuilt:
+        assert incremental[table] == [pytest.approx(row) for row in rebuilt[table]]
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from allabolag_crawler import archive as archive_module
+from allabolag_crawler import CrawlTask, ResponseArchive
+from allabolag_crawler.jobs import FetchedResponse
+
+
+def response(company_id, revenue):
+    body = json.dumps({"pageProps": {"company": {"companyId": company_id, "revenue": revenue, "name": "AB " * 50}}})
+    return FetchedResponse(200, f"https://www.allabolag.se/_next/data/B/company/{company_id}.json", body.encode())
+
+
+def archive_and_reload(path, fetches):
+    archive = ResponseArchive(path)
+    try:
+        for task, fetched in fetches:
+            archive.put(task, fetched)
+        stats = archive.stats()
+    finally:
+        archive.close()
+    archive = ResponseArchive(path, read_only=True)
+    try:
+        latest = list(archive.load(archive.response_ids("financials")))
+        every = list(archive.load(archive.response_ids("financials", latest_only=False)))
+    finally:
+        archive.close()
+    return stats, latest, every
+
+
+@pytest.mark.parametrize("codec", ["zstd", "zlib"])
+def test_round_trip_deduplicates_bodies(tmp_path, monkeypatch, codec):
+    if codec == "zlib":
+        monkeypatch.setattr(archive_module, "zstandard", None)
+    elif archive_module.zstandard is None:
+        pytest.skip("zstandard is not installed")
+    task = CrawlTask("financials", "C1", {"organisationNumber": "5560000001"})
+    fetches = [(task, response("C1", 100)), (task, response("C1", 100)), (task, response("C1", 200))]
+    stats, latest, every = archive_and_reload(tmp_path / "archive.db", fetches)
+    assert (stats["responses"], stats["unique_bodies"]) == (3, 2)
+    assert stats["stored_bytes"] < stats["raw_bytes"]
+    assert [(loaded_task, loaded.body, loaded.url) for loaded_task, loaded in latest] == [
+        (task, fetches[2][1].body, fetches[2][1].url)
+    ]
+    assert [loaded.body for _, loaded in every] == [fetched.body for _, fetched in fetches]
+
+
+def test_round_trip_through_a_trained_dictionary(tmp_path, monkeypatch):
+    if archive_module.zstandard is None:
+        pytest.skip("zstandard is not installed")
+    monkeypatch.setattr(archive_module, "DICT_SAMPLES", 50)
+    monkeypatch.setattr(archive_module, "DICT_SIZE", 4096)
+    fetches = [(CrawlTask("financials", f"C{index}"), response(f"C{index}", index * 1000)) for index in range(80)]
+    stats, latest, _ = archive_and_reload(tmp_path / "archive.db", fetches)
+    assert stats["unique_bodies"] == 80
+    assert [(task.key, loaded.body) for task, loaded in latest] == [(task.key, fetched.body) for task, fetched in fetches]
+    archive = ResponseArchive(tmp_path / "archive.db", read_only=True)
+    try:
+        (with_dictionary,) = archive.conn.execute("SELECT COUNT(dict_id) FROM raw_blobs").fetchone()
+    finally:
+        archive.close()
+    assert with_dictionary > 0
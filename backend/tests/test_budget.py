@@ -0,0 +1,66 @@
+import pytest
+
+from agentic_pipeline.budget import DEEP, DOWNGRADE, PROCEED, SCREENING, STOP, RunBudget, estimate_tokens
+
+
+def usage(tokens):
+    return {"input_tokens": tokens - 100, "output_tokens": 100}
+
+
+def test_projection_averages_the_stage_window():
+    budget = RunBudget(max_usd=10.0, window=2)
+    budget.record(usage(1000), 1.0, stage=DEEP)
+    budget.record(usage(2000), 2.0, stage=DEEP)
+    budget.record(usage(3000), 3.0, stage=DEEP)  # Pushes the first call out of the window
+    budget.record(usage(100), 0.01, stage=SCREENING)
+    assert budget.projected(4, DEEP) == pytest.approx((6.01 + 2.5 * 4, 6100 + 2500 * 4))
+    assert budget.projected(4, SCREENING) == pytest.approx((6.01 + 0.04, 6100 + 400))
+
+
+def test_projection_without_samples_is_the_spend_so_far():
+    budget = RunBudget(max_tokens=1000)
+    budget.record_failed(usage(300), 0.5)
+    assert budget.projected(10, DEEP) == (0.5, 300.0)
+    assert budget.snapshot()["failed_calls"] == 1
+    assert budget.snapshot()["calls"] == 0
+
+
+def test_stop_when_the_next_call_would_exceed_the_budget():
+    budget = RunBudget(max_usd=5.0)
+    budget.record(usage(1000), 2.0, stage=DEEP)
+    assert budget.decide(1, DEEP) == PROCEED  # 2 + 2 <= 5
+    budget.record(usage(1000), 2.0, stage=DEEP)
+    assert budget.decide(1, DEEP) == STOP  # 4 + 2 > 5
+    assert budget.decide(1, SCREENING) == PROCEED  # No screening samples: only the spend counts
+
+
+def test_token_limit_stops_too():
+    budget = RunBudget(max_tokens=2500)
+    budget.record(usage(1000), None, stage=SCREENING)
+    assert budget.decide(1, SCREENING) == PROCEED
+    budget.record(usage(1000), None, stage=SCREENING)
+    assert budget.decide(1, SCREENING) == STOP
+
+
+def test_downgrade_only_for_the_deep_stage_and_only_once():
+    budget = RunBudget(max_usd=10.0, on_exceed=DOWNGRADE)
+    budget.record(usage(1000), 1.0, stage=DEEP)
+    budget.record(usage(100), 1.0, stage=SCREENING)
+    assert budget.decide(5, DEEP) == PROCEED  # 2 + 5 <= 10
+    assert budget.decide(20, DEEP) == DOWNGRADE  # 2 + 20 > 10, but the next call fits
+    assert budget.decide(20, SCREENING) == PROCEED
+    budget.mark_downgraded()
+    assert budget.decide(20, DEEP) == PROCEED
+    assert RunBudget(max_usd=10.0).decide(20, DEEP) == PROCEED
+
+
+def test_unlimited_budget_always_proceeds():
+    budget = RunBudget()
+    budget.record(usage(10**9), 10**6, stage=DEEP)
+    assert budget.decide(10**6, DEEP) == PROCEED
+    with pytest.raises(ValueError):
+        RunBudget(on_exceed="pause")
+
+
+def test_estimate_tokens_rounds_up():
+    assert [estimate_tokens(text) for text in ("", "abc", "abcd", "abcde")] == [0, 1, 1, 2]
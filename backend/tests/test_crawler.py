@@ -0,0 +1,82 @@
+import asyncio
+import sqlite3
+import time
+
+from aiohttp import web
+
+from allabolag_crawler import AllabolagCrawler, CrawlerConfig, CrawlFrontier, CrawlTask, FinancialsJob
+
+BUILD_ID = "BUILD1"
+
+
+async def serve(handler):
+    """Fake allabolag.se on a free local port: the home page carries BUILD_ID, company JSON goes to ``handler``"""
+    async def home(request):
+        return web.Response(text=f'<script>{{"buildId":"{BUILD_ID}"}}</script>')
+
+    app = web.Application()
+    app.router.add_get("/", home)
+    app.router.add_get("/_next/data/{build_id}/company/{company_id}.json", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def crawl(tmp_path, handler, **settings):
+    async def run():
+        runner, base_url = await serve(handler)
+        try:
+            config = CrawlerConfig(db_path=tmp_path / "crawl.db", base_url=base_url, build_id=BUILD_ID, **settings)
+            crawler = AllabolagCrawler(config, [FinancialsJob()])
+            return await crawler.run([CrawlTask(FinancialsJob.name, "C1", {"organisationNumber": "5560000001"})])
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def frontier_counts(tmp_path):
+    conn = sqlite3.connect(tmp_path / "crawl.db")
+    try:
+        return CrawlFrontier(conn).counts()[FinancialsJob.name]
+    finally:
+        conn.close()
+
+
+def test_not_found_with_unchanged_build_id_fails_without_retrying(tmp_path):
+    hits = []
+
+    async def handler(request):
+        hits.append(request.path)
+        return web.Response(status=404)
+
+    stats = crawl(tmp_path, handler)
+    assert (stats.retried, stats.failed) == (0, 1)
+    assert len(hits) == 1
+    assert frontier_counts(tmp_path) == {"failed": 1}
+
+
+def test_timeouts_are_retried_with_backoff(tmp_path):
+    arrivals = []
+
+    async def handler(request):
+        arrivals.append(time.monotonic())
+        await asyncio.sleep(1)
+        return web.json_response({})
+
+    stats = crawl(tmp_path, handler, timeout=0.2, max_attempts=3, backoff_base=1.5)
+    assert (stats.retried, stats.failed) == (2, 1)
+    gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    # CrawlerConfig.backoff: base ** attempt, jittered down to half
+    assert gaps[0] >= 0.2 + 0.5 * 1.5 and gaps[1] >= 0.2 + 0.5 * 1.5 ** 2
+
+
+def test_backoff_is_jittered_within_bounds():
+    config = CrawlerConfig(backoff_base=2.0, backoff_max=10.0)
+    delays = [config.backoff(3) for _ in range(200)]
+    assert all(4.0 <= delay <= 8.0 for delay in delays)
+    assert len(set(delays)) > 1
+    assert all(5.0 <= config.backoff(10) <= 10.0 for _ in range(50))
@@ -0,0 +1,74 @@
+import sqlite3
+import time
+
+import pytest
+
+from allabolag_crawler import CrawlFrontier, CrawlTask
+
+JOB = "financials"
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "crawl.db")
+    yield conn
+    conn.close()
+
+
+def tasks(count):
+    return [CrawlTask(JOB, f"C{index}", {"index": index}) for index in range(count)]
+
+
+def frontier_status(conn):
+    return dict(conn.execute("SELECT task_key, status FROM crawl_frontier"))
+
+
+def test_tasks_are_added_once(conn):
+    frontier = CrawlFrontier(conn)
+    assert frontier.add(tasks(3)) == 3
+    assert frontier.add(tasks(4)) == 1
+    assert frontier.counts() == {JOB: {"pending": 4}}
+
+
+def test_a_lease_hides_tasks_until_it_expires(conn):
+    first = CrawlFrontier(conn, lease_seconds=0.2)
+    second = CrawlFrontier(conn, lease_seconds=60)
+    first.add(tasks(3))
+    claimed = first.claim([JOB], 2)
+    assert [task.payload for task in claimed] == [{"index": 0}, {"index": 1}]
+    assert [task.key for task in second.claim([JOB], 10)] == ["C2"]
+    assert second.claim([JOB], 10) == []
+    time.sleep(0.25)
+    # The first crawler "crashed": its expired leases are claimable again
+    assert sorted(task.key for task in second.claim([JOB], 10)) == ["C0", "C1"]
+    assert frontier_status(conn) == {"C0": "leased", "C1": "leased", "C2": "leased"}
+
+
+def test_retry_reschedules_and_release_returns_leases(conn):
+    frontier = CrawlFrontier(conn)
+    frontier.add(tasks(2))
+    retried, released = frontier.claim([JOB], 2)
+    retried.attempts += 1
+    frontier.retry(retried, "HTTP 503", 60)
+    assert frontier.claim([JOB], 10) == []
+    assert frontier.next_due([JOB]) > time.time() + 30
+    assert frontier.release() == 1
+    [again] = frontier.claim([JOB], 10)
+    assert (again.key, again.attempts) == (released.key, 0)
+    frontier.retry(retried, "HTTP 503", 0)
+    [due] = frontier.claim([JOB], 10)
+    assert (due.key, due.attempts) == (retried.key, 1)
+
+
+def test_requeue_failed_and_done(conn):
+    frontier = CrawlFrontier(conn)
+    frontier.add(tasks(2))
+    failed, done = frontier.claim([JOB], 2)
+    failed.attempts = 3
+    frontier.fail(failed, "HTTP 404")
+    with conn:
+        frontier.complete([done])
+    assert frontier.next_due([JOB]) is None
+    assert frontier.requeue_failed([JOB]) == 1
+    assert frontier.requeue_done([JOB]) == 1
+    assert sorted((task.key, task.attempts) for task in frontier.claim([JOB], 10)) == [("C0", 0), ("C1", 0)]
@@ -0,0 +1,58 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import kpi_engine
+from allabolag_crawler.accounts import insert_account_items
+
+
+def wide_rows(company_ids, years=(2021, 2022, 2023)):
+    return pd.DataFrame([
+        {"companyId": company_id, "organisationNumber": f"55600{index:05d}", "name": f"Company {index}", "year": year,
+         "SDI": 1000.0 + year, "RG": 100.0, "DR": 50.0}
+        for index, company_id in enumerate(company_ids)
+        for year in years
+    ])
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    wide_rows(["A", "B", "C"]).to_sql(kpi_engine.ACCOUNTS_TABLE, conn, index=False)
+    yield conn
+    conn.close()
+
+
+def kpi_companies(conn):
+    return dict(conn.execute(f"SELECT companyId, COUNT(*) FROM {kpi_engine.KPI_TABLE} GROUP BY companyId"))
+
+
+def test_rebuild_reads_wide_companies_next_to_long_format_ones(conn):
+    # Long-format rows for a company crawled later, and for one already in the wide table; no segmentation table
+    with conn:
+        insert_account_items(conn, [
+            {"organisationNumber": "5569999999", "companyId": "D", "year": 2023, "SDI": 10.0},
+            {"organisationNumber": "5560000002", "companyId": "C", "year": 2024, "SDI": 2000.0},
+        ])
+    kpi_engine.rebuild_kpis(conn)
+    # C's wide 2021-2023 are kept next to its long-format 2024
+    assert kpi_companies(conn) == {"A": 3, "B": 3, "C": 4, "D": 1}
+
+
+def test_incremental_update_rewrites_wide_only_companies(conn):
+    with conn:
+        insert_account_items(conn, [{"organisationNumber": "5569999999", "companyId": "D", "year": 2023, "SDI": 10.0}])
+    kpi_engine.rebuild_kpis(conn)
+    wide_rows(["B"], years=(2024,)).to_sql(kpi_engine.ACCOUNTS_TABLE, conn, index=False, if_exists="append")
+    assert kpi_engine.update_kpis(conn) == (1, 4)
+    assert kpi_companies(conn) == {"A": 3, "B": 4, "C": 3, "D": 1}
+
+
+def test_long_format_year_replaces_the_same_wide_year(conn):
+    with conn:
+        insert_account_items(conn, [{"organisationNumber": "5560000002", "companyId": "C", "year": 2023, "SDI": 5000.0}])
+    kpi_engine.rebuild_kpis(conn)
+    assert kpi_companies(conn)["C"] == 3
+    growth = conn.execute(f"SELECT revenue_growth FROM {kpi_engine.KPI_TABLE} WHERE companyId = 'C' AND year = 2023").fetchone()[0]
+    assert growth == pytest.approx(5000.0 / 3022.0 - 1)
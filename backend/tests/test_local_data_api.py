@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from local_data_api import CompanyFilters, decode_cursor, encode_cursor, fetch_companies, json_bytes
+
+ROWS = [
+    # OrgNr, name
+    ("5560000001", "Alfa AB"),
+    ("5560000001", "Alfa AB"),  # Duplicate (name, OrgNr): only rowid orders these
+    ("5560000001", "Alfa AB"),
+    ("5560000002", None),
+    ("5560000003", None),
+    (None, None),
+    (None, "Beta AB"),
+    ("5560000004", "Beta AB"),
+    ("5560000005", "Gamma AB"),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE master_analytics (OrgNr TEXT, name TEXT, revenue TEXT, city TEXT)")
+    conn.executemany("INSERT INTO master_analytics (OrgNr, name) VALUES (?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_cursor_pages_visit_every_row_once(conn, limit):
+    expected = conn.execute("SELECT name, OrgNr FROM master_analytics ORDER BY name, OrgNr, rowid").fetchall()
+    seen, after = [], None
+    for _ in range(len(ROWS) + 1):
+        result = fetch_companies(conn, CompanyFilters(), 1, limit, after, include_totals=False)
+        seen.extend((company["name"], company["OrgNr"]) for company in result["companies"])
+        if result["next_cursor"] is None:
+            break
+        after = decode_cursor(result["next_cursor"])
+    assert seen == expected
+
+
+def test_cursor_round_trips_null_keys():
+    assert decode_cursor(encode_cursor(None, None, 7)) == [None, None, 7]
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("Alfa AB", "5560000001", 7)[:-2])
+
+
+def test_float_fields_coerce_text_values(conn):
+    conn.execute("ALTER TABLE master_analytics ADD COLUMN Revenue_growth")
+    conn.execute("ALTER TABLE master_analytics ADD COLUMN EBIT_margin")
+    conn.execute("UPDATE master_analytics SET Revenue_growth = '0.25', EBIT_margin = 'n/a' WHERE OrgNr = '5560000005'")
+    result = fetch_companies(conn, CompanyFilters(name="Gamma"), 1, 10, include_totals=False)
+    company = result["companies"][0]
+    assert company["Revenue_growth"] == 0.25
+    assert company["EBIT_margin"] is None
+
+
+def test_non_finite_floats_become_null(conn):
+    conn.execute("ALTER TABLE master_analytics ADD COLUMN Revenue_growth")
+    conn.execute("ALTER TABLE master_analytics ADD COLUMN EBIT_margin")
+    conn.execute("UPDATE master_analytics SET Revenue_growth = 9e999, EBIT_margin = 'nan' WHERE OrgNr = '5560000005'")
+    result = fetch_companies(conn, CompanyFilters(name="Gamma"), 1, 10, include_totals=False)
+    company = result["companies"][0]
+    assert (company["Revenue_growth"], company["EBIT_margin"]) == (None, None)
+    assert json_bytes(company)
@@ -0,0 +1,27 @@
+import sqlite3
+
+from local_db import ReadOnlyConnectionPool
+
+
+def test_data_generation_advances_once_per_external_commit(tmp_path):
+    db_path = tmp_path / "local.db"
+    writer = sqlite3.connect(db_path)
+    writer.execute("CREATE TABLE t (x)")
+    writer.commit()
+    pool = ReadOnlyConnectionPool(str(db_path), size=3)
+    try:
+        held = [pool._connect() for _ in range(3)]
+        start = {pool.data_generation(conn) for conn in held}
+        assert len(start) == 1
+
+        writer.execute("INSERT INTO t VALUES (1)")
+        writer.commit()
+        after = {pool.data_generation(conn) for conn in held}
+        assert after == {start.pop() + 1}
+
+        assert pool.execute(pool.data_generation) == after.pop()
+        for conn in held:
+            conn.close()
+    finally:
+        pool.close()
+        writer.close()
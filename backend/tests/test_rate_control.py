@@ -0,0 +1,71 @@
+import pytest
+
+from allabolag_crawler.rate_control import AIMDController, AIMDSettings, parse_retry_after
+
+
+def controller(initial=4, **settings):
+    return AIMDController("allabolag.se", AIMDSettings(initial=initial, **settings))
+
+
+def run(aimd, count, status=200, latency=0.1, retry_after=None):
+    for _ in range(count):
+        aimd.on_start()
+    for _ in range(count):
+        aimd.on_result(status, latency, retry_after)
+
+
+def test_limit_grows_by_about_one_per_round_trip_of_fast_successes():
+    aimd = controller(initial=4)
+    for _ in range(4):
+        aimd.on_start()
+    limits = []
+    for _ in range(8):
+        # Every response frees a slot that is refilled at once: the limit is what holds us back
+        aimd.on_result(200, 0.1)
+        aimd.on_start()
+        limits.append(aimd.allowed)
+    # 1 / limit per success: one step after the four responses of a round trip at limit 4
+    assert limits == [4, 4, 4, 4, 5, 5, 5, 5]
+    assert aimd.increases == 1
+
+
+def test_limit_does_not_grow_when_slow_or_underused():
+    slow = controller(initial=4, target_latency=1.0)
+    run(slow, 4, latency=3.0)
+    assert slow.allowed == 4
+    idle = controller(initial=4)
+    for _ in range(10):
+        run(idle, 1)  # One request in flight at a time never hits the limit
+    assert idle.allowed == 4
+
+
+@pytest.mark.parametrize("status", [429, 503, None])
+def test_overload_halves_the_limit_once_per_round_trip(status):
+    aimd = controller(initial=16)
+    run(aimd, 8, status=status, latency=5.0)
+    assert aimd.allowed == 8
+    assert aimd.decreases == 1
+    assert (aimd.throttled, aimd.errors) == ((8, 0) if status == 429 else (0, 8))
+
+
+def test_decrease_stops_at_the_minimum():
+    aimd = controller(initial=4, minimum=2)
+    for _ in range(5):
+        run(aimd, 1, status=429, latency=0.0)
+    assert aimd.allowed == 2
+
+
+def test_retry_after_pauses_the_host():
+    aimd = controller()
+    assert aimd.can_start()
+    run(aimd, 1, status=429, retry_after=30.0)
+    assert not aimd.can_start()
+    assert 29 < aimd.pause_remaining() <= 30
+    assert aimd.snapshot()["throttled"] == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2026 07:28:00 GMT") is None
+    assert parse_retry_after(None) is None
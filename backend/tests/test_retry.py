@@ -0,0 +1,126 @@
+import types
+
+import pytest
+
+from agentic_pipeline.retry import (
+    AdaptiveConcurrencyLimiter,
+    RetryPolicy,
+    call_with_retry,
+    is_context_length_error,
+    is_retryable,
+    retry_after_seconds,
+)
+
+
+class APIError(Exception):
+    def __init__(self, status_code=None, headers=None, code=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.code = code
+        self.response = types.SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def test_backoff_stays_within_jitter_bounds():
+    policy = RetryPolicy(base_delay=1.0, max_delay=8.0, jitter=0.5)
+    for attempt, delay in [(1, 1.0), (3, 4.0), (10, 8.0)]:
+        samples = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0.5 * delay <= sample <= 1.5 * delay for sample in samples)
+    assert RetryPolicy(jitter=0.0).backoff(2) == 2.0
+
+
+@pytest.mark.parametrize(
+    "exc, retryable",
+    [
+        (APIError(429), True),
+        (APIError(503), True),
+        (APIError(400), False),
+        (APIError(401), False),
+        (APIConnectionError(), True),
+        (TimeoutError(), True),
+        (ValueError("bad json"), False),
+    ],
+)
+def test_is_retryable(exc, retryable):
+    assert is_retryable(exc) is retryable
+
+
+def test_context_length_and_retry_after_are_read_from_the_error():
+    assert is_context_length_error(APIError(400, code="context_length_exceeded"))
+    assert not is_context_length_error(APIError(400))
+    assert retry_after_seconds(APIError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(APIError(429, {"retry-after": "3"})) == 3.0
+    assert retry_after_seconds(APIError(429)) is None
+
+
+def test_limiter_halves_on_throttle_and_recovers_one_step_per_success_run():
+    limiter = AdaptiveConcurrencyLimiter(8, failure_threshold=10, recovery_successes=2)
+    limiter.record_throttle()
+    limiter.record_throttle()
+    assert limiter.limit == 2
+    for _ in range(3):
+        limiter.record_success()
+    assert limiter.limit == 3
+    limiter.record_success()
+    assert (limiter.limit, limiter.state) == (4, "closed")
+
+
+def test_limiter_opens_the_circuit_after_consecutive_throttles():
+    limiter = AdaptiveConcurrencyLimiter(4, failure_threshold=2, cooldown=0.0)
+    limiter.record_throttle()
+    assert limiter.state == "closed"
+    limiter.record_throttle()
+    assert limiter.state == "open"
+    with limiter.slot():
+        assert (limiter.state, limiter.limit) == ("half_open", 1)
+    limiter.record_success()
+    assert limiter.state == "closed"
+
+
+def test_call_with_retry_backs_off_then_succeeds():
+    outcomes = [APIError(429, {"retry-after": "2"}), APIError(503), "ok"]
+    sleeps = []
+
+    def fn():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    policy = RetryPolicy(base_delay=0.1, jitter=0.0)
+    assert call_with_retry(fn, policy=policy, sleep=sleeps.append) == "ok"
+    # Retry-After wins over a shorter backoff
+    assert sleeps == [2.0, 0.2]
+
+
+def test_call_with_retry_reports_throttles_to_the_limiter():
+    outcomes = [APIError(429), APIError(500), "ok"]
+
+    def fn():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    limiter = AdaptiveConcurrencyLimiter(4, failure_threshold=5, recovery_successes=1)
+    call_with_retry(fn, policy=RetryPolicy(), limiter=limiter, sleep=lambda delay: None)
+    # Halved by the 429 only, then one step back up for the success
+    assert limiter.limit == 3
+
+
+def test_call_with_retry_gives_up():
+    calls = []
+
+    def fn(exc):
+        calls.append(exc)
+        raise exc
+
+    with pytest.raises(APIError):
+        call_with_retry(lambda: fn(APIError(400)), policy=RetryPolicy(), sleep=lambda delay: None)
+    assert len(calls) == 1
+    with pytest.raises(APIError):
+        call_with_retry(lambda: fn(APIError(500)), policy=RetryPolicy(max_attempts=3), sleep=lambda delay: None)
+    assert len(calls) == 4
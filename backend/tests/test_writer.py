@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from allabolag_crawler import BatchWriter, CrawlFrontier, CrawlTask
+from allabolag_crawler.jobs import JobResult, SegmentationPageJob
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "crawl.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER NOT NULL, value)")
+    conn.commit()
+    CrawlFrontier(conn).add([CrawlTask("job", "good"), CrawlTask("job", "bad")])
+    conn.close()
+    return path
+
+
+def query(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_a_failing_write_is_replayed_alone(db_path):
+    outcomes = {}
+    writer = BatchWriter(db_path, flush_interval=60).start()
+    try:
+        good, bad = CrawlTask("job", "good"), CrawlTask("job", "bad")
+        writer.write(
+            "items", [{"id": 1, "value": "a"}], complete=[good],
+            callback=lambda written, error: outcomes.update(good=(written, error)),
+        )
+        # Widens the table, then fails on the NOT NULL column
+        writer.write(
+            "items", [{"id": None, "extra": "x"}], complete=[bad],
+            callback=lambda written, error: outcomes.update(bad=(written, error)),
+        )
+        writer.flush()
+    finally:
+        writer.close()
+    assert outcomes["good"] == (1, None)
+    assert isinstance(outcomes["bad"][1], sqlite3.IntegrityError)
+    assert (writer.transactions, writer.failed_writes, writer.rows_written) == (1, 1, 1)
+    assert query(db_path, "SELECT id, value FROM items") == [(1, "a")]
+    # The failed write's ALTER TABLE rolled back with it, and its task was not completed
+    assert [row[1] for row in query(db_path, "PRAGMA table_info(items)")] == ["id", "value"]
+    assert dict(query(db_path, "SELECT task_key, status FROM crawl_frontier")) == {"good": "done", "bad": "pending"}
+
+
+def test_segmentation_store_skips_committed_and_repeated_companies(tmp_path):
+    job = SegmentationPageJob()
+    job._known_ids = {"1"}
+    page = [{"companyId": company_id, "name": f"Company {company_id}"} for company_id in ("1", "2", "2", "3")]
+    results = [(job.page_task(1), JobResult(records=page))]
+    conn = sqlite3.connect(tmp_path / "crawl.db")
+    try:
+        with conn:
+            assert job.store(conn, results) == 2
+        assert job._known_ids == {"1"}  # Until the commit is reported
+        job.stored(results)
+        assert job._known_ids == {"1", "2", "3"}
+        with conn:
+            assert job.store(conn, results) == 0
+    finally:
+        conn.close()